@@ -0,0 +1,165 @@
+import json
+import logging
+import os
+
+import httpx
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+
+from app.api.IO.gitlabIO import getClient
+from app.api.jobs import reportProgress
+from app.api.retry import commitSafeRetryErrors, commitSafeRetryStatus
+
+load_dotenv()
+
+# limits of a single commit request; larger commits are split into several commits
+# (gitlab rejects or times out on commits with tens of MB of actions)
+commitMaxActions = int(os.environ.get("COMMIT_MAX_ACTIONS", 1000))
+commitMaxSize = int(float(os.environ.get("COMMIT_MAX_SIZE", 10)) * 1024 * 1024)
+
+# size of the json around the actions (branch, commit message, ...)
+envelopeSize = 1024
+
+
+# collects the actions of a commit and sends them in batches that stay below the limits
+# if a batch fails, the batches before are already in the repo; calling commit() again continues with the failed batch
+class CommitBuilder:
+    def __init__(
+        self,
+        target: str,
+        id: int,
+        branch: str,
+        message: str,
+        headers: dict,
+        maxActions: int = commitMaxActions,
+        maxSize: int = commitMaxSize,
+        errorStatus: int = status.HTTP_400_BAD_REQUEST,
+        retries: int = 3,
+        progress: tuple[float, float] = (0.8, 1.0),
+    ):
+        self.target = target
+        self.id = id
+        self.branch = branch
+        self.message = message
+        self.headers = headers
+        self.maxActions = maxActions
+        self.maxSize = maxSize
+        self.errorStatus = errorStatus
+        self.retries = retries
+        self.progress = progress
+
+        # the actions split into batches (and the encoded size of the last batch)
+        self.batches: list[list[dict]] = []
+        self.size = 0
+        # number of batches that were committed successfully
+        self.committed = 0
+        self.responses: list[httpx.Response] = []
+        # whether batches were committed while actions were still added (the number of batches isn't known then)
+        self.pushed = False
+
+    def add(self, action: dict):
+        # an action larger than the limit gets a batch of its own
+        size = getActionSize(action)
+        if (
+            not self.batches
+            or len(self.batches[-1]) >= self.maxActions
+            or (self.batches[-1] and self.size + size > self.maxSize - envelopeSize)
+        ):
+            self.batches.append([])
+            self.size = 0
+        self.batches[-1].append(action)
+        self.size += size
+
+    def extend(self, actions: list[dict]):
+        for action in actions:
+            self.add(action)
+
+    # adds the action and commits the batches before it as soon as they are full, so that large contents
+    # (e.g. uploaded files) aren't kept in memory until all actions were added; the base64 content of the
+    # committed actions is dropped (they are only needed for the .gitattributes changes afterwards)
+    async def push(self, action: dict):
+        self.add(action)
+        if len(self.batches) - 1 > self.committed:
+            self.pushed = True
+            await self.commit(len(self.batches) - 1)
+            for batch in self.batches[: self.committed]:
+                for x in batch:
+                    if x.get("encoding") == "base64":
+                        x["content"] = ""
+
+    def __len__(self) -> int:
+        return sum(len(x) for x in self.batches)
+
+    # the actions that are already in the repo
+    def committedActions(self) -> list[dict]:
+        return [x for batch in self.batches[: self.committed] for x in batch]
+
+    def payload(self, number: int) -> str:
+        message = self.message
+        if self.pushed:
+            message += f" (part {number + 1})"
+        elif len(self.batches) > 1:
+            message += f" ({number + 1}/{len(self.batches)})"
+        return json.dumps(
+            {
+                "branch": self.branch,
+                "commit_message": message,
+                "actions": self.batches[number],
+            }
+        )
+
+    # send all remaining batches (or the batches before the given one) one after another
+    # (every batch builds on the commit of the one before)
+    async def commit(self, until: int | None = None) -> list[httpx.Response]:
+        start, end = self.progress
+        total = len(self.batches)
+
+        while self.committed < (total if until is None else until):
+            number = self.committed
+            reportProgress(
+                start + (end - start) * number / total,
+                f"Committing {len(self.batches[number])} files (batch {number + 1} of {total})",
+            )
+            try:
+                response = await getClient(self.target).post(
+                    f"/api/v4/projects/{self.id}/repository/commits",
+                    headers=self.headers,
+                    content=self.payload(number),
+                    retries=self.retries,
+                    retryOn=commitSafeRetryStatus,
+                    retryErrors=commitSafeRetryErrors,
+                )
+            except Exception as e:
+                logging.error(e)
+                raise HTTPException(
+                    status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                    detail=f"Couldn't commit to the repo! {self.partial()}Error: {e}",
+                )
+
+            if not response.is_success:
+                logging.error(
+                    f"Couldn't commit batch {number + 1} of {total} to {self.id}! ERROR: {response.content}"
+                )
+                raise HTTPException(
+                    status_code=self.errorStatus,
+                    detail=f"Couldn't commit to the repo! {self.partial()}Error: {response.content}",
+                )
+
+            self.responses.append(response)
+            self.committed += 1
+            logging.debug(f"Committed batch {number + 1} of {total} to {self.id}")
+
+        return self.responses
+
+    # note on the batches that are already in the repo (for the error messages)
+    def partial(self) -> str:
+        if self.committed == 0:
+            return ""
+        return f"The first {len(self.committedActions())} of {len(self)} files were committed already. "
+
+
+# size of the action in the commit request (base64 contents need no escaping, so they aren't encoded again)
+def getActionSize(action: dict) -> int:
+    if action.get("encoding") == "base64":
+        return len(json.dumps({**action, "content": ""})) + len(action["content"]) + 2
+    return len(json.dumps(action)) + 2
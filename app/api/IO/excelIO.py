@@ -2,10 +2,13 @@ import pandas as pd
 from json import loads
 import numpy as np
 import os
+import logging
 from fastapi import HTTPException
 import openpyxl
+from io import BytesIO
 
 from app.models.gitlab.input import sheetContent
+from app.api.middleware import timed
 
 from fsspreadsheet.xlsx import Xlsx
 from fsspreadsheet.workbook import FsWorkbook, FsWorksheet
@@ -31,205 +34,171 @@ def sanitizeInput(input: str | list) -> str | list:
     return input
 
 
-# reads out the given file and sends the content as json back
-def readIsaFile(path: str, type: str):
-    # initiate isaFile structure
-    isaFile: pd.DataFrame
-
-    # match the correct sheet name with the given type of isa
-    match type:
-        case "investigation":
-            sheetName = sheetName2 = "isa_investigation"
-
-        case "study":
-            sheetName = "Study"
+# names of the metadata sheet for every type of isa file (the first one is the name stated in the arc specification)
+sheetAliases = {
+    "investigation": ["isa_investigation"],
+    "study": ["isa_study", "Study"],
+    "assay": ["isa_assay", "Assay"],
+    "datamap": ["isa_datamap", "Datamap"],
+    "run": ["isa_run", "Run"],
+    "workflow": ["isa_workflow", "Workflow"],
+}
 
-            # the intended name stated in the arc specification
-            sheetName2 = "isa_study"
 
-        case "assay":
-            sheetName = "Assay"
+# returns the name of the metadata sheet of the isa file (None if there is no sheet with a known name)
+def getMetadataSheet(sheetNames: list[str], type: str) -> str | None:
+    for name in sheetAliases.get(type, []):
+        if name in sheetNames:
+            return name
+    return None
 
-            # the intended name stated in the arc specification
-            sheetName2 = "isa_assay"
 
-        case "datamap":
-            return getSwateSheets(path, "datamap")
+# opens the excel file; the file can either be a path or the raw bytes of the file (read in memory, without the disk)
+def openExcelFile(file: str | bytes | BytesIO) -> pd.ExcelFile:
+    if isinstance(file, bytes):
+        file = BytesIO(file)
+    return pd.ExcelFile(file, engine="openpyxl")
 
-        case "run":
-            # name by arc specification
-            sheetName = "isa_run"
 
-            sheetName2 = "Run"
+# reads out the given file (path or raw bytes) and sends the content as json back
+@timed("excel")
+def readIsaFile(path: str | bytes | BytesIO, type: str):
+    if type == "datamap":
+        return getSwateSheets(path, "datamap")
 
-        case "workflow":
-            # name by arc specification
-            sheetName = "isa_workflow"
-
-            sheetName2 = "Workflow"
-
-        case other:
-            sheetName = sheetName2 = ""
-
-    # read the file
-    try:
-        isaFile = pd.read_excel(path, sheet_name=sheetName, engine="openpyxl")
-    except:
-        try:
-            isaFile = pd.read_excel(path, sheet_name=sheetName2, engine="openpyxl")
-        except:
-            # if none matches, just read the file with default values
-            isaFile = pd.read_excel(path, 0, engine="openpyxl")
+    # open the file only once and read out the metadata sheet (or the first sheet, if none matches)
+    with openExcelFile(path) as excelFile:
+        sheetName = getMetadataSheet(excelFile.sheet_names, type)
+        isaFile = excelFile.parse(sheetName if sheetName is not None else 0)
 
     # parse the dataframe into json and return it
     return loads(isaFile.to_json(orient="split"))
 
 
-# replaces the old content of the file with the new content
-def writeIsaFile(path: str, type: str, newContent, repoId: int, location: str):
+# replaces the old content of the given rows (each one a list starting with the name of the row) with the new content
+# the file is parsed and written only once for all rows; returns the name of the last edited row
+# (pathName is the path of a working copy to edit instead of the local copy of the arc)
+@timed("excel")
+def writeIsaRows(
+    path: str,
+    type: str,
+    rows: list[list],
+    repoId: int,
+    location: str,
+    pathName: str | None = None,
+):
     # construct the path with the given values (e.g. .../freiburg-33/isa.investigation.xlsx)
-    pathName = f"{os.environ.get('BACKEND_SAVE')}{location}-{repoId}/{path}"
-
-    # match the correct sheet name with the given type of isa
-
-    sheetIndex = -1
-    match type:
-        case "investigation":
-            sheetName = "isa_investigation"
-            sheetName2 = "isa_investigation"
-
-        case "study":
-            sheetName2 = "Study"
-
-            # the intended name stated in the arc specification
-            sheetName = "isa_study"
-
-        case "assay":
-            sheetName2 = "Assay"
-
-            # the intended name stated in the arc specification
-            sheetName = "isa_assay"
-
-        case "datamap":
-            sheetName = "isa_datamap"
-
-            sheetName2 = "Datamap"
-
-        case "run":
-            # name by arc specification
-            sheetName = "isa_run"
-
-            sheetName2 = "Run"
-
-        case "workflow":
-            # name by arc specification
-            sheetName = "isa_workflow"
-            sheetName2 = "Workflow"
-
-        case other:
-            sheetName = sheetName2 = ""
-
-    # read the file
-    try:
-        isaFile = pd.read_excel(pathName, sheet_name=sheetName, engine="openpyxl")
-
-    except Exception as e:
-        print(f"Exception: {e}")
-        try:
-            sheetName = sheetName2
-            isaFile = pd.read_excel(pathName, sheet_name=sheetName2, engine="openpyxl")
-        except:
-            sheetName = 0
-            isaFile = pd.read_excel(pathName, 0, engine="openpyxl")
+    if pathName is None:
+        pathName = f"{os.environ.get('BACKEND_SAVE')}{location}-{repoId}/{path}"
 
     try:
         importIsa = Xlsx.from_xlsx_file(pathName)
-        # get the index of the correct sheet
-        for i, sheet in enumerate(FsWorkbook.get_worksheets(importIsa)):
-            if sheet.name == sheetName or sheetName == sheetName2:
-                sheetIndex = i
+        worksheets = FsWorkbook.get_worksheets(importIsa)
+
+        # get the correct sheet (or the first one, if there is no sheet with the name)
+        sheetName = getMetadataSheet([x.name for x in worksheets], type)
+        sheetData = worksheets[0]
+        for sheet in worksheets:
+            if sheet.name == sheetName:
+                sheetData = sheet
                 break
 
-        if sheetIndex > -1:
-            sheetData = FsWorkbook.get_worksheets(importIsa)[sheetIndex]
-        else:
-            sheetData = FsWorkbook.get_worksheets(importIsa)[0]
+        rowName = None
+        for newContent in rows:
+            rowIndex = getRowIndex(newContent[0], sheetData)
+            if rowIndex < 0:
+                raise Exception(f"Row {newContent[0]} not found!")
 
-        rowIndex = getRowIndex(newContent[0], sheetData)
+            for x in range(1, len(newContent)):
+                if newContent[x] != None and newContent[x] != "":
+                    sheetData.SetValueAt(sanitizeInput(newContent[x]), rowIndex, x + 1)
 
-        for x in range(1, len(newContent)):
-            if newContent[x] != None and newContent[x] != "":
-                sheetData.SetValueAt(sanitizeInput(newContent[x]), rowIndex, x + 1)
-        try:
-            importIsa.RemoveWorksheet(sheetName)
-        except:
-            importIsa.RemoveWorksheet(sheetName2)
+            rowName = FsWorksheet.get_cell_at(rowIndex, 2, sheetData).Value
 
+        importIsa.RemoveWorksheet(sheetData.name)
         importIsa.AddWorksheet(sheetData)
 
-        Xlsx.to_file(
+        Xlsx.to_xlsx_file(
             pathName,
             importIsa,
         )
 
-        return FsWorksheet.get_cell_at(rowIndex, 2, sheetData).Value
-    except:
+        return rowName
+    except Exception as e:
+        logging.warning(f"Couldn't edit {path} with fsspreadsheet! Error: {e}")
+
+    # if fsspreadsheet fails, edit the file with pandas instead
+    with pd.ExcelFile(pathName, engine="openpyxl") as excelFile:
+        sheetName = getMetadataSheet(excelFile.sheet_names, type)
+        if sheetName is None:
+            sheetName = excelFile.sheet_names[0]
+        isaFile = excelFile.parse(sheetName)
+
+    # replace nan values with empty strings
+    isaFile = isaFile.fillna("")
 
-        # replace nan values with empty strings
-        isaFile = isaFile.fillna("")
+    id = None
+    for newContent in rows:
         if newContent[0] != "":
-            # get the id of the row to edit
-            id = isaFile.index[
-                isaFile[isaFile[0:1].columns[0]] == newContent[0]
-            ].values[0]
+            id = replaceRow(isaFile, newContent)
 
-            # get the current content to know what to replace
-            oldContent = isaFile[id : id + 1]
+    if id is None:
+        return "Nothing changed, row not found!"
+
+    # save the changes to the excel file
+    try:
+        with pd.ExcelWriter(
+            pathName, engine="openpyxl", mode="a", if_sheet_exists="replace"
+        ) as writer:
+            isaFile.to_excel(
+                writer, sheet_name=sheetName, merge_cells=False, index=False
+            )
+    except:
+        raise HTTPException(
+            status_code=500,
+            detail="Error writing the Excel File. Please check your excel file and try to repair it if corrupted!",
+        )
 
-            # Here we replace every entry in the corresponding field with the new value (column by column)
-            for x in range(1, len(newContent)):
-                # if there are new fields in newContent insert a new column "Unnamed: number" with empty fields
-                if x > oldContent.count(axis="columns").values[0] - 1:
-                    try:
-                        isaFile.insert(x, "Unnamed: " + str(x), "")
-                        # add the new field to old content to extent its length
-                        oldContent.insert(x, "Unnamed: " + str(x), "")
-                    except:
-                        isaFile.insert(x, "Unnamed")
-                        oldContent.insert(x, "Unnamed")
-
-                # get the name of the current column
-                columnName = isaFile[id : id + 1].columns[x]
-
-                # read out the value on the row with the given id and the current column and replace it with the new value
-                isaFile[id : id + 1].at[id, columnName] = (
-                    isaFile[id : id + 1]
-                    .at[id, columnName]
-                    .replace(
-                        oldContent[isaFile[0:1].columns[x]].values[0],
-                        sanitizeInput(newContent[x]),
-                    )
-                )
-
-            # save the changes to the excel file
-            try:
-                with pd.ExcelWriter(
-                    pathName, engine="openpyxl", mode="a", if_sheet_exists="replace"
-                ) as writer:
-                    isaFile.to_excel(
-                        writer, sheet_name=sheetName, merge_cells=False, index=False
-                    )
-            except:
-                raise HTTPException(
-                    status_code=500,
-                    detail="Error writing the Excel File. Please check your excel file and try to repair it if corrupted!",
-                )
-        else:
-            return "Nothing changed, row not found!"
     # return the name of the row back
     return isaFile.iat[id, 0]
 
 
+# replaces the content of the row in the dataframe with the new content; returns the id of the row
+def replaceRow(isaFile: pd.DataFrame, newContent: list) -> int:
+    # get the id of the row to edit
+    id = isaFile.index[isaFile[isaFile[0:1].columns[0]] == newContent[0]].values[0]
+
+    # get the current content to know what to replace
+    oldContent = isaFile[id : id + 1]
+
+    # Here we replace every entry in the corresponding field with the new value (column by column)
+    for x in range(1, len(newContent)):
+        # if there are new fields in newContent insert a new column "Unnamed: number" with empty fields
+        if x > oldContent.count(axis="columns").values[0] - 1:
+            try:
+                isaFile.insert(x, "Unnamed: " + str(x), "")
+                # add the new field to old content to extent its length
+                oldContent.insert(x, "Unnamed: " + str(x), "")
+            except:
+                isaFile.insert(x, "Unnamed")
+                oldContent.insert(x, "Unnamed")
+
+        # get the name of the current column
+        columnName = isaFile[id : id + 1].columns[x]
+
+        # read out the value on the row with the given id and the current column and replace it with the new value
+        isaFile[id : id + 1].at[id, columnName] = (
+            isaFile[id : id + 1]
+            .at[id, columnName]
+            .replace(
+                oldContent[isaFile[0:1].columns[x]].values[0],
+                sanitizeInput(newContent[x]),
+            )
+        )
+
+    return id
+
+
 # help function to figure out what isa file we are editing (for the sheet name)
 def getIsaType(path: str):
     # split the path into an array with "/" as the separator
@@ -246,76 +215,37 @@ def getIsaType(path: str):
         return ""
 
 
+# returns every annotation sheet (all non metadata sheets) with its name, read from a single parse of the file
+def readSwateSheets(path: str | bytes | BytesIO, type: str):
+    # only these types contain annotation tables
+    if type not in ["study", "assay", "datamap", "run"]:
+        return
+
+    # every sheet of a datamap is returned
+    metadata = sheetAliases[type] if type != "datamap" else []
+
+    with openExcelFile(path) as excelFile:
+        for name in excelFile.sheet_names:
+            if name not in metadata:
+                yield name, loads(excelFile.parse(name).to_json(orient="split"))
+
+
 # returns a list of all the non metadata sheets and their names
-def getSwateSheets(path: str, type: str):
-    excelFile = pd.ExcelFile(path)
+@timed("excel")
+def getSwateSheets(path: str | bytes | BytesIO, type: str):
     sheets = []
     names = []
-    match type:
-        case "study":
-            sheetNames = excelFile.sheet_names
-            # if the sheetName is not "Study" or "isa_study", then its a swate sheet
-            sheets = [
-                loads(
-                    pd.read_excel(path, sheet_name=x, engine="openpyxl").to_json(
-                        orient="split"
-                    )
-                )
-                for x in sheetNames
-                if x != "Study" and x != "isa_study"
-            ]
-
-            names = [x for x in sheetNames if x != "Study" and x != "isa_study"]
-
-        case "assay":
-            sheetNames = excelFile.sheet_names
-
-            sheets = [
-                loads(
-                    pd.read_excel(path, sheet_name=x, engine="openpyxl").to_json(
-                        orient="split"
-                    )
-                )
-                for x in sheetNames
-                if x != "Assay" and x != "isa_assay"
-            ]
-
-            names = [x for x in sheetNames if x != "Assay" and x != "isa_assay"]
-
-        case "datamap":
-            sheetNames = excelFile.sheet_names
-
-            sheets = [
-                loads(
-                    pd.read_excel(path, sheet_name=x, engine="openpyxl").to_json(
-                        orient="split"
-                    )
-                )
-                for x in sheetNames
-            ]
-
-            names = [x for x in sheetNames]
-
-        case "run":
-            sheetNames = excelFile.sheet_names
-
-            sheets = [
-                loads(
-                    pd.read_excel(path, sheet_name=x, engine="openpyxl").to_json(
-                        orient="split"
-                    )
-                )
-                for x in sheetNames
-                if x != "Run" and x != "isa_run"
-            ]
-
-            names = [x for x in sheetNames if x != "Run" and x != "isa_run"]
+    for name, sheet in readSwateSheets(path, type):
+        sheets.append(sheet)
+        names.append(name)
 
     return sheets, names
 
 
 # fill a new table column wise with the given data and safe it to the excel file
-def createSheet(sheetContent: sheetContent, target: str):
+# (pathName is the path of a working copy to edit instead of the local copy of the arc)
+@timed("excel")
+def createSheet(sheetContent: sheetContent, target: str, pathName: str | None = None):
     head = []
     content = []
 
@@ -354,7 +284,8 @@ def createSheet(sheetContent: sheetContent, target: str):
         except:
             pass
 
-    pathName = f"{os.environ.get('BACKEND_SAVE')}{target}-{id}/{path}"
+    if pathName is None:
+        pathName = f"{os.environ.get('BACKEND_SAVE')}{target}-{id}/{path}"
 
     importIsa = Xlsx.from_xlsx_file(pathName)
     importIsa.RemoveWorksheet(name)
@@ -416,6 +347,7 @@ def createSheet(sheetContent: sheetContent, target: str):
 
 
 # when you sync an assay to a study, either overwrite existing data or append new data
+@timed("excel")
 def appendAssay(pathToAssay: str, pathToStudy: str, assayName: str):
     # parse the correct sheet (first 8 rows for assay files)
     try:
@@ -518,6 +450,7 @@ def appendAssay(pathToAssay: str, pathToStudy: str, assayName: str):
 
 
 # append study to investigation file
+@timed("excel")
 def appendStudy(pathToStudy: str, pathToInvest: str, studyName: str):
     # parse the correct sheet
     try:
@@ -616,6 +549,7 @@ def appendStudy(pathToStudy: str, pathToInvest: str, studyName: str):
 
 
 # reads out the given file and sends the content as json back
+@timed("excel")
 def readExcelFile(file: bytes):
     # initiate isaFile structure
     excelFile: pd.DataFrame
@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import pickle
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from app.api.middleware import recordTiming
+
+load_dotenv()
+
+
+# HTTPExceptions can't be sent back from the worker processes, so they are passed as this error instead
+class ExcelTaskError(Exception):
+    def __init__(self, status_code: int, detail):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+# runs the excel function inside of the worker process (returns the result and the time it took)
+def runTask(function, args: tuple, kwargs: dict):
+    start = time.perf_counter()
+    try:
+        return function(*args, **kwargs), time.perf_counter() - start
+    except HTTPException as e:
+        raise ExcelTaskError(e.status_code, e.detail)
+    except Exception as e:
+        # make sure that the error can be sent back to the main process
+        try:
+            pickle.dumps(e)
+        except Exception:
+            raise RuntimeError(f"{type(e).__name__}: {e}")
+        raise
+
+
+# process pool for the excel work (pandas, openpyxl and fsspreadsheet), so that parsing and writing large
+# workbooks doesn't block the event loop of the worker
+class ExcelPool:
+    def __init__(self, workers: int, maxQueue: int, timeout: float):
+        self.workers = workers
+        self.maxQueue = maxQueue
+        self.timeout = timeout
+        self.executor = None
+
+        # tasks given to the pool and not finished yet (a timed out task keeps its process busy until it is done,
+        # so it is only removed by the callback of its future; the callbacks run in a thread of the executor)
+        self.lock = threading.Lock()
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.busyTime = 0.0
+        self.startTime = time.time()
+
+    def getExecutor(self) -> ProcessPoolExecutor:
+        if self.executor is None:
+            # the processes are spawned (instead of forked), as the worker is already running multiple threads
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self.executor
+
+    # run the function in the pool; raises 503 if too many tasks are waiting and 504 if the task takes too long
+    async def run(self, function, *args, **kwargs):
+        # without any processes, the function runs in the threadpool instead
+        if self.workers < 1:
+            return await run_in_threadpool(function, *args, **kwargs)
+
+        with self.lock:
+            if self.running >= self.workers + self.maxQueue:
+                self.rejected += 1
+                logging.warning(f"Excel pool is full! Rejected {function.__name__}")
+                raise HTTPException(
+                    status_code=503,
+                    detail="The server is currently busy! Please try again later!",
+                )
+            self.running += 1
+
+        start = time.perf_counter()
+        try:
+            try:
+                future = self.getExecutor().submit(runTask, function, args, kwargs)
+            except BaseException:
+                self.release()
+                raise
+            future.add_done_callback(lambda _: self.release())
+            result, duration = await asyncio.wait_for(
+                asyncio.wrap_future(future), self.timeout
+            )
+            self.completed += 1
+            self.busyTime += duration
+            return result
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            logging.error(f"Excel task {function.__name__} timed out!")
+            raise HTTPException(
+                status_code=504,
+                detail="Processing the excel file took too long! Please try again later!",
+            )
+        except ExcelTaskError as e:
+            self.failed += 1
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
+        except BrokenProcessPool:
+            # a process died (e.g. out of memory), so the pool has to be restarted
+            self.failed += 1
+            logging.error("Excel pool is broken! Restarting the pool")
+            self.executor = None
+            raise HTTPException(
+                status_code=500,
+                detail="Error processing the excel file! Please try again later!",
+            )
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            # the waiting time in the queue is part of the excel time of the request
+            recordTiming("excel", time.perf_counter() - start)
+
+    def release(self):
+        with self.lock:
+            self.running -= 1
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def stats(self) -> dict:
+        uptime = max(time.time() - self.startTime, 1)
+        return {
+            "workers": self.workers,
+            "running": min(self.running, self.workers),
+            "queued": max(self.running - self.workers, 0),
+            "maxQueue": self.maxQueue,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            # share of the available process time that was used for excel tasks since the start
+            "utilization": (
+                round(self.busyTime / (uptime * self.workers), 4)
+                if self.workers > 0
+                else 0
+            ),
+        }
+
+
+excelPool = ExcelPool(
+    int(os.environ.get("EXCEL_WORKERS", min(4, os.cpu_count() or 1))),
+    int(os.environ.get("EXCEL_QUEUE", 32)),
+    float(os.environ.get("EXCEL_TIMEOUT", 120)),
+)
+
+
+# run the excel function in the pool
+async def runExcel(function, *args, **kwargs):
+    return await excelPool.run(function, *args, **kwargs)
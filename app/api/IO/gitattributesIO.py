@@ -0,0 +1,256 @@
+import json
+import logging
+from typing import Iterable
+from urllib.parse import quote
+
+from fastapi import HTTPException, status
+
+from app.api.IO.commitIO import CommitBuilder
+from app.api.IO.gitlabIO import getClient
+from app.api.retry import gitattributesRetry
+
+# the line of a file tracked by lfs
+lfsAttributes = "filter=lfs diff=lfs merge=lfs -text"
+
+# the first line of a lfs pointer file
+lfsPointer = "version https://git-lfs.github.com/spec/v1\n"
+
+
+# the .gitattributes of an arc; the lfs tracked paths are parsed once into a dict (path -> line), so that
+# adding, removing or renaming many paths doesn't search the whole file for every path
+class GitAttributes:
+    def __init__(self, content: str | None, lastCommitId: str | None = None):
+        self.exists = content is not None
+        self.lastCommitId = lastCommitId
+        self.changed = False
+
+        # all lines of the file (None for removed lines) and the line number of every lfs tracked path
+        self.lines: list[str | None] = []
+        self.paths: dict[str, int] = {}
+        for line in (content or "").splitlines():
+            path = line.split(" filter=lfs", 1)[0] if " filter=lfs" in line else None
+            if path:
+                # a path listed twice is only kept once
+                if path in self.paths:
+                    self.changed = True
+                    continue
+                self.paths[path] = len(self.lines)
+            self.lines.append(line)
+
+    def __contains__(self, path: str) -> bool:
+        return path in self.paths
+
+    def add(self, paths: list[str]):
+        for path in paths:
+            if path not in self.paths:
+                self.paths[path] = len(self.lines)
+                self.lines.append(f"{path} {lfsAttributes}")
+                self.changed = True
+
+    def remove(self, paths: list[str]):
+        for path in paths:
+            line = self.paths.pop(path, None)
+            if line is not None:
+                self.lines[line] = None
+                self.changed = True
+
+    # rename the paths (old path -> new path), keeping their attributes
+    def rename(self, paths: dict[str, str]):
+        for oldPath, newPath in paths.items():
+            line = self.paths.pop(oldPath, None)
+            if line is not None:
+                self.lines[line] = newPath + self.lines[line][len(oldPath) :]
+                self.paths[newPath] = line
+                self.changed = True
+
+    def content(self) -> str:
+        return "".join(f"{x}\n" for x in self.lines if x is not None and x != "")
+
+    # the commit action writing the changed file (to commit it together with other files)
+    def action(self) -> dict:
+        if not self.exists:
+            return {
+                "action": "create",
+                "file_path": ".gitattributes",
+                "content": self.content(),
+            }
+        action = {
+            "action": "update",
+            "file_path": ".gitattributes",
+            "content": self.content(),
+        }
+        # the commit fails if the file was changed in the meantime (instead of overwriting the change)
+        if self.lastCommitId:
+            action["last_commit_id"] = self.lastCommitId
+        return action
+
+
+# returns the current .gitattributes of the arc (an empty one, if the arc has none)
+async def getGitAttributes(
+    target: str, id: int, branch: str, headers: dict
+) -> GitAttributes:
+    try:
+        response = await getClient(target).get(
+            f"/api/v4/projects/{id}/repository/files/.gitattributes/raw?ref={branch}",
+            headers=headers,
+            retries=3,
+        )
+    except Exception as e:
+        logging.error(e)
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=f"Couldn't update .gitattributes! Error: {e}",
+        )
+    if response.status_code == 404:
+        return GitAttributes(None)
+    if not response.is_success:
+        logging.error(f"Couldn't get .gitattributes! ERROR: {response.content}")
+        raise HTTPException(
+            status_code=response.status_code,
+            detail=f"Couldn't get .gitattributes! Error: {response.content}",
+        )
+    return GitAttributes(response.text, response.headers.get("X-Gitlab-Last-Commit-Id"))
+
+
+# adds, removes and renames the lfs tracked paths in the .gitattributes with a single commit
+# (retried if gitlab returns 400, e.g. if another request changed the file at the same time)
+async def updateGitAttributes(
+    target: str,
+    id: int,
+    branch: str,
+    headers: dict,
+    add: list[str] = [],
+    remove: list[str] = [],
+    rename: dict[str, str] = {},
+) -> str | int:
+    async for attempt in gitattributesRetry.attempts(f".gitattributes of {id}"):
+        attributes = await getGitAttributes(target, id, branch, headers)
+        if not attributes.exists and len(add) == 0:
+            return "Nothing to remove!"
+
+        attributes.add(add)
+        attributes.remove(remove)
+        attributes.rename(rename)
+        if not attributes.changed:
+            return "No entry found!"
+
+        attributeData = {
+            "branch": branch,
+            "content": attributes.content(),
+            "commit_message": (
+                "Update .gitattributes"
+                if attributes.exists
+                else "Create .gitattributes"
+            ),
+        }
+        if attributes.lastCommitId:
+            attributeData["last_commit_id"] = attributes.lastCommitId
+
+        postUrl = (
+            f"/api/v4/projects/{id}/repository/files/{quote('.gitattributes', safe='')}"
+        )
+        try:
+            if attributes.exists:
+                response = await getClient(target).put(
+                    postUrl, headers=headers, content=json.dumps(attributeData)
+                )
+            else:
+                response = await getClient(target).post(
+                    postUrl, headers=headers, content=json.dumps(attributeData)
+                )
+        except Exception as e:
+            logging.error(e)
+            raise HTTPException(status_code=500, detail="ERROR: " + str(e))
+
+        if response.is_success:
+            return "Replaced"
+        if response.status_code != 400:
+            logging.error(f"Couldn't update .gitattributes! ERROR: {response.content}")
+            return response.status_code
+
+        logging.debug("Retry updating the .gitattributes")
+        attempt.response = response
+
+    # if after all tries the .gitattributes wasn't modified, return an error
+    changes = add + remove + list(rename)
+    logging.warning(".gitattributes could not be modified for " + str(changes))
+    raise HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="ERROR: .gitattributes could not be updated! Please add entry for file "
+        + str(changes),
+    )
+
+
+# the lfs changes of the given (committed) actions: "add" for created/updated files, "remove" for deleted ones,
+# "rename" for moved ones and "upload" for uploaded files (added if they are lfs pointers, removed otherwise)
+def getChanges(actions: list[dict], change: str) -> dict:
+    actions = [x for x in actions if x["file_path"] != ".gitattributes"]
+    match change:
+        case "add":
+            return {"add": [x["file_path"] for x in actions]}
+        case "upload":
+            return {
+                "add": [x["file_path"] for x in actions if isPointer(x)],
+                "remove": [x["file_path"] for x in actions if not isPointer(x)],
+            }
+        case "remove":
+            return {"remove": [x["file_path"] for x in actions]}
+        case "rename":
+            return {"rename": {x["previous_path"]: x["file_path"] for x in actions}}
+    return {}
+
+
+def isPointer(action: dict) -> bool:
+    return action.get("encoding") != "base64" and (
+        action.get("content") or ""
+    ).startswith(lfsPointer)
+
+
+# commits the actions together with the update of the .gitattributes (one commit instead of two)
+# if the commit fails only because of the .gitattributes (e.g. it was changed in the meantime), the files are
+# committed without it; the .gitattributes is then updated separately for all files that reached the repo
+# the given actions are added to the commit one by one and the full batches are committed right away
+# (for large contents, e.g. uploaded files, that shouldn't be kept in memory at the same time)
+async def commitWithGitAttributes(
+    commit: CommitBuilder, headers: dict, change: str, actions: Iterable[dict] = ()
+):
+    # the .gitattributes is read before any batch is pushed, so that a failure here leaves no files behind
+    # without their lfs entries
+    attributes = await getGitAttributes(
+        commit.target, commit.id, commit.branch, headers
+    )
+    action = None
+    added = False
+    try:
+        for x in actions:
+            await commit.push(x)
+        added = True
+
+        changes = getChanges([x for batch in commit.batches for x in batch], change)
+        attributes.add(changes.get("add", []))
+        attributes.remove(changes.get("remove", []))
+        attributes.rename(changes.get("rename", {}))
+
+        action = attributes.action() if attributes.changed else None
+        if action is not None:
+            commit.add(action)
+
+        try:
+            await commit.commit()
+        except HTTPException:
+            # only retry without the .gitattributes, if the batch with it failed (and it isn't the only change)
+            if action is None or commit.committed < len(commit.batches) - 1:
+                raise
+            commit.batches[-1].remove(action)
+            if len(commit.batches[-1]) == 0:
+                commit.batches.pop()
+            await commit.commit()
+    finally:
+        if (action is not None or not added) and not any(
+            x is action for x in commit.committedActions()
+        ):
+            committed = getChanges(commit.committedActions(), change)
+            if any(committed.values()):
+                await updateGitAttributes(
+                    commit.target, commit.id, commit.branch, headers, **committed
+                )
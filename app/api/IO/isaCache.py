@@ -0,0 +1,84 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+# cache for the ISA files fetched from the datahubs
+# the entries are addressed by the blob id of the file (key is (target, id, blobId, isaType)), so they never get stale:
+# a changed file has a new blob id and therefore a new key, while unchanged files cost only the HEAD request
+class IsaCache:
+    def __init__(self, maxBytes: int):
+        self.maxBytes = maxBytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.entries: OrderedDict[tuple, tuple[bytes, str]] = OrderedDict()
+        self.lock = threading.Lock()
+
+    # returns the raw bytes and a fresh copy of the parsed json of the file (or None if it isn't cached)
+    def get(self, key: tuple) -> tuple[bytes, dict | list] | None:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+
+        # the json is stored as a string, so that the callers can't change the cached data
+        return entry[0], json.loads(entry[1])
+
+    def put(self, key: tuple, raw: bytes, parsed: dict | list):
+        data = json.dumps(parsed, default=str)
+        entrySize = len(raw) + len(data)
+
+        # skip files that would take up most of the cache
+        if entrySize > self.maxBytes // 2:
+            return
+
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old[0]) + len(old[1])
+
+            self.entries[key] = (raw, data)
+            self.size += entrySize
+
+            # remove the least recently used entries until the cache fits in its limit again
+            while self.size > self.maxBytes and self.entries:
+                _, removed = self.entries.popitem(last=False)
+                self.size -= len(removed[0]) + len(removed[1])
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self) -> dict:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "maxBytes": self.maxBytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hitRate": round(self.hits / total, 3) if total > 0 else 0,
+            }
+
+
+# returns the blob id of the file out of the headers of the HEAD request (None if the datahub didn't send one)
+def getBlobId(headers) -> str | None:
+    return headers.get("X-Gitlab-Blob-Id") or headers.get("X-Gitlab-Content-Sha256")
+
+
+# size of the cache in MB (default is 128 MB)
+isaCache = IsaCache(int(os.environ.get("ISA_CACHE_SIZE", 128)) * 1024 * 1024)
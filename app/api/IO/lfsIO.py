@@ -0,0 +1,214 @@
+import asyncio
+import logging
+import os
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+from starlette.status import HTTP_401_UNAUTHORIZED
+
+from app.api.IO.gitlabIO import getClient, getTarget, streamFile
+from app.api.jobs import reportProgress
+from app.api.retry import commitRetryStatus
+
+load_dotenv()
+
+# number of files uploaded to the lfs storage at the same time
+lfsConcurrency = int(os.environ.get("LFS_CONCURRENCY", 4))
+
+# maximum number of objects in a single request to the lfs batch api
+lfsBatchSize = int(os.environ.get("LFS_BATCH_SIZE", 100))
+
+lfsHeaders = {
+    "Accept": "application/vnd.git-lfs+json",
+    "Content-type": "application/vnd.git-lfs+json",
+}
+
+
+# the address of the lfs batch api of the arc (the token is sent with getLfsAuth, so that it isn't part of the
+# address and doesn't end up in the logs)
+def getBatchUrl(token, namespace: str) -> str:
+    target = getTarget(token["target"])
+    return f"https://{os.environ.get(target).split('//')[1]}/{namespace}.git/info/lfs/objects/batch"
+
+
+def getLfsAuth(token) -> tuple[str, str]:
+    return ("oauth2", token["gitlab"])
+
+
+# asks the lfs batch api for the upload or download actions of the objects (oid and size)
+# returns the objects of the response (with their actions or an error)
+async def requestBatch(
+    target: str,
+    batchUrl: str,
+    auth: tuple[str, str],
+    operation: str,
+    branch: str,
+    objects: list[dict],
+) -> list[dict]:
+    results = []
+    for start in range(0, len(objects), lfsBatchSize):
+        lfsJson = {
+            "operation": operation,
+            "objects": objects[start : start + lfsBatchSize],
+            "transfers": ["lfs-standalone-file", "basic"],
+            "ref": {"name": f"refs/heads/{branch}"},
+            "hash_algo": "sha256",
+        }
+        try:
+            r = await getClient(target).post(
+                batchUrl,
+                json=lfsJson,
+                headers=lfsHeaders,
+                auth=auth,
+                retries=3,
+                retryOn=commitRetryStatus,
+                backoff=5,
+            )
+        except Exception as e:
+            logging.error(e)
+            raise HTTPException(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                detail=f"Couldn't upload file to repo! Error: {e}",
+            )
+
+        if r.status_code == 401:
+            logging.warning(f"Client cookie not authorized!")
+            raise HTTPException(
+                status_code=HTTP_401_UNAUTHORIZED,
+                detail="Not authorized to upload a File! Log in again or refresh the session!",
+            )
+        try:
+            r.raise_for_status()
+            results += r.json()["objects"]
+        except Exception:
+            logging.error(f"Couldn't request the lfs {operation}! ERROR: {r.content}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Error: There was an error uploading the file. Please re-authorize and try again!",
+            )
+    return results
+
+
+# uploads a single file to the address given by the batch api (and verifies it, if the server requests it)
+async def uploadObject(target: str, entry: dict, file, size: int):
+    upload = entry["actions"]["upload"]
+    uploadHeader = dict(upload.get("header", {}))
+    uploadHeader.pop("Transfer-Encoding", None)
+    uploadHeader["Content-Length"] = str(size)
+
+    # start at the beginning of the file
+    file.seek(0, 0)
+    try:
+        res = await getClient(target).put(
+            upload["href"],
+            headers=uploadHeader,
+            content=streamFile(file),
+            timeout=None,
+        )
+        verify = entry["actions"].get("verify")
+        if res.is_success and verify is not None:
+            res = await getClient(target).post(
+                verify["href"],
+                headers={**lfsHeaders, **verify.get("header", {})},
+                json={"oid": entry["oid"], "size": size},
+                retries=3,
+            )
+    except Exception as e:
+        logging.error(e)
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=f"Couldn't upload file to repo! Error: {e}",
+        )
+
+    if not res.is_success:
+        logging.error(f"Couldn't upload to lfs storage! ERROR: {res.content}")
+        raise HTTPException(
+            status_code=res.status_code,
+            detail=f"Couldn't upload file to the lfs storage! Error: {res.content}",
+        )
+
+
+# uploads the files (file, size, sha256) to the lfs storage of the arc
+# the upload addresses of all files are requested at once, files already in the storage are skipped and the other
+# files are uploaded at the same time (limited by lfsConcurrency); afterwards all files are verified with one request
+async def uploadLfsFiles(
+    token,
+    namespace: str,
+    branch: str,
+    files: list[tuple[object, int, str]],
+    concurrency: int = lfsConcurrency,
+    progress: tuple[float, float] = (0.1, 0.5),
+) -> dict:
+    target = getTarget(token["target"])
+    batchUrl = getBatchUrl(token, namespace)
+    auth = getLfsAuth(token)
+
+    # files with the same content are the same lfs object
+    objects = {sha256: (file, size) for file, size, sha256 in files}
+    entries = await requestBatch(
+        target,
+        batchUrl,
+        auth,
+        "upload",
+        branch,
+        [{"oid": oid, "size": size} for oid, (_, size) in objects.items()],
+    )
+
+    for entry in entries:
+        if "error" in entry:
+            logging.error(f"Couldn't upload {entry['oid']} to lfs! ERROR: {entry}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Couldn't upload file to the lfs storage! Error: {entry['error'].get('message')}",
+            )
+
+    # if the file is already in the lfs storage, there is no upload action
+    uploads = [x for x in entries if "upload" in x.get("actions", {})]
+
+    start, end = progress
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    uploaded = []
+
+    async def upload(entry: dict):
+        async with semaphore:
+            file, size = objects[entry["oid"]]
+            await uploadObject(target, entry, file, size)
+            uploaded.append(entry["oid"])
+            reportProgress(
+                start + (end - start) * len(uploaded) / len(uploads),
+                f"Uploaded {len(uploaded)} of {len(uploads)} files to the LFS storage",
+            )
+
+    tasks = [asyncio.ensure_future(upload(x)) for x in uploads]
+    try:
+        await asyncio.gather(*tasks)
+    except:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    # check that all uploaded files are available in the lfs storage now
+    if len(uploaded) > 0:
+        missing = [
+            x["oid"]
+            for x in await requestBatch(
+                target,
+                batchUrl,
+                auth,
+                "download",
+                branch,
+                [{"oid": oid, "size": objects[oid][1]} for oid in uploaded],
+            )
+            if "error" in x or "download" not in x.get("actions", {})
+        ]
+        if len(missing) > 0:
+            logging.error(f"Files {missing} not found in LFS storage after the upload")
+            raise HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail=f"{len(missing)} files couldn't be found in the LFS storage after the upload! Please try again!",
+            )
+
+    logging.debug(
+        f"Uploaded {len(uploaded)} files to lfs, {len(objects) - len(uploaded)} were already stored"
+    )
+    return {"uploaded": len(uploaded), "skipped": len(objects) - len(uploaded)}
@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import os
+from typing import Awaitable, Callable
+from urllib.parse import quote
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+
+from app.api.IO.gitlabIO import getClient, getTree
+from app.api.IO.isaCache import isaCache
+
+load_dotenv()
+
+# number of isa files read at the same time while the index is built
+# (can be set for a single datahub, e.g. GITLAB_FREIBURG_ISA_CONCURRENCY)
+isaConcurrency = int(os.environ.get("ISA_CONCURRENCY", 8))
+
+
+def getIsaConcurrency(target: str) -> int:
+    return max(1, int(os.environ.get(f"{target}_ISA_CONCURRENCY", isaConcurrency)))
+
+
+# returns the names of the files listed in the row of the isa file containing the field
+# (e.g. "Study Assay File Name"; both "assays/assay1/isa.assay.xlsx" and "assay1/isa.assay.xlsx" return "assay1")
+def getLinkedNames(rows: list, field: str) -> list[str]:
+    for entry in rows:
+        if field in entry:
+            names = []
+            for x in entry[1:]:
+                if x is None or str(x).strip() == "":
+                    continue
+                parts = str(x).replace("\\", "/").split("/")
+                names.append(parts[-2] if len(parts) > 1 else parts[0])
+            return names
+    return []
+
+
+# the links between the isa files of an arc at one commit: the assays registered in every study and the
+# studies registered in the investigation; the index is built once and then only read (or updated with a commit)
+class LinkIndex:
+    def __init__(
+        self,
+        studies: dict[str, list[str]] | None = None,
+        investigation: list[str] | None = None,
+    ):
+        self.studies = studies or {}
+        self.investigation = investigation or []
+        self.relink()
+
+    # the studies of every assay (the reverse of the study links, for the lookups of an assay)
+    def relink(self):
+        self.assays: dict[str, list[str]] = {}
+        for study, assays in self.studies.items():
+            for assay in assays:
+                self.assays.setdefault(assay, []).append(study)
+
+    def setStudy(self, study: str, rows: list):
+        self.studies[study] = getLinkedNames(rows, "Study Assay File Name")
+        self.relink()
+
+    def setInvestigation(self, rows: list):
+        self.investigation = getLinkedNames(rows, "Study File Name")
+
+    # the names of the studies the assay is registered in
+    def studiesOf(self, assay: str) -> list[str]:
+        return self.assays.get(assay, [])
+
+    # whether the study is registered in the investigation
+    def inInvestigation(self, study: str) -> bool:
+        return study in self.investigation
+
+    def toJson(self) -> dict:
+        return {"studies": self.studies, "investigation": self.investigation}
+
+
+# the index is stored in the isa cache (addressed by the commit, so it never gets stale)
+def getCacheKey(target: str, id: int, commit: str) -> tuple:
+    return ("links", target, id, commit)
+
+
+# returns the id of the newest commit of the branch (None if the branch couldn't be found)
+async def getHeadCommit(target: str, id: int, branch: str, headers: dict) -> str | None:
+    try:
+        response = await getClient(target).get(
+            f"/api/v4/projects/{id}/repository/branches/{quote(branch, safe='')}",
+            headers=headers,
+            retries=3,
+        )
+        if response.is_success:
+            return response.json()["commit"]["id"]
+    except Exception as e:
+        logging.warning(f"Couldn't get the head commit of {id}! Error: {e}")
+    return None
+
+
+# returns the link index of the current commit of the branch; if it isn't cached yet, all studies and the
+# investigation are read (with the given function, returning the rows of the isa file at the given ref) and the
+# index is cached; the files are read at the commit, so the index matches it even if the branch moves meanwhile
+async def getLinkIndex(
+    target: str,
+    id: int,
+    branch: str,
+    headers: dict,
+    read: Callable[[str, str], Awaitable[list]],
+) -> LinkIndex:
+    commit = await getHeadCommit(target, id, branch, headers)
+    if commit is not None:
+        cached = isaCache.get(getCacheKey(target, id, commit))
+        if cached is not None:
+            return LinkIndex(**cached[1])
+
+    try:
+        studies = [
+            path.split("/")[-1]
+            for path, type in await getTree(
+                target, id, "studies", commit or branch, headers, recursive=False
+            )
+            if type == "tree"
+        ]
+    except HTTPException:
+        studies = []
+
+    # the studies and the investigation are read at the same time (limited per datahub)
+    semaphore = asyncio.Semaphore(getIsaConcurrency(target))
+
+    async def readFile(path: str) -> list:
+        async with semaphore:
+            try:
+                return await read(path, commit or branch)
+            except Exception:
+                # the file doesn't exist (or can't be read), so nothing is registered in it
+                logging.debug(f"Couldn't read {path} of {id}")
+                return []
+
+    paths = [f"studies/{x}/isa.study.xlsx" for x in studies]
+    rows = await asyncio.gather(
+        *[readFile(x) for x in paths + ["isa.investigation.xlsx"]]
+    )
+    index = LinkIndex(
+        {
+            study: getLinkedNames(studyRows, "Study Assay File Name")
+            for study, studyRows in zip(studies, rows)
+        },
+        getLinkedNames(rows[-1], "Study File Name"),
+    )
+
+    if commit is not None:
+        isaCache.put(getCacheKey(target, id, commit), b"", index.toJson())
+    logging.debug(f"Built the link index of {id} at {commit}")
+    return index
+
+
+# updates the cached index of the commit before with the changed studies and investigation (path -> rows) and
+# stores it for the new commit; returns False if there is no index for the commit before (it is built when needed)
+def updateLinkIndex(
+    target: str, id: int, parent: str, commit: str, files: dict[str, list]
+) -> bool:
+    cached = isaCache.get(getCacheKey(target, id, parent))
+    if cached is None:
+        return False
+
+    index = LinkIndex(**cached[1])
+    for path, rows in files.items():
+        if path == "isa.investigation.xlsx":
+            index.setInvestigation(rows)
+        elif path.startswith("studies/") and path.endswith("/isa.study.xlsx"):
+            index.setStudy(path.split("/")[-2], rows)
+
+    isaCache.put(getCacheKey(target, id, commit), b"", index.toJson())
+    return True
@@ -0,0 +1,182 @@
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from app.api.metrics import metrics
+
+load_dotenv()
+
+
+# append-only store for the request metrics
+# every worker writes the entries as json lines (ndjson) into its own segment file, so multiple workers never write
+# into the same file; the entries are buffered in memory and written in batches by a background thread
+class LogStore:
+    def __init__(
+        self,
+        path: str,
+        maxSize: int,
+        maxAge: float,
+        retention: float,
+        flushInterval: float = 2,
+        flushSize: int = 500,
+    ):
+        self.path = path
+        self.maxSize = maxSize
+        self.maxAge = maxAge
+        self.retention = retention
+        self.flushInterval = flushInterval
+        self.flushSize = flushSize
+
+        self.buffer: list[str] = []
+        self.lock = threading.Lock()
+        self.writeLock = threading.Lock()
+        self.wakeUp = threading.Event()
+        self.thread = None
+        self.pid = None
+        self.segment = None
+        self.segmentStart = 0
+        self.segmentCount = 0
+        # functions that are called by the background thread after every flush
+        self.onFlush = []
+
+    # add an entry to the buffer (the entry is written to disk by the background thread)
+    def write(self, entry: dict):
+        line = json.dumps(entry, default=str) + "\n"
+        with self.lock:
+            # (re)start the writer if it isn't running in this process yet
+            if self.pid != os.getpid():
+                self._start()
+            self.buffer.append(line)
+            full = len(self.buffer) >= self.flushSize
+        if full:
+            self.wakeUp.set()
+
+    def _start(self):
+        self.pid = os.getpid()
+        self.buffer = []
+        self.segment = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            self.wakeUp.wait(self.flushInterval)
+            self.wakeUp.clear()
+            self.flush()
+            for function in self.onFlush:
+                try:
+                    function()
+                except Exception as e:
+                    logging.warning(f"Error after writing the metrics log! ERROR: {e}")
+
+    # write all buffered entries into the current segment of the worker
+    def flush(self):
+        with self.lock:
+            lines, self.buffer = self.buffer, []
+        if len(lines) == 0:
+            return
+
+        with self.writeLock:
+            try:
+                self._rotate()
+                with open(self.segment, "a", encoding="utf-8") as log:
+                    log.write("".join(lines))
+            except Exception as e:
+                logging.warning(f"Error while writing the metrics log! ERROR: {e}")
+
+    # start a new segment if the current one is too big or too old
+    def _rotate(self):
+        if self.segment is not None and os.path.exists(self.segment):
+            if (
+                os.path.getsize(self.segment) < self.maxSize
+                and time.time() - self.segmentStart < self.maxAge
+            ):
+                return
+
+        os.makedirs(self.path, exist_ok=True)
+        self.segmentCount += 1
+        self.segmentStart = time.time()
+        self.segment = os.path.join(
+            self.path,
+            f"{time.strftime('%Y%m%d-%H%M%S', time.localtime())}-{os.getpid()}-{self.segmentCount}.ndjson",
+        )
+        self.cleanUp()
+
+    # remove the segments that are older than the retention time
+    def cleanUp(self):
+        for segment in self.segments():
+            try:
+                if time.time() - os.path.getmtime(segment) > self.retention:
+                    os.remove(segment)
+            except OSError:
+                pass
+
+    def segments(self) -> list[str]:
+        return sorted(glob.glob(os.path.join(self.path, "*.ndjson")))
+
+    # go through the entries of all workers one by one (without loading the whole log into memory)
+    def readLogs(self):
+        self.flush()
+        for segment in self.segments():
+            try:
+                with open(segment, "r", encoding="utf-8") as log:
+                    for line in log:
+                        try:
+                            yield json.loads(line)
+                        # skip lines that are currently written by another worker
+                        except json.JSONDecodeError:
+                            continue
+            except FileNotFoundError:
+                continue
+
+    def close(self):
+        if self.pid == os.getpid():
+            self.flush()
+
+
+logStore = LogStore(
+    os.environ.get("LOG_DIR", "logs"),
+    maxSize=int(os.environ.get("LOG_MAX_SIZE", 10)) * 1024 * 1024,
+    maxAge=float(os.environ.get("LOG_MAX_AGE", 24)) * 3600,
+    retention=float(os.environ.get("LOG_RETENTION", 7)) * 86400,
+)
+
+# save the aggregated metrics of this worker regularly, so that every worker can return the metrics of all workers
+logStore.onFlush.append(lambda: metrics.save(logStore.path))
+
+# write the remaining entries when the worker exits
+atexit.register(logStore.close)
+
+
+# log the metrics of the request (the details contain e.g. the route, transferred bytes and the timings)
+def writeLogJson(endpoint: str, status: int, startTime: float, error=None, **details):
+    try:
+        now = time.time()
+        metrics.record(
+            endpoint,
+            status,
+            now - startTime,
+            error,
+            now,
+            details.get("timings"),
+            details.get("retries"),
+        )
+        logStore.write(
+            {
+                "endpoint": endpoint,
+                "status": status,
+                "error": str(error),
+                "date": time.strftime("%d/%m/%Y - %H:%M:%S", time.localtime(now)),
+                "timestamp": now,
+                "response_time": now - startTime,
+                **details,
+            }
+        )
+    except:
+        logging.warning("Error while logging to log json!")
@@ -0,0 +1,167 @@
+import base64
+import logging
+from contextlib import AsyncExitStack
+from typing import Awaitable, Callable
+
+from fastapi import HTTPException, status
+
+from app.api.IO.commitIO import CommitBuilder
+from app.api.IO.excelIO import getIsaType, readIsaFile
+from app.api.IO.excelPool import runExcel
+from app.api.IO.isaCache import getBlobId
+from app.api.IO.linkIndex import updateLinkIndex
+from app.api.IO.workingCopyIO import workingCopies
+
+
+# the isa files changed by one request (e.g. an assay and the study and investigation it is synced into)
+# every file is downloaded once into a working copy, all edits are made there and the changed files are then
+# committed together with a single commit (instead of one commit per file)
+# the files are locked from the download until the end of the transaction (use it with "async with"); to prevent
+# deadlocks, the files are always loaded in the same order: assays, then studies, then the investigation
+class IsaTransaction:
+    def __init__(self, target: str, id: int, branch: str, headers: dict):
+        self.target = target
+        self.id = id
+        self.branch = branch
+        self.headers = {**headers, "Content-Type": "application/json"}
+        self.locks = AsyncExitStack()
+
+        # the working copies of the files (path -> (path of the copy, last commit of the file the copy is based on)),
+        # the parsed rows of the files and the changed files (path -> message)
+        self.copies: dict[str, tuple[str, str | None]] = {}
+        self.rows: dict[str, list] = {}
+        self.changes: dict[str, str] = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    # releases the locks and removes the working copies
+    async def close(self):
+        await self.locks.aclose()
+        for pathName, _ in self.copies.values():
+            workingCopies.remove(pathName)
+        self.copies.clear()
+
+    # the path of the working copy of the file
+    def localPath(self, path: str) -> str:
+        return self.copies[path][0]
+
+    # locks the file and makes sure there is a working copy of it (to edit it); the file is only downloaded (with
+    # the given function, which returns the raw file, its parsed content and the headers of the file) once
+    async def load(
+        self,
+        path: str,
+        download: Callable[[str], Awaitable[tuple[bytes, dict, dict]]],
+    ):
+        if path in self.copies:
+            return
+
+        await self.locks.enter_async_context(
+            workingCopies.lock(self.target, self.id, self.branch, path)
+        )
+        fileRaw, fileJson, headers = await download(path)
+        self.copies[path] = (
+            workingCopies.write(
+                self.target, self.id, self.branch, getBlobId(headers), path, fileRaw
+            ),
+            headers.get("X-Gitlab-Last-Commit-Id"),
+        )
+        self.rows[path] = fileJson["data"]
+
+    # returns the rows of the isa file; files without a working copy are read with the given function (in memory),
+    # files changed earlier in the transaction are read from their working copy
+    async def read(self, path: str, fetch: Callable[[str], Awaitable[list]]) -> list:
+        if path not in self.rows:
+            if path in self.copies:
+                self.rows[path] = await self.parse(path)
+            else:
+                self.rows[path] = await fetch(path)
+        return self.rows[path]
+
+    # the rows of the working copy of the isa file
+    async def parse(self, path: str) -> list:
+        fileJson = await runExcel(readIsaFile, self.localPath(path), getIsaType(path))
+        return fileJson["data"]
+
+    # marks the working copy of the file as changed; it will be part of the commit
+    def change(self, path: str, message: str):
+        self.rows.pop(path, None)
+        if path in self.changes:
+            message = f"{self.changes[path]}; {message}"
+        self.changes[path] = message
+
+    def __len__(self) -> int:
+        return len(self.changes)
+
+    # the message of the first change is the title of the commit, the other changes are listed below
+    def message(self) -> str:
+        messages = list(self.changes.values())
+        if len(messages) == 1:
+            return messages[0]
+        return messages[0] + "\n\n" + "\n".join(messages[1:])
+
+    # commits all changed files with a single commit; returns the content of the response
+    # raises 409 if one of the files was changed since its working copy was downloaded
+    async def commit(self) -> bytes | None:
+        if len(self.changes) == 0:
+            return None
+
+        commit = CommitBuilder(
+            self.target, self.id, self.branch, self.message(), self.headers, retries=5
+        )
+        for path in self.changes:
+            pathName, lastCommitId = self.copies[path]
+            with open(pathName, "rb") as file:
+                content = base64.b64encode(file.read()).decode("utf-8")
+            action = {
+                "action": "update",
+                "file_path": path,
+                "content": content,
+                "encoding": "base64",
+            }
+            # the commit fails if the file was changed in the meantime (instead of overwriting the change)
+            if lastCommitId:
+                action["last_commit_id"] = lastCommitId
+            commit.add(action)
+
+        try:
+            responses = await commit.commit()
+        except HTTPException as e:
+            if "changed since" in str(e.detail):
+                logging.warning(f"Files of {self.id} were changed in the meantime!")
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="The file was changed in the meantime! Please reload the file and try again!",
+                )
+            raise
+
+        logging.debug(f"Committed {list(self.changes)} to {self.id} with one commit")
+        await self.updateLinks(responses)
+        return responses[-1].content
+
+    # updates the link index of the commit before with the changed studies and investigation
+    # (if the commit was split into several batches, the index is built again when it is needed)
+    async def updateLinks(self, responses: list):
+        linkFiles = [
+            x
+            for x in self.changes
+            if x == "isa.investigation.xlsx" or getIsaType(x) == "study"
+        ]
+        if len(responses) != 1 or len(linkFiles) == 0:
+            return
+        try:
+            commitJson = responses[0].json()
+            parents = commitJson.get("parent_ids") or []
+            if len(parents) == 1:
+                updateLinkIndex(
+                    self.target,
+                    self.id,
+                    parents[0],
+                    commitJson["id"],
+                    {x: await self.parse(x) for x in linkFiles},
+                )
+        except Exception as e:
+            logging.warning(f"Couldn't update the link index of {self.id}! Error: {e}")
@@ -0,0 +1,381 @@
+import asyncio
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import threading
+import re
+import time
+import uuid
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+from starlette.concurrency import run_in_threadpool
+
+load_dotenv()
+
+# size of the blocks when reading the spool file
+readSize = 1024 * 1024
+
+# hours after the last received chunk until an upload expires and its files are removed
+sessionTtl = float(os.environ.get("UPLOAD_SESSION_TTL", 24)) * 3600
+
+# largest number of chunks of an upload (the state keeps a flag for every chunk)
+maxChunks = 100000
+
+# largest file that can be uploaded in chunks (in GB); the spool file is preallocated with this size at most
+maxUploadSize = float(os.environ.get("UPLOAD_MAX_SIZE", 100)) * 1024 * 1024 * 1024
+
+# file endings of the files belonging to an upload
+uploadSuffixes = (".upload", ".json", ".last")
+
+# running sha256 hashes of the uploads (spool path -> [hash, number of the next chunk to hash, id of the upload])
+# the chunks are hashed as they arrive in order, so only out of order chunks have to be read again at the end
+# (the id keeps the hash of an abandoned upload of the same file from being continued by a new upload)
+hashers: dict[str, list] = {}
+hashLock = threading.Lock()
+
+
+# a chunked upload of a file: every chunk is written at its offset into a single spool file
+# the state (received chunks, chunk size) is kept in a json file next to it, so that the chunks of an upload
+# can be received by different workers
+class UploadSession:
+    def __init__(self, key: str, totalChunks: int | None = None):
+        self.key = key
+        self.path = f"{getCacheDir()}/{key}"
+        self.spool = self.path + ".upload"
+        self.stateFile = self.path + ".json"
+        # the last chunk is stored separately until the size of the other chunks is known
+        self.lastChunk = self.path + ".last"
+        self.totalChunks = totalChunks
+
+    # open the state of the upload (locked for the other workers until the block ends)
+    # if create is False, the upload has to exist already (raises 404 otherwise)
+    @contextmanager
+    def state(self, create: bool = True):
+        if self.totalChunks is not None and self.totalChunks > maxChunks:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"The file has too many chunks! An upload can have at most {maxChunks} chunks!",
+            )
+        os.makedirs(os.path.dirname(self.stateFile), exist_ok=True)
+        if not create and not os.path.exists(self.stateFile):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Upload session not found! It may have expired, please start the upload again!",
+            )
+
+        with open(self.stateFile, "a+") as stateFile:
+            fcntl.flock(stateFile, fcntl.LOCK_EX)
+            try:
+                stateFile.seek(0)
+                content = stateFile.read()
+                state = json.loads(content) if content else None
+
+                if not create and (state is None or isExpired(state)):
+                    raise HTTPException(
+                        status_code=status.HTTP_404_NOT_FOUND,
+                        detail="Upload session not found! It may have expired, please start the upload again!",
+                    )
+
+                if self.totalChunks is None:
+                    self.totalChunks = state["totalChunks"]
+
+                # start a new upload if there is none yet (or if the number of chunks changed)
+                if state is None or state["totalChunks"] != self.totalChunks:
+                    state = self.newState()
+                yield state
+
+                state["updated"] = time.time()
+                stateFile.seek(0)
+                stateFile.truncate()
+                stateFile.write(json.dumps(state))
+            finally:
+                fcntl.flock(stateFile, fcntl.LOCK_UN)
+
+    def newState(self) -> dict:
+        return {
+            "totalChunks": self.totalChunks,
+            "chunkSize": None,
+            "size": None,
+            "received": "0" * self.totalChunks,
+            "finalizing": False,
+            "created": time.time(),
+            "uploadId": uuid.uuid4().hex,
+        }
+
+    # write the chunk at its position into the spool file; returns the state of the upload
+    def writeChunk(self, chunkNumber: int, data: bytes, create: bool = True) -> dict:
+        with self.state(create) as state:
+            if chunkNumber >= self.totalChunks:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Chunk {chunkNumber} is out of range! The file has {self.totalChunks} chunks!",
+                )
+            isLast = chunkNumber + 1 == self.totalChunks
+
+            if state["finalizing"]:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="The upload is already being finished!",
+                )
+
+            # the first chunk of a file that was received already starts the upload again (e.g. the upload of the
+            # same file was abandoned before), so the chunks of the earlier upload aren't mixed into the new file
+            if create and chunkNumber == 0 and state["received"][0] == "1":
+                logging.debug(f"Restarting the upload of {self.key}")
+                state.clear()
+                state.update(self.newState())
+                if os.path.exists(self.lastChunk):
+                    os.remove(self.lastChunk)
+
+            # every chunk except the last one has the same size
+            if not isLast or self.totalChunks == 1:
+                if state["chunkSize"] is None:
+                    # the file would be larger than allowed (checked before the spool file is allocated)
+                    if len(data) * self.totalChunks > maxUploadSize:
+                        raise HTTPException(
+                            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"The file is too large! Files can have at most {int(maxUploadSize / 1024**3)} GB!",
+                        )
+                    state["chunkSize"] = len(data)
+                    self.allocate(len(data) * self.totalChunks)
+                elif state["chunkSize"] != len(data) and not isLast:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail=f"Chunk {chunkNumber} has a different size than the other chunks!",
+                    )
+
+            if isLast:
+                state["lastSize"] = len(data)
+
+            if state["chunkSize"] is None:
+                with open(self.lastChunk, "wb") as last:
+                    last.write(data)
+            else:
+                self.writeAt(chunkNumber * state["chunkSize"], data)
+                # place the last chunk, now that its offset is known
+                if not isLast and os.path.exists(self.lastChunk):
+                    with open(self.lastChunk, "rb") as last:
+                        self.writeAt(
+                            (self.totalChunks - 1) * state["chunkSize"], last.read()
+                        )
+                    os.remove(self.lastChunk)
+
+            received = list(state["received"])
+            received[chunkNumber] = "1"
+            state["received"] = "".join(received)
+
+            # keep hashing if the chunk is the next one in order
+            if state["chunkSize"] is not None:
+                self.hashChunk(state.get("uploadId"), chunkNumber, data)
+
+            return dict(state)
+
+    # preallocate the spool file (falls back to a sparse file if the filesystem doesn't support it)
+    def allocate(self, size: int):
+        fd = os.open(self.spool, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            try:
+                os.posix_fallocate(fd, 0, size)
+            except (AttributeError, OSError):
+                os.ftruncate(fd, size)
+        finally:
+            os.close(fd)
+
+    def writeAt(self, offset: int, data: bytes):
+        fd = os.open(self.spool, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            os.pwrite(fd, data, offset)
+        finally:
+            os.close(fd)
+
+    def hashChunk(self, uploadId: str | None, chunkNumber: int, data: bytes):
+        with hashLock:
+            hasher = hashers.get(self.spool)
+            if hasher is None or hasher[2] != uploadId:
+                hasher = hashers[self.spool] = [hashlib.sha256(), 0, uploadId]
+            if hasher[1] == chunkNumber:
+                hasher[0].update(data)
+                hasher[1] += 1
+
+    # returns the numbers of the chunks that weren't received yet
+    def missing(self, state: dict) -> list[int]:
+        return [i for i, x in enumerate(state["received"]) if x != "1"]
+
+    # mark the upload as finalizing, so that it is only finished once (returns False if it is already finalizing)
+    def claim(self, create: bool = True) -> bool:
+        with self.state(create) as state:
+            if state["finalizing"] or len(self.missing(state)) > 0:
+                return False
+            state["finalizing"] = True
+            return True
+
+    # allow finishing the upload again (e.g. if the upload to the repo failed)
+    def release(self):
+        with self.state(False) as state:
+            state["finalizing"] = False
+
+    # finish the upload; returns the spool file (opened for reading), its size and the sha256 hash
+    def finalize(self):
+        with open(self.stateFile, "r") as stateFile:
+            state = json.load(stateFile)
+
+        chunkSize = state["chunkSize"]
+        size = chunkSize * (self.totalChunks - 1) + state["lastSize"]
+
+        # single chunk upload where the chunk was stored as last chunk
+        if os.path.exists(self.lastChunk):
+            with open(self.lastChunk, "rb") as last:
+                self.writeAt((self.totalChunks - 1) * chunkSize, last.read())
+            os.remove(self.lastChunk)
+
+        # cut off the preallocated space
+        os.truncate(self.spool, size)
+
+        with hashLock:
+            shasum, nextChunk, uploadId = hashers.pop(
+                self.spool, [hashlib.sha256(), 0, None]
+            )
+        # the hash belongs to an earlier upload of the file, so the whole file is hashed
+        if uploadId != state.get("uploadId"):
+            shasum, nextChunk = hashlib.sha256(), 0
+
+        spoolFile = open(self.spool, "rb")
+
+        # hash the rest of the file, that couldn't be hashed in order
+        spoolFile.seek(nextChunk * chunkSize)
+        while True:
+            data = spoolFile.read(readSize)
+            if not data:
+                break
+            shasum.update(data)
+
+        spoolFile.seek(0)
+        return spoolFile, size, shasum.hexdigest()
+
+    # remove all files of the upload
+    def remove(self):
+        with hashLock:
+            hashers.pop(self.spool, None)
+        for fileName in [self.spool, self.stateFile, self.lastChunk]:
+            try:
+                os.remove(fileName)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logging.warning(f"Failed to remove {fileName}! Error: {e}")
+
+
+def getCacheDir() -> str:
+    return f"{os.environ.get('BACKEND_SAVE')}cache"
+
+
+def isExpired(state: dict, now: float | None = None) -> bool:
+    if now is None:
+        now = time.time()
+    return state.get("updated", state["created"]) + sessionTtl < now
+
+
+# the progress of the upload (the received chunks as a string of 0 and 1 for every chunk and the missing chunks)
+def sessionStatus(sessionId: str, state: dict) -> dict:
+    received = state["received"]
+    return {
+        "sessionId": sessionId,
+        "name": state["meta"]["name"],
+        "path": state["meta"]["path"],
+        "totalChunks": state["totalChunks"],
+        "receivedChunks": received.count("1"),
+        "received": received,
+        "missing": [i for i, x in enumerate(received) if x != "1"],
+        "finalizing": state["finalizing"],
+        "expires": state.get("updated", state["created"]) + sessionTtl,
+    }
+
+
+# start a new upload session; the information of the file (project, path, branch, ...) is kept in the state
+def createSession(totalChunks: int, meta: dict, owner: str) -> tuple[str, dict]:
+    sessionId = uuid.uuid4().hex
+    session = UploadSession(f"session-{sessionId}", totalChunks)
+    with session.state() as state:
+        state["meta"] = meta
+        state["owner"] = owner
+    return sessionId, dict(state)
+
+
+# open an existing upload session of the user (raises 404 if the session doesn't exist or has expired)
+def getSession(sessionId: str, owner: str) -> tuple[UploadSession, dict]:
+    # the session id is part of the file name, so only ids created by createSession are accepted
+    if re.fullmatch(r"[0-9a-f]{32}", sessionId) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload session not found! It may have expired, please start the upload again!",
+        )
+    session = UploadSession(f"session-{sessionId}")
+    with session.state(False) as state:
+        if state.get("owner") != owner:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="The upload session belongs to another user!",
+            )
+        return session, dict(state)
+
+
+# remove the files of all uploads that didn't receive a chunk for longer than the ttl (abandoned uploads)
+# returns the number of removed uploads
+def cleanUploads(now: float | None = None) -> int:
+    if now is None:
+        now = time.time()
+    try:
+        fileNames = os.listdir(getCacheDir())
+    except FileNotFoundError:
+        return 0
+
+    removed = 0
+    keys = {
+        fileName.rsplit(".", 1)[0]
+        for fileName in fileNames
+        if fileName.endswith(uploadSuffixes)
+    }
+    for key in keys:
+        session = UploadSession(key)
+        try:
+            with open(session.stateFile, "r") as stateFile:
+                state = json.load(stateFile)
+            # the json file isn't an upload (any other json in the cache folder is kept)
+            if "totalChunks" not in state or "received" not in state:
+                continue
+            expired = isExpired(state, now)
+        except json.JSONDecodeError:
+            # an empty state is left over from an upload that was rejected with its first chunk (e.g. too large)
+            expired = os.path.getmtime(session.stateFile) + sessionTtl < now
+        except FileNotFoundError:
+            # spool files without a state are left over from a removed upload
+            expired = all(
+                os.path.getmtime(fileName) + sessionTtl < now
+                for fileName in [session.spool, session.lastChunk]
+                if os.path.exists(fileName)
+            )
+        except Exception as e:
+            logging.warning(f"Couldn't read the upload state of {key}! Error: {e}")
+            continue
+
+        if expired:
+            session.remove()
+            removed += 1
+
+    if removed > 0:
+        logging.info(f"Removed {removed} expired uploads")
+    return removed
+
+
+# remove the expired uploads regularly (runs in the background of every worker)
+async def cleanUploadsPeriodically(interval: float = 3600):
+    while True:
+        try:
+            await run_in_threadpool(cleanUploads)
+        except Exception as e:
+            logging.warning(f"Couldn't clean up the uploads! Error: {e}")
+        await asyncio.sleep(interval)
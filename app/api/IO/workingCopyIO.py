@@ -0,0 +1,86 @@
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from urllib.parse import quote
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+
+load_dotenv()
+
+# seconds a request waits for a file that is edited by another request, before it fails with 503
+lockTimeout = float(os.environ.get("WORKING_COPY_LOCK_TIMEOUT", 60))
+
+
+# the local copies of the isa files that are edited
+# every copy belongs to an arc, a branch and the version of the file it is based on (its blob id), so editors of
+# different branches or versions never write into the same file; the edits of the same file are queued with a lock
+# (per worker), while edits of different files or arcs run in parallel. The commits check that the file wasn't
+# changed since the version the copy is based on (e.g. by another worker)
+class WorkingCopyStore:
+    def __init__(self):
+        self.locks: dict[tuple, asyncio.Lock] = {}
+        # number of requests holding or waiting for the lock (unused locks are removed)
+        self.users: dict[tuple, int] = {}
+
+    def getFolder(self) -> str:
+        return f"{os.environ.get('BACKEND_SAVE')}work"
+
+    # the folder of the copies based on the version of the file (the process id keeps the workers apart)
+    def getVersionFolder(
+        self, target: str, id: int, branch: str, blobId: str | None
+    ) -> str:
+        return f"{self.getFolder()}/{target}-{id}/{quote(branch, safe='')}/{blobId or 'new'}-{os.getpid()}"
+
+    # writes the copy of the file and returns its path
+    def write(
+        self,
+        target: str,
+        id: int,
+        branch: str,
+        blobId: str | None,
+        path: str,
+        content: bytes,
+    ) -> str:
+        pathName = f"{self.getVersionFolder(target, id, branch, blobId)}/{path}"
+        os.makedirs(os.path.dirname(pathName), exist_ok=True)
+        with open(pathName, "wb") as file:
+            file.write(content)
+        return pathName
+
+    # removes the copy (and the folders of its version, if they are empty now)
+    def remove(self, pathName: str):
+        try:
+            os.remove(pathName)
+            os.removedirs(os.path.dirname(pathName))
+        except OSError:
+            pass
+
+    # the lock of the file in the branch of the arc; held while the file is edited and committed
+    @asynccontextmanager
+    async def lock(self, target: str, id: int, branch: str, path: str):
+        key = (target, id, branch, path)
+        lock = self.locks.setdefault(key, asyncio.Lock())
+        self.users[key] = self.users.get(key, 0) + 1
+        try:
+            try:
+                await asyncio.wait_for(lock.acquire(), lockTimeout)
+            except asyncio.TimeoutError:
+                logging.warning(f"Timed out waiting for {path} of {id} ({branch})")
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail=f"{path.split('/')[-1]} is currently edited by another request! Please try again later!",
+                )
+            try:
+                yield
+            finally:
+                lock.release()
+        finally:
+            self.users[key] -= 1
+            if self.users[key] == 0:
+                del self.users[key]
+                del self.locks[key]
+
+
+workingCopies = WorkingCopyStore()
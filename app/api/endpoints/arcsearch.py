@@ -1,6 +1,5 @@
 import json
 import logging
-import os
 from typing import List
 from urllib.parse import quote
 from fastapi import (
@@ -8,58 +7,47 @@ from fastapi import (
     HTTPException,
     status,
 )
-import requests
 
-from app.api.IO.excelIO import readIsaFile
-from app.api.endpoints.projects import getTarget, public_arcs
+from app.api.IO.excelIO import getIsaType, readIsaFile
+from app.api.IO.excelPool import runExcel
+from app.api.IO.gitlabIO import getClient, getTarget
+from app.api.IO.linkIndex import getLinkIndex
+from app.api.endpoints.projects import public_arcs
+from app.api.jobs import reportProgress, startJob
 from app.models.gitlab.projects import Projects, Project
 
 router = APIRouter()
 
 
-# read out linked assays inside of the given study file
-async def getStudyAssays(id: int, datahub: str, branch: str, study: str) -> list:
+# downloads the isa file and returns its rows (raises a 404 if the file doesn't exist)
+async def getIsaRows(id: int, datahub: str, branch: str, path: str) -> list:
     target = getTarget(datahub)
 
-    # check if study file is present
-    studiesHead = requests.head(
-        f"{os.environ.get(target)}/api/v4/projects/{id}/repository/files/{quote('studies/'+study+'/isa.study.xlsx', safe='')}?ref={branch}",
+    # check if the file is present
+    fileHead = await getClient(target).head(
+        f"/api/v4/projects/{id}/repository/files/{quote(path, safe='')}?ref={branch}",
     )
-    if studiesHead.ok:
-        # get the raw ISA file
-        fileRaw = requests.get(
-            f"{os.environ.get(target)}/api/v4/projects/{id}/repository/files/{quote('studies/'+study+'/isa.study.xlsx', safe='')}/raw?ref={branch}"
-        ).content
+    if not fileHead.is_success:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=f"{path} not found!"
+        )
 
-        # construct path to save on the backend
-        pathName = f"{os.environ.get('BACKEND_SAVE')}{datahub}-{id}/studies/{study}/isa.study.xlsx"
-
-        # create directory for the file to save it, skip if it exists already
-        os.makedirs(os.path.dirname(pathName), exist_ok=True)
-        with open(pathName, "wb") as file:
-            file.write(fileRaw)
-
-        logging.debug("Downloading File to " + pathName)
-
-        # read out isa file and create json (split string and read out the assay name)
-        fileJson = readIsaFile(pathName, "study")
-        for entry in fileJson["data"]:
-            if "Study Assay File Name" in entry:
-                entry.pop(0)
-                if entry[0] != None:
-                    if "/" in entry[0]:
-                        return [x.split("/")[-2] for x in entry if x != None]
-                    elif "\\" in entry[0]:
-                        return [x.split("\\")[-2] for x in entry if x != None]
-                else:
-                    return []
-    return []
+    # get the raw ISA file
+    fileRaw = (
+        await getClient(target).get(
+            f"/api/v4/projects/{id}/repository/files/{quote(path, safe='')}/raw?ref={branch}"
+        )
+    ).content
+
+    # read out isa file (in memory) and create json
+    fileJson = await runExcel(readIsaFile, fileRaw, getIsaType(path))
+    return fileJson["data"]
 
 
 # get the license data from the project
 async def getLicenseData(id: int, datahub: str):
-    request = requests.get(
-        f"{os.environ.get(getTarget(datahub))}/api/v4/projects/{id}?license=true",
+    request = await getClient(getTarget(datahub)).get(
+        f"/api/v4/projects/{id}?license=true",
     )
 
     try:
@@ -79,30 +67,20 @@ async def getInvestData(id: int, datahub: str, branch: str):
     target = getTarget(datahub)
 
     # check if isa investigation is present
-    identifierHead = requests.head(
-        f"{os.environ.get(target)}/api/v4/projects/{id}/repository/files/isa.investigation.xlsx?ref={branch}",
+    identifierHead = await getClient(target).head(
+        f"/api/v4/projects/{id}/repository/files/isa.investigation.xlsx?ref={branch}",
     )
 
-    if identifierHead.ok:
+    if identifierHead.is_success:
         # get the raw ISA file
-        fileRaw = requests.get(
-            f"{os.environ.get(target)}/api/v4/projects/{id}/repository/files/isa.investigation.xlsx/raw?ref={branch}"
+        fileRaw = (
+            await getClient(target).get(
+                f"/api/v4/projects/{id}/repository/files/isa.investigation.xlsx/raw?ref={branch}"
+            )
         ).content
 
-        # construct path to save on the backend
-        pathName = (
-            f"{os.environ.get('BACKEND_SAVE')}{datahub}-{id}/isa.investigation.xlsx"
-        )
-
-        # create directory for the file to save it, skip if it exists already
-        os.makedirs(os.path.dirname(pathName), exist_ok=True)
-        with open(pathName, "wb") as file:
-            file.write(fileRaw)
-
-        logging.debug("Downloading File to " + pathName)
-
-        # read out isa file and create json
-        fileJson = readIsaFile(pathName, "investigation")
+        # read out isa file (in memory) and create json
+        fileJson = await runExcel(readIsaFile, fileRaw, "investigation")
         for i, entry in enumerate(fileJson["data"]):
             if "Investigation Identifier" in entry:
                 result.insert(0, entry[1])
@@ -144,24 +122,24 @@ async def getInvestData(id: int, datahub: str, branch: str):
 # returns a dict containing the list of assays linked to its studies
 # if there are assays not linked to any study, they will be listed under "other"
 async def getAssayStudyRel(id: int, datahub: str, branch: str) -> dict:
-    assays = requests.get(
-        f"{os.environ.get(getTarget(datahub))}/api/v4/projects/{id}/repository/tree?path=assays&ref={branch}",
+    assays = await getClient(getTarget(datahub)).get(
+        f"/api/v4/projects/{id}/repository/tree?path=assays&ref={branch}",
     )
     assayList = []
-    if assays.ok:
+    if assays.is_success:
         assayList = [x["name"] for x in assays.json() if x["type"] == "tree"]
 
-    studies = requests.get(
-        f"{os.environ.get(getTarget(datahub))}/api/v4/projects/{id}/repository/tree?path=studies&ref={branch}",
+    # the assays of the studies are read from the link index of the current commit (built once per commit)
+    links = await getLinkIndex(
+        getTarget(datahub),
+        id,
+        branch,
+        {},
+        lambda path, ref: getIsaRows(id, datahub, ref, path),
     )
-    studyDict = {}
-    if studies.ok:
-        studyDict = {x["name"]: [] for x in studies.json() if x["type"] == "tree"}
-
-    for study in studyDict.keys():
-        studyAssayList = await getStudyAssays(id, datahub, branch, study)
-        studyDict[study] = studyAssayList
-        for assay in studyAssayList:
+    studyDict = {study: list(assays) for study, assays in links.studies.items()}
+    for assays in studyDict.values():
+        for assay in assays:
             if assay in assayList:
                 assayList.remove(assay)
 
@@ -180,7 +158,11 @@ async def getAssayStudyRel(id: int, datahub: str, branch: str) -> dict:
     description="Iterates through all available datahubs and creates a JSON containing information about all publicly available projects and ARCs (this process takes a while and should not be spammed!)",
     response_description="Large JSON file containing information about every publicly available ARC",
 )
-async def createArcJson():
+async def createArcJson(background: bool = False):
+    # run the collection as a background job, if requested (its state can be polled at /jobs/{jobId})
+    if background:
+        return startJob("createArcJson", None, createArcJson)
+
     fullProjects = []
     currentData = []
     with open("searchableArcs.json", "r", encoding="utf8") as old:
@@ -201,7 +183,9 @@ async def createArcJson():
                 return entry
 
     data: list[Projects] = []
-    for datahub in ["freiburg", "plantmicrobe", "tuebingen"]:
+    datahubs = ["freiburg", "plantmicrobe", "tuebingen"]
+    for hubNumber, datahub in enumerate(datahubs):
+        reportProgress(hubNumber / len(datahubs), f"Collecting the ARCs of {datahub}")
 
         projects = await public_arcs(datahub)
         pages = int(projects.headers.get("total-pages"))
@@ -214,6 +198,7 @@ async def createArcJson():
             data += Projects(projects=json.loads(projects.body)["projects"]).projects
 
         for i, arc in enumerate(data):
+            reportProgress((hubNumber + i / len(data)) / len(datahubs))
             # if the last activity was in 2025, we update the data
             # everything older is not updated and uses the old data (this saves time)
             if arc.last_activity_at.startswith("2025"):
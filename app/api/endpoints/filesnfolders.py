@@ -11,48 +11,57 @@ from fastapi import (
     File,
     Form,
     HTTPException,
+    Path,
     Query,
     Request,
     Response,
     status,
 )
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util import Retry
 
+from app.api.IO.commitIO import CommitBuilder
+from app.api.IO.gitattributesIO import (
+    commitWithGitAttributes,
+    getGitAttributes,
+    updateGitAttributes,
+)
+from app.api.IO.gitlabIO import (
+    getClient,
+    getTarget,
+    getTree,
+    streamFile,
+    streamJsonFile,
+)
+from app.api.IO.lfsIO import uploadLfsFiles
+from app.api.auth import getUserKey
+from app.api.jobs import reportProgress, startJob
+from app.api.retry import commitRetryStatus, uploadRetry
+from app.api.IO.uploadIO import (
+    UploadSession,
+    createSession,
+    getSession,
+    maxChunks,
+    sessionStatus,
+)
 from app.api.endpoints.projects import (
-    arc_path,
     fileSizeReadable,
     getData,
-    getTarget,
-    writeLogJson,
 )
-from app.models.gitlab.arc import Arc
 from app.models.gitlab.commit import Commit
 
-from app.models.gitlab.input import LFSUpload, folderContent
+from app.models.gitlab.input import (
+    LFSUpload,
+    folderContent,
+    uploadBatchContent,
+    uploadSessionContent,
+)
 
-import time
 import logging
 
 from dotenv import load_dotenv
 
+from starlette.concurrency import run_in_threadpool
 from starlette.status import HTTP_401_UNAUTHORIZED
 
-# request sessions to retry the important requests
-retry = Retry(
-    total=3,
-    backoff_factor=5,
-    status_forcelist=[500, 502, 429, 503, 504, 400],
-    allowed_methods=["POST", "PUT", "HEAD"],
-)
-
-adapter = HTTPAdapter(max_retries=retry)
-
-session = requests.Session()
-session.mount("https://", adapter)
-session.mount("http://", adapter)
-
 router = APIRouter()
 
 commonToken = Annotated[str, Depends(getData)]
@@ -63,9 +72,29 @@ tempfile.tempdir = os.environ.get("BACKEND_SAVE") + "cache"
 
 logging.getLogger("python_multipart").setLevel(logging.INFO)
 
+# files larger than this are uploaded with lfs, even if lfs wasn't requested (0 turns this off)
+lfsThreshold = float(os.environ.get("LFS_THRESHOLD", 50)) * 1024 * 1024
+
+
+# returns the namespace of the arc (needed for the lfs storage), if the client didn't send it
+async def getNamespace(target: str, id: int, headers: dict) -> str:
+    try:
+        project = await getClient(target).get(
+            f"/api/v4/projects/{id}", headers=headers, retries=3
+        )
+        return project.json()["path_with_namespace"]
+    except Exception as e:
+        logging.error(f"Couldn't get the namespace of {id}! Error: {e}")
+        raise HTTPException(400, "No Namespace was included!")
+
+
+# whether the file is too large to be uploaded without lfs
+def isLarge(size: int) -> bool:
+    return lfsThreshold > 0 and size > lfsThreshold
+
 
 # remove a file from gitattributes if its no longer lfs tracked (through either deletion or upload directly without lfs)
-def removeFromGitAttributes(
+async def removeFromGitAttributes(
     token,
     id: int,
     branch: str,
@@ -82,105 +111,418 @@ def removeFromGitAttributes(
     except:
         raise HTTPException(status_code=500, detail="Gitlab token was not found!")
 
-    for x in range(5):
-        time.sleep(x)
-        url = f"{os.environ.get(target)}/api/v4/projects/{id}/repository/files/.gitattributes/raw?ref={branch}"
-        attributes = requests.get(url, headers=headers)
-
-        if attributes.status_code == 404:
-            return "Nothing to remove!"
-
-        if attributes.ok:
-
-            content = attributes.text
-
-            found = False
-
-            if type(filepath) is list:
-                for i, entry in enumerate(filepath):
-                    if entry in content:
-                        found = True
-
-                    if rename:
-                        content = content.replace(
-                            f"{entry} filter=lfs diff=lfs merge=lfs -text\n",
-                            f"{newPath[i]} filter=lfs diff=lfs merge=lfs -text\n",
-                        )
-                        content = content.replace(
-                            f"{entry} filter=lfs diff=lfs merge=lfs\n",
-                            f"{newPath[i]} filter=lfs diff=lfs merge=lfs\n",
-                        )
-                    else:
-                        content = content.replace(
-                            f"{entry} filter=lfs diff=lfs merge=lfs -text\n", ""
-                        )
-                        content = content.replace(
-                            f"{entry} filter=lfs diff=lfs merge=lfs\n", ""
-                        )
-            else:
-                if filepath in content:
-                    found = True
-                content = content.replace(
-                    f"{filepath} filter=lfs diff=lfs merge=lfs -text\n", ""
+    if type(filepath) is not list:
+        filepath = [filepath]
+
+    # all paths are changed with a single update of the .gitattributes
+    if rename:
+        return await updateGitAttributes(
+            target, id, branch, headers, rename=dict(zip(filepath, newPath))
+        )
+    return await updateGitAttributes(target, id, branch, headers, remove=filepath)
+
+
+# uploads the assembled file to the repo (with or without lfs) and returns the response for the client
+async def commitUpload(
+    token,
+    tempFile,
+    size: int,
+    sha256: str,
+    name: str,
+    id: int,
+    path: str,
+    branch: str,
+    namespace: str,
+    lfs: LFSUpload,
+) -> Response | str:
+    target = getTarget(token["target"])
+    header = {
+        "Authorization": "Bearer " + token["gitlab"],
+        "Content-Type": "application/json",
+    }
+
+    # large files are uploaded with lfs (base64 commits of large files are slow and the datahub may reject them)
+    if lfs.value != "true" and isLarge(size):
+        logging.info(
+            f"Uploading {name} with LFS, as it is larger than {fileSizeReadable(int(lfsThreshold))}"
+        )
+        if namespace == "":
+            namespace = await getNamespace(target, id, header)
+        lfs = LFSUpload.true
+
+    ##########################
+    ## START UPLOAD PROCESS ##
+    ##########################
+
+    # the following code is for uploading a file with LFS (code based on ARCfs from Dataplant)
+    if lfs.value == "true":
+        if namespace == "":
+            logging.error(
+                f"No namespace included for file {name}. Namespace: {namespace}"
+            )
+            raise HTTPException(400, "No Namespace was included!")
+        logging.debug("Uploading file with lfs...")
+
+        headers = {
+            "Authorization": f"Bearer {token['gitlab']}",
+            "Content-Type": "application/json",
+        }
+
+        # loop the upload process in case there is an 400 error returned after uploading the pointer file
+        # (indicating that the file wasn't properly uploaded to lfs storage in the first place)
+        # the retries wait with an increasing delay without blocking the other requests of the worker
+        newEntry = False
+        async for attempt in uploadRetry.attempts(f"file {name}"):
+
+            ### Start upload process ###
+
+            # upload the file to the lfs storage (skipped, if the storage has the file already) and verify it
+            logging.debug("Uploading file to lfs...")
+            reportProgress(0.1, f"Uploading {name} to the LFS storage")
+            await uploadLfsFiles(
+                token,
+                namespace,
+                branch,
+                [(tempFile, size, sha256)],
+                progress=(0.1, 0.7),
+            )
+
+            logging.debug("Uploading pointer file to repo...")
+            reportProgress(0.7, f"Uploading the pointer file of {name}")
+
+            # build and upload the new pointer file to the arc
+            repoPath = quote(path, safe="")
+
+            pointerContent = (
+                f"version https://git-lfs.github.com/spec/v1\n"
+                f"oid sha256:{sha256}\nsize {size}\n"
+            )
+
+            try:
+                # check if file already exists
+                fileHead = await getClient(target).head(
+                    f"/api/v4/projects/{id}/repository/files/{repoPath}?ref={branch}",
+                    headers=header,
+                    retries=3,
+                    retryOn=commitRetryStatus,
+                    backoff=5,
+                )
+
+                # the path is added to the .gitattributes in the same commit as the pointer file
+                attributes = await getGitAttributes(target, id, branch, headers)
+                attributes.add([path])
+
+                # if file exists, it is updated, else it is created
+                actions = [
+                    {
+                        "action": "update" if fileHead.is_success else "create",
+                        "file_path": path,
+                        "content": pointerContent,
+                    }
+                ]
+                if attributes.changed:
+                    actions.append(attributes.action())
+
+                jsonData = {
+                    "branch": branch,
+                    "commit_message": "Create a new lfs pointer file",
+                    "actions": actions,
+                }
+
+                response = await getClient(target).post(
+                    f"/api/v4/projects/{id}/repository/commits",
+                    headers=headers,
+                    json=jsonData,
+                    retries=3,
+                    retryOn=commitRetryStatus,
+                    backoff=5,
                 )
-                content = content.replace(
-                    f"{filepath} filter=lfs diff=lfs merge=lfs\n", ""
+
+            except HTTPException:
+                raise
+            except Exception as e:
+                logging.error(e)
+                raise HTTPException(
+                    status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                    detail=f"Couldn't upload pointer file to repo! Error: {e}",
                 )
 
-            postUrl = f"{os.environ.get(target)}/api/v4/projects/{id}/repository/files/{quote('.gitattributes', safe='')}"
+            ## if the pointer upload fails, return an error or start again (in case of an 400 error, indicating gitlab being overwhelmed currently)
+            if not response.is_success and response.status_code != 400:
+                try:
+                    responseJson = response.json()
+                    responseJson["error"] != None
+                except:
+                    responseJson = {
+                        "error": "Couldn't upload file",
+                        "error_description": "Couldn't upload pointer file to the ARC!",
+                    }
+                logging.error(f"Couldn't upload to ARC! ERROR: {response.content}")
+                raise HTTPException(
+                    status_code=response.status_code,
+                    detail=f"Couldn't upload file to repo! Error: {responseJson['error']}, {responseJson['error_description']}",
+                )
 
-            attributeData = {
-                "branch": branch,
-                "content": content,
-                "commit_message": "Update .gitattributes",
-            }
-            if found:
+            else:
+                # return exception if upload failed after 3 tries
+                if (
+                    attempt.number >= 2 or attempt.last
+                ) and response.status_code == 400:
+                    logging.error(
+                        f"File {path} failed to upload after three tries! ERROR: {response.content}"
+                    )
+                    raise HTTPException(
+                        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                        detail=f"File {name} failed to upload after three tries! ERROR: {response.content}",
+                    )
+
+                attempt.response = response
+
+                # the file was verified in the lfs storage before, so the upload is finished
+                if response.is_success:
+                    newEntry = attributes.changed
+                    logging.debug(f"Upload of file {name} successful")
+                    break
+        else:
+            # the retries were stopped, as the datahub already failed too often
+            logging.error(f"File {path} failed to upload with LFS! No retries left")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"File {name} failed to upload! Please try again later!",
+            )
+
+        ### end of loop ###
+
+        # logging
+        logging.info(
+            f"Uploaded File {name} to repo {id} on path: {path} with LFS. Size: {fileSizeReadable(size)}"
+        )
+
+        # the .gitattributes was updated with the pointer file
+        if newEntry:
+            return f"File {name} was uploaded successfully!"
+        return f"File {name} was updated"
+
+    # if its a regular upload without git-lfs
+    else:
+        reportProgress(0.1, f"Uploading {name}")
+        async for attempt in uploadRetry.attempts(f"file {name}"):
+            # every attempt sends the full file again
+            tempFile.seek(0)
+
+            ### Start upload process ###
+            try:
+                # check if file already exists
+                fileHead = await getClient(target).head(
+                    f"/api/v4/projects/{id}/repository/files/{quote(path, safe='')}?ref={branch}",
+                    headers=header,
+                    retries=3,
+                    retryOn=commitRetryStatus,
+                    backoff=5,
+                )
+            except Exception as e:
+                logging.error(e)
+                raise HTTPException(
+                    status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                    detail=f"Couldn't upload file to repo! Error: {e}",
+                )
+
+            # if file doesn't exist, upload file
+            if not fileHead.is_success:
+                # gitlab needs to know the branch, the base64 encoded content, a commit message and the format of the encoding (normally base64)
+                # the json is streamed, so that the file isn't loaded into memory
+                payload, length = streamJsonFile(
+                    {
+                        "branch": str(branch),
+                        "commit_message": f"Upload of new File {name}",
+                    },
+                    tempFile,
+                    size,
+                )
                 try:
-                    response = requests.put(
-                        postUrl, headers=headers, data=json.dumps(attributeData)
+                    # create the file on the gitlab
+                    uploadResponse = await getClient(target).post(
+                        f"/api/v4/projects/{id}/repository/files/{quote(path, safe='')}",
+                        content=payload,
+                        headers={**header, "Content-Length": str(length)},
+                        retries=3,
+                        retryOn=commitRetryStatus,
+                        backoff=5,
                     )
                 except Exception as e:
                     logging.error(e)
-                    raise HTTPException(status_code=500, detail="ERROR: " + str(e))
-                if response.status_code == 400:
-                    logging.DEBUG("Retry removing entry from gitattributes")
-                if not response.ok and response.status_code != 400:
-                    return response.status_code
-
-                if response.ok:
-                    return "Replaced"
+                    uploadResponse = await getClient(target).post(
+                        f"/api/v4/projects/{id}/repository/files/{quote(path, safe='')}",
+                        content=payload,
+                        headers={**header, "Content-Length": str(length)},
+                    )
+                if not uploadResponse.is_success and uploadResponse.status_code != 400:
+                    logging.error(
+                        f"Couldn't upload file! ERROR: {uploadResponse.content}"
+                    )
+                    raise HTTPException(
+                        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                        detail=f"Couldn't upload file to repo! Error: {uploadResponse.content}",
+                    )
+
+                statusCode = status.HTTP_201_CREATED
+
+            # if file already exists, update the file
             else:
-                return "No entry found!"
-
-    # if after 5 tries the .gitattributes wasn't found or somehow else not modified, return an error
-    logging.warning(".gitattributes could not be modified for " + str(filepath))
-    raise HTTPException(
-        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-        detail="ERROR: .gitattributes could not be updated! Please add entry for file "
-        + str(filepath),
-    )
+                payload, length = streamJsonFile(
+                    {"branch": branch, "commit_message": f"Updating File {name}"},
+                    tempFile,
+                    size,
+                )
 
+                try:
+                    # update the file to the gitlab
+                    uploadResponse = await getClient(target).put(
+                        f"/api/v4/projects/{id}/repository/files/{quote(path, safe='')}",
+                        content=payload,
+                        headers={**header, "Content-Length": str(length)},
+                        retries=3,
+                        retryOn=commitRetryStatus,
+                        backoff=5,
+                    )
+                except Exception as e:
+                    logging.error(e)
+                    # update the file to the gitlab
+                    uploadResponse = await getClient(target).put(
+                        f"/api/v4/projects/{id}/repository/files/{quote(path, safe='')}",
+                        content=payload,
+                        headers={**header, "Content-Length": str(length)},
+                    )
+                if not uploadResponse.is_success and uploadResponse.status_code != 400:
+                    logging.error(
+                        f"Couldn't upload file! ERROR: {uploadResponse.content}"
+                    )
+                    raise HTTPException(
+                        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                        detail=f"Couldn't upload file to repo! Error: {uploadResponse.content}",
+                    )
 
-def fileChecker(id: int, name: str, totalChunks: int):
-    for chunk in range(totalChunks):
-        try:
-            f = open(
-                f"{os.environ.get('BACKEND_SAVE')}cache/{id}-{name}.{chunk}",
-                "rb",
-            )
-            f.close()
-        except FileNotFoundError:
-            logging.error(
-                f"File {id}-{name}.{chunk} not found in cache! Requesting new upload!"
-            )
+                statusCode = status.HTTP_200_OK
+
+            # if file was uploaded, break the loop
+            if uploadResponse.is_success:
+                logging.debug(f"Upload of file {name} successful")
+                break
+
+            # return exception if upload failed after 3 tries
+            attempt.response = uploadResponse
+            if (
+                attempt.number >= 2 or attempt.last
+            ) and uploadResponse.status_code == 400:
+                logging.error(
+                    f"File {path} failed to upload after three tries! ERROR: {uploadResponse.content}"
+                )
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail=f"File {name} failed to upload after three tries! ERROR: {uploadResponse.content}",
+                )
+        else:
+            # the retries were stopped, as the datahub already failed too often
+            logging.error(f"File {path} failed to upload! No retries left")
             raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail=f"File {id}-{name}.{chunk} not found in cache! Please upload the file again!",
-                headers={
-                    "missing-package": str(chunk),
-                    "Access-Control-Expose-Headers": "missing-package",
-                },
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"File {name} failed to upload! Please try again later!",
+            )
+
+        # logging
+        logging.info(f"Uploaded new File {name} to repo {id} on path: {path}")
+        await removeFromGitAttributes(token, id, branch, path)
+        response = Response(f"Uploaded new File {name}", statusCode)
+        return response
+
+
+# uploads the files of several upload sessions (meta data of the session, file, size, sha256) with a single commit
+# the lfs files are uploaded with one lfs batch request and added to the .gitattributes in the same commit
+async def commitUploadBatch(
+    token,
+    files: list[tuple[dict, object, int, str]],
+    id: int,
+    branch: str,
+    message: str,
+) -> str:
+    target = getTarget(token["target"])
+    header = {
+        "Authorization": "Bearer " + token["gitlab"],
+        "Content-Type": "application/json",
+    }
+
+    # large files are uploaded with lfs
+    routed = [x for x in files if x[0]["lfs"] != "true" and isLarge(x[2])]
+    if len(routed) > 0:
+        namespace = next(
+            (x[0]["namespace"] for x in files if x[0]["lfs"] == "true"), ""
+        ) or await getNamespace(target, id, header)
+        files = [
+            (
+                ({**x[0], "lfs": "true", "namespace": namespace}, *x[1:])
+                if x in routed
+                else x
             )
+            for x in files
+        ]
+
+    lfsFiles = [x for x in files if x[0]["lfs"] == "true"]
+    if len(lfsFiles) > 0:
+        reportProgress(0.1, f"Uploading {len(lfsFiles)} files to the LFS storage")
+        await uploadLfsFiles(
+            token,
+            lfsFiles[0][0]["namespace"],
+            branch,
+            [(file, size, sha256) for _, file, size, sha256 in lfsFiles],
+        )
+
+    # list the folders of the files once to know which files already exist (instead of a request per file)
+    reportProgress(0.5, "Checking for existing files")
+    existing = set()
+    for folder in {os.path.dirname(x[0]["path"]) for x in files}:
+        try:
+            tree = await getTree(target, id, folder, branch, header, recursive=False)
+        except HTTPException as e:
+            # the folder doesn't exist yet
+            if e.status_code != status.HTTP_404_NOT_FOUND:
+                raise
+            tree = []
+        existing.update(path for path, entryType in tree if entryType == "blob")
+
+    commit = CommitBuilder(
+        target,
+        id,
+        branch,
+        message or f"Upload of {len(files)} files",
+        header,
+        progress=(0.6, 1.0),
+    )
+
+    # the files are only read (and encoded) when they are added to the commit, and every batch is committed as
+    # soon as it is full, so only the files of a single batch are kept in memory
+    def getActions():
+        for meta, file, size, sha256 in files:
+            action = {
+                "action": "update" if meta["path"] in existing else "create",
+                "file_path": meta["path"],
+            }
+            if meta["lfs"] == "true":
+                action["content"] = (
+                    f"version https://git-lfs.github.com/spec/v1\n"
+                    f"oid sha256:{sha256}\nsize {size}\n"
+                )
+            else:
+                file.seek(0)
+                action["content"] = base64.b64encode(file.read()).decode("utf-8")
+                action["encoding"] = "base64"
+            yield action
+
+    await commitWithGitAttributes(commit, header, "upload", getActions())
+
+    logging.info(
+        f"Uploaded {len(files)} files to repo {id} with {len(commit.batches)} commits"
+    )
+    return f"Successfully uploaded {len(files)} files!"
 
 
 # either caches the given byte chunk or uploads the file directly (merges all the byte chunks as soon as all have been received)
@@ -188,7 +530,7 @@ def fileChecker(id: int, name: str, totalChunks: int):
     "/uploadFile",
     summary="Uploads the given file to the repo (with or without lfs)",
     status_code=status.HTTP_201_CREATED,
-    description="Uploads the given file to the ARC on the given path. ARCmanager utilizes chunking of files for better upload. All chunks have to be numbered and the total number of chunks has to be provided(defaults are provided). For files larger than 50mb it is recommended to use LFS (set to true).",
+    description="Uploads the given file to the ARC on the given path. ARCmanager utilizes chunking of files for better upload. All chunks have to be numbered and the total number of chunks has to be provided(defaults are provided). Files larger than 50mb are uploaded with LFS automatically (configured by LFS_THRESHOLD).",
     response_description="Response of the commit from Gitlab.",
 )
 async def uploadFile(
@@ -202,9 +544,9 @@ async def uploadFile(
     namespace: Annotated[str, Form()] = "",
     lfs: Annotated[LFSUpload, Form()] = "false",
     chunkNumber: Annotated[int, Form(ge=0)] = 0,
-    totalChunks: Annotated[int, Form(ge=1)] = 1,
+    totalChunks: Annotated[int, Form(ge=1, le=maxChunks)] = 1,
+    background: Annotated[bool, Form()] = False,
 ) -> Commit | dict | str:
-    startTime = time.time()
     try:
         target = getTarget(token["target"])
         header = {
@@ -213,684 +555,387 @@ async def uploadFile(
         }
     except:
         logging.error(f"uploadFile Request couldn't be processed! Body: {request.body}")
-        writeLogJson(
-            "uploadFile",
-            400,
-            startTime,
-            f"uploadFile Request couldn't be processed! Body: {request.body}",
-        )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Couldn't read request"
         )
 
-    tempFile = tempfile.TemporaryFile(
-        prefix="temp_",
-        dir=os.environ.get("BACKEND_SAVE") + "cache",
-    )
-
-    f = open(
-        f"{os.environ.get('BACKEND_SAVE')}cache/{id}-{name}.{chunkNumber}",
-        "wb",
-    )
-    f.write(file)
-    f.close()
+    # write the chunk directly at its position into the spool file of the upload
+    session = UploadSession(f"{id}-{name}", totalChunks)
+    uploadState = await run_in_threadpool(session.writeChunk, chunkNumber, file)
 
     # check every 20th chunk if the token is still valid
     if chunkNumber % 20 == 0:
         # check if user token is still valid by requesting the repository tree
-        arc = requests.head(
-            f"{os.environ.get(target)}/api/v4/projects/{id}/repository/tree?per_page=100&ref={branch}",
+        arc = await getClient(target).head(
+            f"/api/v4/projects/{id}/repository/tree?per_page=100&ref={branch}",
             headers=header,
         )
-        if not arc.ok:
+        if not arc.is_success:
             logging.warning(f"Token expired!")
-            writeLogJson(
-                "uploadFile",
-                arc.status_code,
-                startTime,
-                f"Token expired!",
-            )
             raise HTTPException(
                 status_code=arc.status_code,
                 detail=f"Token expired! Please refresh your session!",
             )
 
-    # open up a new hash
-    shasum = hashlib.new("sha256")
+    missing = session.missing(uploadState)
 
-    # if the current chunk is the last chunk, merge all chunks together and write them into the temporary file
-    if chunkNumber + 1 == totalChunks:
-        fileChecker(id, name, totalChunks)
+    # if the current chunk is the last chunk, all chunks have to be there
+    if chunkNumber + 1 == totalChunks and len(missing) > 0:
+        logging.error(
+            f"File {id}-{name}.{missing[0]} not found in cache! Requesting new upload!"
+        )
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"File {id}-{name}.{missing[0]} not found in cache! Please upload the file again!",
+            headers={
+                "missing-package": str(missing[0]),
+                "Access-Control-Expose-Headers": "missing-package",
+            },
+        )
 
-        for chunk in range(totalChunks):
-            f = open(
-                f"{os.environ.get('BACKEND_SAVE')}cache/{id}-{name}.{chunk}",
-                "rb",
+    # as soon as all chunks were received (in any order), finish the upload (only one request does this)
+    if len(missing) == 0 and await run_in_threadpool(session.claim):
+        try:
+            tempFile, size, sha256 = await run_in_threadpool(session.finalize)
+        except Exception as e:
+            session.remove()
+            logging.error(f"Couldn't assemble the file {name}! Error: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Couldn't assemble the file {name}! Please upload the file again!",
             )
-            chunkData = f.read()
-            shasum.update(chunkData)
-            tempFile.write(chunkData)
 
-            f.close()
+        # the spool file stays readable until the upload is finished, even if it is removed already
+        session.remove()
 
-            # clear the chunk
+        async def upload():
             try:
-                os.remove(f"{os.environ.get('BACKEND_SAVE')}cache/{id}-{name}.{chunk}")
-            except:
-                logging.warning(f"Failed to remove chunk {chunk} for file {name}")
-
-        # go to the start of the tempfile
-        tempFile.seek(0)
-
-        ##########################
-        ## START UPLOAD PROCESS ##
-        ##########################
-
-        # the following code is for uploading a file with LFS (code based on ARCfs from Dataplant)
-        if lfs.value == "true":
-            if namespace == "":
-                logging.error(
-                    f"No namespace included for file {name}. Namespace: {namespace}"
+                return await commitUpload(
+                    token,
+                    tempFile,
+                    size,
+                    sha256,
+                    name,
+                    id,
+                    path,
+                    branch,
+                    namespace,
+                    lfs,
                 )
-                raise HTTPException(400, "No Namespace was included!")
-            logging.debug("Uploading file with lfs...")
-
-            # jump to file end and read the size
-            tempFile.seek(0, 2)
+            finally:
+                tempFile.close()
 
-            size = tempFile.tell()
-
-            # get the hash string
-            sha256 = shasum.hexdigest()
-
-            # build together the lfs upload json and header
-            lfsJson = {
-                "operation": "upload",
-                "objects": [{"oid": f"{sha256}", "size": f"{size}"}],
-                "transfers": ["lfs-standalone-file", "basic"],
-                "ref": {"name": f"refs/heads/{branch}"},
-                "hash_algo": "sha256",
-            }
-
-            lfsHeaders = {
-                "Accept": "application/vnd.git-lfs+json",
-                "Content-type": "application/vnd.git-lfs+json",
-            }
+        # upload the file as a background job, if requested (its state can be polled at /jobs/{jobId})
+        if background:
+            try:
+                return startJob("uploadFile", token, upload)
+            except:
+                tempFile.close()
+                raise
+        return await upload()
 
-            headers = {
-                "Authorization": f"Bearer {token['gitlab']}",
-                "Content-Type": "application/json",
-            }
+    # log the current progress and return the confirmation
+    else:
+        logging.debug(
+            f"Received chunk {chunkNumber+1} of {totalChunks} for file {name}"
+        )
+        return Response(
+            json.dumps(
+                f"Received chunk {chunkNumber+1} of {totalChunks} for file {name}"
+            ),
+            202,
+        )
 
-            # construct the download url for the file
-            downloadUrl = f"https://oauth2:{token['gitlab']}@{os.environ.get(target).split('//')[1]}/{namespace}.git/info/lfs/objects/batch"
 
-            x = -1
+# starts a resumable upload; the chunks can then be sent in any order (and in parallel) to /uploadSession/{sessionId}/{chunkNumber}
+@router.post(
+    "/uploadSession",
+    summary="Starts a resumable upload of a file",
+    status_code=status.HTTP_201_CREATED,
+    description="Starts an upload session for the file on the given path. The chunks of the file can be sent in any order and in parallel. The status of the session shows which chunks were received, so that only the missing chunks have to be sent again. Sessions expire if no chunk was received for a while.",
+    response_description="Status of the new upload session.",
+)
+async def createUploadSession(
+    request: Request, token: commonToken, upload: uploadSessionContent
+) -> dict:
+    try:
+        target = getTarget(token["target"])
+        header = {
+            "Authorization": "Bearer " + token["gitlab"],
+            "Content-Type": "application/json",
+        }
+    except:
+        logging.error(
+            f"createUploadSession Request couldn't be processed! Body: {request.body}"
+        )
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Couldn't read request"
+        )
 
-            # loop the upload process in case there is an 400 error returned after uploading the pointer file
-            # (indicating that the file wasn't properly uploaded to lfs storage in the first place)
-            while x < 3:
-                x += 1
-                # sleep for 10 secs increasing for each retry
-                time.sleep(x * 10)
-                if x > 0:
-                    logging.debug("Retry " + str(x) + " for file: " + name)
+    if upload.lfs.value == "true" and upload.namespace == "":
+        raise HTTPException(400, "No Namespace was included!")
 
-                ### Start upload process ###
+    # check if user token is still valid by requesting the repository tree
+    arc = await getClient(target).head(
+        f"/api/v4/projects/{upload.id}/repository/tree?per_page=100&ref={upload.branch}",
+        headers=header,
+    )
+    if not arc.is_success:
+        logging.warning(f"Token expired!")
+        raise HTTPException(
+            status_code=arc.status_code,
+            detail=f"Token expired! Please refresh your session!",
+        )
 
-                # asking gitlab for the lfs address for the file
-                try:
-                    r = session.post(downloadUrl, json=lfsJson, headers=lfsHeaders)
-                except Exception as e:
-                    logging.error(e)
-                    writeLogJson("uploadFile", 504, startTime, e)
-                    raise HTTPException(
-                        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
-                        detail=f"Couldn't upload file to repo! Error: {e}",
-                    )
+    meta = {
+        "name": upload.name,
+        "id": upload.id,
+        "path": upload.path,
+        "branch": upload.branch,
+        "namespace": upload.namespace,
+        "lfs": upload.lfs.value,
+    }
+    sessionId, state = await run_in_threadpool(
+        createSession, upload.totalChunks, meta, getUserKey(token)
+    )
+    logging.debug(
+        f"Started upload session {sessionId} for file {upload.name} with {upload.totalChunks} chunks"
+    )
+    return sessionStatus(sessionId, state)
 
-                if r.status_code == 401:
-                    logging.warning(f"Client cookie not authorized!")
-                    writeLogJson(
-                        "uploadFile",
-                        401,
-                        startTime,
-                        f"Client not authorized to create new ISA!",
-                    )
-                    raise HTTPException(
-                        status_code=HTTP_401_UNAUTHORIZED,
-                        detail="Not authorized to upload a File! Log in again or refresh the session!",
-                    )
-                logging.debug("Uploading file to lfs...")
-                try:
-                    result = r.json()
-                except:
-                    writeLogJson(
-                        "uploadFile",
-                        500,
-                        startTime,
-                        f"Error while uploading the file to lfs storage!",
-                    )
-                    raise HTTPException(
-                        status_code=500,
-                        detail="Error: There was an error uploading the file. Please re-authorize and try again!",
-                    )
 
-                try:
-                    logging.debug(name + ": " + str(sha256))
-                except:
-                    logging.debug("Result for " + name + ": " + str(r.content))
+# receives a single chunk of an upload session
+@router.put(
+    "/uploadSession/{sessionId}/{chunkNumber}",
+    summary="Uploads a chunk of a resumable upload",
+    status_code=status.HTTP_200_OK,
+    description="Writes the chunk with the given number (starting at 0) into the upload session. All chunks except the last one need to have the same size. Chunks can be sent again, e.g. after a failed request.",
+    response_description="Status of the upload session.",
+)
+async def uploadChunk(
+    token: commonToken,
+    sessionId: str,
+    chunkNumber: Annotated[int, Path(ge=0)],
+    file: Annotated[bytes, File()],
+) -> dict:
+    session, state = await run_in_threadpool(getSession, sessionId, getUserKey(token))
+    state = await run_in_threadpool(session.writeChunk, chunkNumber, file, False)
+    return sessionStatus(sessionId, state)
 
-                # test if there is a change in the file
-                testFail = False
-                try:
-                    test = result["objects"][0]["actions"]
 
-                # if the file is the same, there will be no "actions" attribute and therefore no upload is needed
-                except:
-                    testFail = True
-
-                # if the file is new or includes new content, upload it
-                if not testFail:
-                    # get header data
-                    header_upload = result["objects"][0]["actions"]["upload"]["header"]
-
-                    # get the upload link
-                    urlUpload = result["objects"][0]["actions"]["upload"]["href"]
-                    header_upload.pop("Transfer-Encoding")
-
-                    # start at the beginning of the file
-                    tempFile.seek(0, 0)
-
-                    # upload the full file to lfs
-                    try:
-                        res = session.put(
-                            urlUpload,
-                            headers=header_upload,
-                            data=tempFile,
-                            stream=True,
-                        )
-                    except Exception as e:
-                        logging.error(e)
-                        writeLogJson("uploadFile", 504, startTime, e)
-                        raise HTTPException(
-                            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
-                            detail=f"Couldn't upload file to repo! Error: {e}",
-                        )
-
-                    if not res.ok:
-                        try:
-                            responseJson = res.json()
-                            responseJson["error"] != None
-                        except:
-                            responseJson = {
-                                "error": "Couldn't upload file",
-                                "error_description": "Couldn't upload file to the lfs storage!",
-                            }
-                            logging.error(
-                                f"Couldn't upload to ARC! ERROR: {res.content}"
-                            )
-                            writeLogJson(
-                                "uploadFile",
-                                400,
-                                startTime,
-                                f"Couldn't upload to ARC! ERROR: {res.content}",
-                            )
-                            raise HTTPException(
-                                status_code=res.status_code,
-                                detail=f"Couldn't upload file to repo! Error: {responseJson['error']}, {responseJson['error_description']}",
-                            )
-
-                logging.debug("Uploading pointer file to repo...")
-
-                # build and upload the new pointer file to the arc
-                repoPath = quote(path, safe="")
-
-                postUrl = f"{os.environ.get(target)}/api/v4/projects/{id}/repository/files/{repoPath}"
-
-                pointerContent = (
-                    f"version https://git-lfs.github.com/spec/v1\n"
-                    f"oid sha256:{sha256}\nsize {size}\n"
-                )
+# returns the received and missing chunks of an upload session
+@router.get(
+    "/uploadSession/{sessionId}",
+    summary="Returns the status of a resumable upload",
+    status_code=status.HTTP_200_OK,
+    description="Returns the received chunks of the upload session (as a string of 0 and 1 for every chunk) and the numbers of the missing chunks.",
+    response_description="Status of the upload session.",
+)
+async def getUploadSession(token: commonToken, sessionId: str) -> dict:
+    session, state = await run_in_threadpool(getSession, sessionId, getUserKey(token))
+    return sessionStatus(sessionId, state)
 
-                jsonData = {
-                    "branch": branch,
-                    "content": pointerContent,
-                    "commit_message": "Create a new lfs pointer file",
-                }
 
-                try:
-                    # check if file already exists
-                    fileHead = session.head(
-                        f"{os.environ.get(target)}/api/v4/projects/{id}/repository/files/{repoPath}?ref={branch}",
-                        headers=header,
-                    )
+# assembles the file of the upload session and uploads it to the repo
+@router.post(
+    "/uploadSession/{sessionId}/finalize",
+    summary="Finishes a resumable upload",
+    status_code=status.HTTP_201_CREATED,
+    description="Uploads the file of the upload session to the repo as soon as all chunks were received. If the upload to the repo fails, the session is kept and the request can be repeated.",
+    response_description="Response of the commit from Gitlab.",
+)
+async def finalizeUploadSession(
+    token: commonToken, sessionId: str, background: bool = False
+) -> Commit | dict | str:
+    session, state = await run_in_threadpool(getSession, sessionId, getUserKey(token))
+    meta = state["meta"]
 
-                    # if file exists, a put request is needed as the file is being updated
-                    if fileHead.ok:
-                        response = session.put(postUrl, headers=headers, json=jsonData)
+    missing = session.missing(state)
+    if len(missing) > 0:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"{len(missing)} of {state['totalChunks']} chunks of the file {meta['name']} are missing!",
+            headers={
+                "missing-package": str(missing[0]),
+                "Access-Control-Expose-Headers": "missing-package",
+            },
+        )
 
-                    # if the head request fails, the files does not exist yet and needs to be send via http POST
-                    else:
-                        response = session.post(postUrl, headers=headers, json=jsonData)
+    if not await run_in_threadpool(session.claim, False):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"The upload of the file {meta['name']} is already being finished!",
+        )
 
-                except Exception as e:
-                    logging.error(e)
-                    if fileHead.ok:
-                        response = requests.put(postUrl, headers=headers, json=jsonData)
-                    else:
-                        response = requests.post(
-                            postUrl, headers=headers, json=jsonData
-                        )
-
-                ## if the pointer upload fails, return an error or start again (in case of an 400 error, indicating gitlab being overwhelmed currently)
-                if not response.ok and response.status_code != 400:
-                    try:
-                        responseJson = response.json()
-                        responseJson["error"] != None
-                    except:
-                        responseJson = {
-                            "error": "Couldn't upload file",
-                            "error_description": "Couldn't upload pointer file to the ARC!",
-                        }
-                    logging.error(f"Couldn't upload to ARC! ERROR: {response.content}")
-                    writeLogJson(
-                        "uploadFile",
-                        response.status_code,
-                        startTime,
-                        f"Couldn't upload to ARC! ERROR: {response.content}",
-                    )
-                    raise HTTPException(
-                        status_code=response.status_code,
-                        detail=f"Couldn't upload file to repo! Error: {responseJson['error']}, {responseJson['error_description']}",
-                    )
+    try:
+        tempFile, size, sha256 = await run_in_threadpool(session.finalize)
+    except Exception as e:
+        session.remove()
+        logging.error(f"Couldn't assemble the file {meta['name']}! Error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Couldn't assemble the file {meta['name']}! Please upload the file again!",
+        )
 
-                else:
-                    # return exception if upload failed after 3 tries
-                    if x >= 2 and response.status_code == 400:
-                        logging.error(
-                            f"File {path} failed to upload after three tries! ERROR: {response.content}"
-                        )
-                        writeLogJson(
-                            "uploadFile",
-                            500,
-                            startTime,
-                            f"Couldn't upload to ARC after three tries! ERROR: {response.content}",
-                        )
-                        raise HTTPException(
-                            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                            detail=f"File {name} failed to upload after three tries! ERROR: {response.content}",
-                        )
-
-                    # check if response actually was successful, else the loop will start back at the beginning
-                    if response.ok:
-                        # check availability to make sure, the file also was properly uploaded in the lfs
-                        logging.debug("Checking availability for " + name)
-                        lfsJsonDown = {
-                            "operation": "download",
-                            "objects": [{"oid": f"{sha256}", "size": f"{size}"}],
-                            "transfers": ["lfs-standalone-file", "basic"],
-                            "ref": {"name": f"refs/heads/{branch}"},
-                            "hash_algo": "sha256",
-                        }
-
-                        # request the download url for the file from lfs
-                        try:
-                            downloadCheck = session.post(downloadUrl, json=lfsJsonDown)
-                        except Exception as e:
-                            logging.error(e)
-                            writeLogJson("uploadFile", 504, startTime, e)
-                            raise HTTPException(
-                                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
-                                detail=f"Couldn't check file status! Error: {e}",
-                            )
-                        if downloadCheck.ok:
-                            try:
-                                # get the download url and header for the file
-                                checkResult = downloadCheck.json()
-                                try:
-                                    header_download = checkResult["objects"][0][
-                                        "actions"
-                                    ]["download"]["header"]
-                                except:
-                                    header_download = {
-                                        "Authorization": f"Bearer {token['gitlab']}"
-                                    }
-                                urlDownload = checkResult["objects"][0]["actions"][
-                                    "download"
-                                ]["href"]
-
-                                try:
-                                    # make a simple head request just to see whether the file is existing (we dont need to download it)
-                                    lfsCheck = session.head(
-                                        urlDownload,
-                                        headers=header_download,
-                                    )
-                                except Exception as e:
-                                    logging.error(e)
-                                    writeLogJson("uploadFile", 504, startTime, e)
-                                    raise HTTPException(
-                                        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
-                                        detail=f"Couldn't check file status! Error: {e}",
-                                    )
-
-                                # if file is available, break loop
-                                if lfsCheck.ok:
-                                    logging.debug(f"Upload of file {name} successful")
-                                    x = 3
-
-                                # if file is missing it indicates a failed upload attempt -> go back to the start of the loop
-                                else:
-                                    logging.warning(
-                                        f"File {name} not found in LFS storage, retrying upload process..."
-                                    )
-                            except Exception as e:
-                                logging.error(e)
-
-            ### end of loop ###
-
-            # logging
-            logging.info(
-                f"Uploaded File {name} to repo {id} on path: {path} with LFS. Size: {fileSizeReadable(size)}"
+    async def upload():
+        try:
+            response = await commitUpload(
+                token,
+                tempFile,
+                size,
+                sha256,
+                meta["name"],
+                meta["id"],
+                meta["path"],
+                meta["branch"],
+                meta["namespace"],
+                LFSUpload(meta["lfs"]),
             )
+        except:
+            # keep the received chunks, so that finishing the upload can be tried again
+            await run_in_threadpool(session.release)
+            raise
+        finally:
+            tempFile.close()
+
+        session.remove()
+        return response
+
+    # upload the file as a background job, if requested (its state can be polled at /jobs/{jobId})
+    if background:
+        try:
+            return startJob("uploadFile", token, upload)
+        except:
+            tempFile.close()
+            await run_in_threadpool(session.release)
+            raise
+    return await upload()
 
-            ### loop gitattributes ###
-
-            for y in range(5):
-                ## add filename to the gitattributes
-                url = f"{os.environ.get(target)}/api/v4/projects/{id}/repository/files/.gitattributes/raw?ref={branch}"
-
-                newLine = f"{path} filter=lfs diff=lfs merge=lfs -text\n"
-
-                # get the .gitattributes (for every retry sleep 2 sec in between)
-                try:
-                    if y > 0:
-                        logging.debug("Retrying retrieving .gitattributes...")
-                    time.sleep(y * 2)
-                    getResponse = session.get(url, headers=headers)
-                except Exception as e:
-                    logging.error(e)
-                    writeLogJson("uploadFile", 504, startTime, e)
-                    raise HTTPException(
-                        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
-                        detail=f"Couldn't update .gitattributes! Error: {e}",
-                    )
-
-                postUrl = f"{os.environ.get(target)}/api/v4/projects/{id}/repository/files/{quote('.gitattributes', safe='')}"
 
-                # if .gitattributes doesn't exist, create a new one
-                if not getResponse.ok:
-                    content = newLine
+# assembles the files of several upload sessions and uploads them to the repo with a single commit
+@router.post(
+    "/uploadBatch",
+    summary="Uploads the files of several resumable uploads with one commit",
+    status_code=status.HTTP_201_CREATED,
+    description="Uploads the files of the given upload sessions (see /uploadSession) to the repo with a single commit, as soon as all their chunks were received. All sessions need to belong to the same ARC and branch. LFS files are uploaded with one request to the LFS storage and added to the .gitattributes in the same commit. If the upload fails, the sessions are kept and the request can be repeated.",
+    response_description="Number of uploaded files.",
+)
+async def uploadBatch(
+    token: commonToken, batch: uploadBatchContent, background: bool = False
+) -> str | dict:
+    owner = getUserKey(token)
+    if len(set(batch.sessions)) != len(batch.sessions):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="The upload sessions must not be listed twice!",
+        )
 
-                    attributeData = {
-                        "branch": branch,
-                        "content": content,
-                        "commit_message": "Create .gitattributes",
-                    }
+    sessions = []
+    for sessionId in batch.sessions:
+        session, state = await run_in_threadpool(getSession, sessionId, owner)
+        meta = state["meta"]
+        if meta["id"] != batch.id or meta["branch"] != batch.branch:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"The file {meta['name']} belongs to another ARC or branch!",
+            )
+        missing = session.missing(state)
+        if len(missing) > 0:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"{len(missing)} of {state['totalChunks']} chunks of the file {meta['name']} are missing!",
+            )
+        sessions.append((session, meta))
 
-                    try:
-                        response = requests.post(
-                            postUrl, headers=headers, data=json.dumps(attributeData)
-                        )
-                    except Exception as e:
-                        logging.error(e)
-                        writeLogJson("uploadFile", 504, startTime, e)
-                        raise HTTPException(
-                            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
-                            detail=f"Couldn't upload file to repo! Error: {e}",
-                        )
-
-                    if not response.ok:
-                        try:
-                            responseJson = response.json()
-                            responseJson["error"] != None
-                        except:
-                            responseJson = {
-                                "error": "Couldn't create .gitattributes",
-                                "error_description": "Couldn't create .gitattributes file in ARC!",
-                            }
-                        logging.error(
-                            f"Couldn't upload to ARC! ERROR: {response.content}"
-                        )
-                        writeLogJson(
-                            "uploadFile",
-                            response.status_code,
-                            startTime,
-                            f"Couldn't upload to ARC! ERROR: {response.content}",
-                        )
-                        raise HTTPException(
-                            status_code=response.status_code,
-                            detail=f"Couldn't upload file to repo! Error: {responseJson['error']}, {responseJson['error_description']}",
-                        )
-
-                    logging.debug("Uploading .gitattributes to repo...")
-                    writeLogJson(
-                        "uploadFile",
-                        201,
-                        startTime,
-                    )
+    paths = [meta["path"] for _, meta in sessions]
+    if len(set(paths)) != len(paths):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Several files have the same path!",
+        )
+    namespaces = {meta["namespace"] for _, meta in sessions if meta["lfs"] == "true"}
+    if len(namespaces) > 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="The LFS files belong to different namespaces!",
+        )
 
-                    return f"File {name} was uploaded successfully!"
+    # claim all sessions, so that they aren't finished by another request at the same time
+    claimed = []
 
-                # if filename is not inside the .gitattributes, add it
-                elif not name in getResponse.text:
-                    content = getResponse.text + "\n" + newLine
+    async def release():
+        for session in claimed:
+            await run_in_threadpool(session.release)
 
-                    attributeData = {
-                        "branch": branch,
-                        "content": content,
-                        "commit_message": "Update .gitattributes",
-                    }
+    for session, meta in sessions:
+        if not await run_in_threadpool(session.claim, False):
+            await release()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"The upload of the file {meta['name']} is already being finished!",
+            )
+        claimed.append(session)
 
-                    try:
-                        response = requests.put(
-                            postUrl, headers=headers, data=json.dumps(attributeData)
-                        )
-                    except Exception as e:
-                        logging.error(e)
-                        writeLogJson("uploadFile", 504, startTime, e)
-                        raise HTTPException(
-                            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
-                            detail=f"Couldn't upload file to repo! Error: {e}",
-                        )
-
-                    if not response.ok and response.status_code != 400:
-                        try:
-                            responseJson = response.json()
-                            responseJson["error"] != None
-                        except:
-                            responseJson = {
-                                "error": "Couldn't add to .gitattributes",
-                                "error_description": "Couldn't add file to .gitattributes!",
-                            }
-                        logging.error(
-                            f"Couldn't add to .gitattributes! ERROR: {response.content}"
-                        )
-                        writeLogJson(
-                            "uploadFile",
-                            400,
-                            startTime,
-                            f"Couldn't add to .gitattributes! ERROR: {response.content}",
-                        )
-                        raise HTTPException(
-                            status_code=status.HTTP_400_BAD_REQUEST,
-                            detail=f"Couldn't add file to .gitattributes! Error: {responseJson['error']}, {responseJson['error_description']}",
-                        )
-
-                    elif response.ok:
-                        logging.debug("Updating .gitattributes...")
-                        writeLogJson(
-                            "uploadFile",
-                            201,
-                            startTime,
-                        )
-
-                        return f"File {name} was uploaded successfully!"
-                # if filename already exists, do nothing and just return "File updated"
-                else:
-                    writeLogJson(
-                        "uploadFile",
-                        200,
-                        startTime,
-                    )
-                    return f"File {name} was updated"
+    files = []
 
-        # if its a regular upload without git-lfs
-        else:
-            x = -1
-            while x < 3:
-                x += 1
-                # sleep for 10 secs increasing for each retry
-                time.sleep(x * 10)
-                if x > 0:
-                    logging.debug("Retry " + str(x) + " for file: " + name)
-
-                ### Start upload process ###
-                try:
-                    # check if file already exists
-                    fileHead = session.head(
-                        f"{os.environ.get(target)}/api/v4/projects/{id}/repository/files/{quote(path, safe='')}?ref={branch}",
-                        headers=header,
-                    )
-                except Exception as e:
-                    logging.error(e)
-                    writeLogJson("uploadFile", 504, startTime, e)
-                    raise HTTPException(
-                        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
-                        detail=f"Couldn't upload file to repo! Error: {e}",
-                    )
+    def close():
+        for _, file, _, _ in files:
+            file.close()
 
-                # if file doesn't exist, upload file
-                if not fileHead.ok:
-                    # gitlab needs to know the branch, the base64 encoded content, a commit message and the format of the encoding (normally base64)
-                    payload = {
-                        "branch": str(branch),
-                        # base64 encoding of the isa file
-                        "content": base64.b64encode(tempFile.read()).decode("utf-8"),
-                        "commit_message": f"Upload of new File {name}",
-                        "encoding": "base64",
-                    }
-                    try:
-                        # create the file on the gitlab
-                        uploadResponse = session.post(
-                            f"{os.environ.get(target)}/api/v4/projects/{id}/repository/files/{quote(path, safe='')}",
-                            data=json.dumps(payload),
-                            headers=header,
-                        )
-                    except Exception as e:
-                        logging.error(e)
-                        uploadResponse = requests.post(
-                            f"{os.environ.get(target)}/api/v4/projects/{id}/repository/files/{quote(path, safe='')}",
-                            data=json.dumps(payload),
-                            headers=header,
-                        )
-                    if not uploadResponse.ok and uploadResponse.status_code != 400:
-                        logging.error(
-                            f"Couldn't upload file! ERROR: {uploadResponse.content}"
-                        )
-                        writeLogJson(
-                            "uploadFile",
-                            504,
-                            startTime,
-                            f"Couldn't upload file! ERROR: {uploadResponse.content}",
-                        )
-                        raise HTTPException(
-                            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
-                            detail=f"Couldn't upload file to repo! Error: {uploadResponse.content}",
-                        )
-
-                    statusCode = status.HTTP_201_CREATED
-
-                # if file already exists, update the file
-                else:
-                    payload = {
-                        "branch": branch,
-                        # base64 encoding of the isa file
-                        "content": base64.b64encode(tempFile.read()).decode("utf-8"),
-                        "commit_message": f"Updating File {name}",
-                        "encoding": "base64",
-                    }
-
-                    try:
-                        # update the file to the gitlab
-                        uploadResponse = session.put(
-                            f"{os.environ.get(target)}/api/v4/projects/{id}/repository/files/{quote(path, safe='')}",
-                            data=json.dumps(payload),
-                            headers=header,
-                        )
-                    except Exception as e:
-                        logging.error(e)
-                        # update the file to the gitlab
-                        uploadResponse = session.put(
-                            f"{os.environ.get(target)}/api/v4/projects/{id}/repository/files/{quote(path, safe='')}",
-                            data=json.dumps(payload),
-                            headers=header,
-                        )
-                    if not uploadResponse.ok and uploadResponse.status_code != 400:
-                        logging.error(
-                            f"Couldn't upload file! ERROR: {uploadResponse.content}"
-                        )
-                        writeLogJson(
-                            "uploadFile",
-                            504,
-                            startTime,
-                            f"Couldn't upload file! ERROR: {uploadResponse.content}",
-                        )
-                        raise HTTPException(
-                            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
-                            detail=f"Couldn't upload file to repo! Error: {uploadResponse.content}",
-                        )
-
-                    statusCode = status.HTTP_200_OK
-
-                # if file was uploaded, break the loop
-                if uploadResponse.ok:
-                    logging.debug(f"Upload of file {name} successful")
-                    x = 3
-
-                # return exception if upload failed after 3 tries
-                if x >= 2 and uploadResponse.status_code == 400:
-                    logging.error(
-                        f"File {path} failed to upload after three tries! ERROR: {uploadResponse.content}"
-                    )
-                    writeLogJson(
-                        "uploadFile",
-                        500,
-                        startTime,
-                        f"Couldn't upload to ARC after three tries! ERROR: {uploadResponse.content}",
-                    )
-                    raise HTTPException(
-                        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                        detail=f"File {name} failed to upload after three tries! ERROR: {uploadResponse.content}",
-                    )
+    for session, meta in sessions:
+        try:
+            tempFile, size, sha256 = await run_in_threadpool(session.finalize)
+        except Exception as e:
+            close()
+            claimed.remove(session)
+            session.remove()
+            await release()
+            logging.error(f"Couldn't assemble the file {meta['name']}! Error: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Couldn't assemble the file {meta['name']}! Please upload the file again!",
+            )
+        files.append((meta, tempFile, size, sha256))
 
-            # logging
-            logging.info(f"Uploaded new File {name} to repo {id} on path: {path}")
-            removeFromGitAttributes(token, id, branch, path)
-            response = Response(f"Uploaded new File {name}", statusCode)
-            writeLogJson(
-                "uploadFile",
-                statusCode,
-                startTime,
+    async def upload():
+        try:
+            response = await commitUploadBatch(
+                token, files, batch.id, batch.branch, batch.message
             )
-            return response
+        except:
+            # keep the received chunks, so that the upload can be tried again
+            await release()
+            raise
+        finally:
+            close()
+
+        for session, _ in sessions:
+            session.remove()
+        return response
+
+    # upload the files as a background job, if requested (its state can be polled at /jobs/{jobId})
+    if background:
+        try:
+            return startJob("uploadBatch", token, upload)
+        except:
+            close()
+            await release()
+            raise
+    return await upload()
 
-    # log the current progress and return the confirmation
-    else:
-        writeLogJson(
-            "uploadFile",
-            202,
-            startTime,
-        )
-        logging.debug(
-            f"Received chunk {chunkNumber+1} of {totalChunks} for file {name}"
-        )
-        return Response(
-            json.dumps(
-                f"Received chunk {chunkNumber+1} of {totalChunks} for file {name}"
-            ),
-            202,
-        )
+
+# cancels an upload session and removes the received chunks
+@router.delete(
+    "/uploadSession/{sessionId}",
+    summary="Cancels a resumable upload",
+    status_code=status.HTTP_200_OK,
+    description="Cancels the upload session and removes all received chunks.",
+    response_description="Upload session was removed.",
+)
+async def deleteUploadSession(token: commonToken, sessionId: str) -> str:
+    session, state = await run_in_threadpool(getSession, sessionId, getUserKey(token))
+    await run_in_threadpool(session.remove)
+    return f"Upload of {state['meta']['name']} was cancelled!"
 
 
 # deletes the specific file on the given path
@@ -908,7 +953,6 @@ async def deleteFile(
     token: commonToken,
     branch: str = "main",
 ):
-    startTime = time.time()
     try:
         header = {
             "Authorization": "Bearer " + token["gitlab"],
@@ -917,12 +961,6 @@ async def deleteFile(
         target = getTarget(token["target"])
     except:
         logging.warning(f"Client is not authorized to delete the file!")
-        writeLogJson(
-            "deleteFile",
-            401,
-            startTime,
-            f"Client is not authorized to delete the file!",
-        )
         raise HTTPException(
             status_code=HTTP_401_UNAUTHORIZED,
             detail="You are not authorized to delete this file! Please authorize or refresh session!",
@@ -930,27 +968,20 @@ async def deleteFile(
 
     payload = {"branch": branch, "commit_message": "Delete file " + path}
 
-    deletion = requests.delete(
-        f"{os.environ.get(target)}/api/v4/projects/{id}/repository/files/{quote(path, safe='')}",
+    deletion = await getClient(target).delete(
+        f"/api/v4/projects/{id}/repository/files/{quote(path, safe='')}",
         headers=header,
-        data=json.dumps(payload),
+        content=json.dumps(payload),
     )
 
-    if not deletion.ok:
+    if not deletion.is_success:
         logging.error(f"Couldn't delete file {path} ! ERROR: {deletion.content}")
-        writeLogJson(
-            "deleteFile",
-            400,
-            startTime,
-            f"Couldn't delete file {path} ! ERROR: {deletion.content}",
-        )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Couldn't delete file on repo! Error: {deletion.content}",
         )
     logging.info(f"Deleted file on path: {path}")
-    removeFromGitAttributes(token, id, branch, path)
-    writeLogJson("deleteFile", 200, startTime)
+    await removeFromGitAttributes(token, id, branch, path)
     return "Successfully deleted the file!"
 
 
@@ -968,8 +999,8 @@ async def deleteFolder(
     request: Request,
     token: commonToken,
     branch: str = "main",
+    background: bool = False,
 ):
-    startTime = time.time()
     try:
         header = {
             "Authorization": "Bearer " + token["gitlab"],
@@ -978,92 +1009,44 @@ async def deleteFolder(
         target = getTarget(token["target"])
     except:
         logging.warning(f"Client is not authorized to delete the folder!")
-        writeLogJson(
-            "deleteFolder",
-            401,
-            startTime,
-            f"Client is not authorized to delete the folder!",
-        )
         raise HTTPException(
             status_code=HTTP_401_UNAUTHORIZED,
             detail="You are not authorized to delete this folder! Please authorize or refresh session!",
         )
 
-    # get the number of pages
-    arcPath = session.head(
-        f"{os.environ.get(target)}/api/v4/projects/{id}/repository/tree?path={path}&ref={branch}",
-        headers=header,
-    )
-    if not arcPath.ok:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Path {path} does not exist! Please reload your Arc!",
+    # run the deletion as a background job, if requested (its state can be polled at /jobs/{jobId})
+    if background:
+        return startJob(
+            "deleteFolder",
+            token,
+            lambda: deleteFolder(id, path, request, token, branch),
         )
 
-    pages = int(arcPath.headers["X-Total-Pages"])
-
-    # list of all files to be deleted
-    payload = []
-
-    # list of file names, that will be deleted from gitattributes after the remove request was successful
-    fileNames: list[str] = []
-
-    for page in range(1, pages + 1):
-
-        # get the content of the folder
-        folder = await arc_path(id, request, path, token, page)
+    reportProgress(0.1, f"Listing the files of {path}")
 
-        # async function filling the payload with all files recursively found in the folder
-        async def prepareJson(folder: Arc):
-            for entry in Arc(Arc=json.loads(folder.body)["Arc"]).Arc:
-                # if its a file, add it to the list
-                if entry.type == "blob":
-                    payload.append({"action": "delete", "file_path": entry.path})
-                    fileNames.append(entry.path)
+    # list all files in the folder (including the sub folders)
+    tree = await getTree(target, id, path, branch, header)
 
-                # if its a folder, search the folder for any file
-                elif entry.type == "tree":
-                    await prepareJson(
-                        await arc_path(id, request, entry.path, token, page)
-                    )
-
-                # this should never be the case, so pass along anything here
-                else:
-                    pass
-
-        # start searching and filling the payload
-        await prepareJson(folder)
+    # list of all files to be deleted
+    payload = [{"action": "delete", "file_path": x} for x, y in tree if y == "blob"]
 
-    # the final json containing all files to be deleted
-    requestData = {
-        "branch": branch,
-        "commit_message": "Deleting all content from " + path,
-        "actions": payload,
-    }
+    if len(payload) == 0:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Path {path} does not exist! Please reload your Arc!",
+        )
 
-    deleteRequest = requests.post(
-        f"{os.environ.get(target)}/api/v4/projects/{id}/repository/commits",
-        headers=header,
-        data=json.dumps(requestData),
+    # the files are deleted in one or more commits (depending on the number of files)
+    commit = CommitBuilder(
+        target, id, branch, "Deleting all content from " + path, header
     )
+    commit.extend(payload)
 
-    if not deleteRequest.ok:
-        logging.error(f"Couldn't delete folder {path} ! ERROR: {deleteRequest.content}")
-        writeLogJson(
-            "deleteFolder",
-            400,
-            startTime,
-            f"Couldn't delete folder {path} ! ERROR: {deleteRequest.content}",
-        )
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Couldn't delete folder on repo! Error: {deleteRequest.content}",
-        )
-    else:
-        removeFromGitAttributes(token, id, branch, fileNames)
+    # the files are removed from the .gitattributes in the same commit
+    reportProgress(0.2, f"Deleting {len(payload)} files")
+    await commitWithGitAttributes(commit, header, "remove")
 
     logging.info(f"Deleted folder on path: {path}")
-    writeLogJson("deleteFolder", 200, startTime)
     return "Successfully deleted the folder!"
 
 
@@ -1076,7 +1059,6 @@ async def deleteFolder(
     response_description="Response of the commit from Gitlab.",
 )
 async def createFolder(request: Request, folder: folderContent, token: commonToken):
-    startTime = time.time()
     try:
         header = {
             "Authorization": "Bearer " + token["gitlab"],
@@ -1086,12 +1068,6 @@ async def createFolder(request: Request, folder: folderContent, token: commonTok
         target = getTarget(token["target"])
     except:
         logging.warning(f"Client not authorized to create new folder!")
-        writeLogJson(
-            "createFolder",
-            401,
-            startTime,
-            f"Client not authorized to create new folder!",
-        )
         raise HTTPException(
             status_code=HTTP_401_UNAUTHORIZED,
             detail="Not authorized to create new folder! Please authorize or refresh session!",
@@ -1116,45 +1092,31 @@ async def createFolder(request: Request, folder: folderContent, token: commonTok
         path += "/.gitkeep"
     except:
         logging.error(f"Missing Properties for folder! Data: {folder}")
-        writeLogJson(
-            "createFolder",
-            400,
-            startTime,
-            f"Missing Properties for folder! Data: {folder}",
-        )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Missing Properties for the folder!",
         )
 
     try:
-        response = requests.post(
-            f"{os.environ.get(target)}/api/v4/projects/{id}/repository/files/{quote(path, safe='')}",
+        response = await getClient(target).post(
+            f"/api/v4/projects/{id}/repository/files/{quote(path, safe='')}",
             headers=header,
-            data=json.dumps(payload),
+            content=json.dumps(payload),
         )
     except Exception as e:
         logging.error(e)
-        writeLogJson("createFolder", 504, startTime, e)
         raise HTTPException(
             status_code=status.HTTP_504_GATEWAY_TIMEOUT,
             detail=f"Couldn't create a new folder! Error: {e}",
         )
 
-    if not response.ok:
+    if not response.is_success:
         logging.error(f"Couldn't create folder {path} ! ERROR: {response.content}")
-        writeLogJson(
-            "createFolder",
-            400,
-            startTime,
-            f"Couldn't create folder {path} ! ERROR: {response.content}",
-        )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Couldn't create folder on repo! Error: {response.content}",
         )
     logging.info(f"Created folder on path: {path}")
-    writeLogJson("createFolder", 201, startTime)
     return response.content
 
 
@@ -1172,8 +1134,8 @@ async def renameFolder(
     oldPath: str,
     newPath: str,
     branch: str = "main",
+    background: bool = False,
 ):
-    startTime = time.time()
     try:
         header = {
             "Authorization": "Bearer " + token["gitlab"],
@@ -1182,17 +1144,19 @@ async def renameFolder(
         target = getTarget(token["target"])
     except:
         logging.warning(f"Client is not authorized to rename the folder!")
-        writeLogJson(
-            "deleteFolder",
-            401,
-            startTime,
-            f"Client is not authorized to rename the folder!",
-        )
         raise HTTPException(
             status_code=HTTP_401_UNAUTHORIZED,
             detail="You are not authorized to rename this folder! Please authorize or refresh session!",
         )
 
+    # run the renaming as a background job, if requested (its state can be polled at /jobs/{jobId})
+    if background:
+        return startJob(
+            "renameFolder",
+            token,
+            lambda: renameFolder(request, token, id, oldPath, newPath, branch),
+        )
+
     oldName = ""
     newName = ""
 
@@ -1205,99 +1169,33 @@ async def renameFolder(
             newName = new[i]
             break
 
-    # get the number of pages
-    arcPath = session.head(
-        f"{os.environ.get(target)}/api/v4/projects/{id}/repository/tree?path={oldPath}&ref={branch}",
-        headers=header,
-    )
+    reportProgress(0.1, f"Listing the files of {oldPath}")
 
-    pages = int(arcPath.headers["X-Total-Pages"])
+    # list all files in the folder (including the sub folders)
+    tree = await getTree(target, id, oldPath, branch, header)
 
-    # list of all files to be deleted
+    # list of all files to be moved
     payload = []
 
-    fileNames = []
-    newNames = []
-
-    for page in range(1, pages + 1):
-        # get the content of the folder
-        folder = await arc_path(id, request, oldPath, token, page)
-
-        # async function filling the payload with all files recursively found in the folder
-        async def prepareJson(folder: Arc):
-            for entry in Arc(Arc=json.loads(folder.body)["Arc"]).Arc:
-                # if its a file, add it to the list
-                if entry.type == "blob":
-                    newPath = entry.path.replace(oldName + "/", newName + "/", 1)
-                    payload.append(
-                        {
-                            "action": "move",
-                            "previous_path": entry.path,
-                            "file_path": newPath,
-                        }
-                    )
-                    fileNames.append(entry.path)
-                    newNames.append(newPath)
-
-                # if its a folder, search the folder for any file
-                elif entry.type == "tree":
-                    # get the number of pages
-                    subPath = session.head(
-                        f"{os.environ.get(target)}/api/v4/projects/{id}/repository/tree?path={entry.path}&ref={branch}",
-                        headers=header,
-                    )
-                    if subPath.ok:
-                        for subPage in range(
-                            1, int(subPath.headers["X-Total-Pages"]) + 1
-                        ):
-                            await prepareJson(
-                                await arc_path(id, request, entry.path, token, subPage)
-                            )
-
-                # this should never be the case, so pass along anything here
-                else:
-                    pass
-
-        # start searching and filling the payload
-        await prepareJson(folder)
-
-    # the final json containing all files to be deleted
-    requestData = {
-        "branch": branch,
-        "commit_message": f"Moving all content from {oldPath} to {newPath}",
-        "actions": payload,
-    }
+    for entry, entryType in tree:
+        if entryType == "blob":
+            newFilePath = entry.replace(oldName + "/", newName + "/", 1)
+            payload.append(
+                {
+                    "action": "move",
+                    "previous_path": entry,
+                    "file_path": newFilePath,
+                }
+            )
 
-    try:
-        moveRequest = requests.post(
-            f"{os.environ.get(target)}/api/v4/projects/{id}/repository/commits",
-            headers=header,
-            data=json.dumps(requestData),
-        )
-    except Exception as e:
-        logging.error(e)
-        writeLogJson("renameFolder", 504, startTime, e)
-        raise HTTPException(
-            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
-            detail=f"Couldn't rename folder! Error: {e}",
-        )
+    # the files are moved in one or more commits (depending on the number of files)
+    commit = CommitBuilder(
+        target, id, branch, f"Moving all content from {oldPath} to {newPath}", header
+    )
+    commit.extend(payload)
 
-    if not moveRequest.ok:
-        logging.error(
-            f"Couldn't rename folder {oldPath} ! ERROR: {moveRequest.content}"
-        )
-        writeLogJson(
-            "renameFolder",
-            400,
-            startTime,
-            f"Couldn't rename folder {oldName} ! ERROR: {moveRequest.content}",
-        )
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Couldn't rename folder on repo! Error: {moveRequest.content}",
-        )
-    else:
-        removeFromGitAttributes(token, id, branch, fileNames, True, newNames)
+    # the files are renamed in the .gitattributes in the same commit
+    reportProgress(0.2, f"Moving {len(payload)} files")
+    await commitWithGitAttributes(commit, header, "rename")
     logging.info(f"Renamed folder on path {oldPath} to {newPath}")
-    writeLogJson("renameFolder", 200, startTime)
     return "Successfully renamed the folder!"
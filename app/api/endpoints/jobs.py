@@ -0,0 +1,158 @@
+import asyncio
+import json
+import logging
+from typing import Annotated
+
+from fastapi import APIRouter, Cookie, Depends, HTTPException, Response, status
+from fastapi.responses import StreamingResponse
+
+from app.api.auth import decodeCookie, getUserKey
+from app.api.jobs import Job, finalStates, jobRunner
+
+router = APIRouter()
+
+# time between two checks of the state of a job for the server-sent events (in seconds)
+eventInterval = 0.5
+
+
+# the jobs of users are only visible to themselves, public jobs (e.g. /search/createArcJson) to everyone
+def getOptionalData(data: Annotated[str | None, Cookie()] = None) -> dict | None:
+    if data is None:
+        return None
+    try:
+        return decodeCookie(data)
+    except:
+        logging.warning(f"Client connected with no valid cookies.")
+        return None
+
+
+optionalToken = Annotated[dict | None, Depends(getOptionalData)]
+
+
+def getJob(jobId: str, token: dict | None) -> Job:
+    job = jobRunner.store.get(jobId)
+    if job is None or (
+        job.owner is not None and (token is None or job.owner != getUserKey(token))
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found! It may have expired already!",
+        )
+    return job
+
+
+# lists the jobs of the user
+@router.get(
+    "",
+    summary="Lists your jobs",
+    status_code=status.HTTP_200_OK,
+    description="Returns the state of all your jobs (running and finished ones).",
+    response_description="List of the jobs with their state and progress.",
+)
+async def listJobs(token: optionalToken) -> list[dict]:
+    owner = getUserKey(token) if token is not None else None
+    return [job.state() for job in jobRunner.store.list(owner)]
+
+
+# returns the state and progress of the job
+@router.get(
+    "/{jobId}",
+    summary="Returns the state of a job",
+    status_code=status.HTTP_200_OK,
+    description="Returns the state (queued, running, done, failed or cancelled) and the progress of the job.",
+    response_description="State and progress of the job.",
+)
+async def getJobState(jobId: str, token: optionalToken) -> dict:
+    return getJob(jobId, token).state()
+
+
+# returns the response of the finished job
+@router.get(
+    "/{jobId}/result",
+    summary="Returns the result of a job",
+    status_code=status.HTTP_200_OK,
+    description="Returns the response of the operation of the job as soon as it is finished. If the operation failed, the error is returned. While the job is running, the state is returned with status 202.",
+    response_description="Response of the operation.",
+)
+async def getJobResult(jobId: str, token: optionalToken):
+    job = getJob(jobId, token)
+    if job.status == "done":
+        return Response(
+            json.dumps(job.result), job.resultStatus, media_type="application/json"
+        )
+    if job.status in finalStates:
+        raise HTTPException(
+            status_code=job.resultStatus or status.HTTP_409_CONFLICT,
+            detail=job.error,
+        )
+    return Response(
+        json.dumps(job.state()),
+        status.HTTP_202_ACCEPTED,
+        media_type="application/json",
+    )
+
+
+# sends the state of the job as server-sent events whenever it changes (until the job is finished)
+@router.get(
+    "/{jobId}/events",
+    summary="Streams the state of a job",
+    status_code=status.HTTP_200_OK,
+    description="Sends the state of the job as server-sent events every time it changes. The stream ends as soon as the job is finished.",
+    response_description="Stream of the states of the job.",
+)
+async def getJobEvents(jobId: str, token: optionalToken):
+    getJob(jobId, token)
+
+    async def events():
+        last = None
+        while True:
+            job = jobRunner.store.get(jobId)
+            if job is None:
+                break
+            state = job.state()
+            if state != last:
+                yield f"event: {job.status}\ndata: {json.dumps(state)}\n\n"
+                last = state
+            if job.status in finalStates:
+                break
+            await asyncio.sleep(eventInterval)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# cancels the job
+@router.delete(
+    "/{jobId}",
+    summary="Cancels a job",
+    status_code=status.HTTP_200_OK,
+    description="Cancels your job, if it is still waiting or running. Public jobs (e.g. /search/createArcJson) can't be cancelled. Changes that were already sent to the datahub are not reverted.",
+    response_description="Job was cancelled.",
+)
+async def cancelJob(jobId: str, token: optionalToken) -> str:
+    if token is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="No authorized cookie found! Please authorize or refresh session!",
+        )
+    job = getJob(jobId, token)
+    # public jobs (e.g. /search/createArcJson) are shared by all users, so they can't be cancelled by a single user
+    if job.owner is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="The job wasn't started by you and can't be cancelled!",
+        )
+    if job.status in finalStates:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"The job is already {job.status}!",
+        )
+    if not jobRunner.cancel(jobId):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="The job runs on another worker and can't be cancelled here! Please try again!",
+        )
+    return "The job was cancelled!"
@@ -11,6 +11,7 @@ from fastapi import (
 )
 from fastapi.responses import JSONResponse, HTMLResponse
 from fastapi.encoders import jsonable_encoder
+from starlette.concurrency import run_in_threadpool
 
 import subprocess
 
@@ -20,9 +21,6 @@ import base64
 import shutil
 import json
 import os
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util import Retry
 import jwt
 
 from starlette.status import (
@@ -44,12 +42,43 @@ from pdf2image import convert_from_bytes
 from urllib.parse import quote
 from io import BytesIO
 
+# async client for the requests to the datahubs
+from app.api.IO.gitlabIO import getClient, getTarget, poolStats
+
+# commits that are split into batches if they are too large
+from app.api.IO.commitIO import CommitBuilder
+
+# isa files that are changed together and committed with a single commit
+from app.api.IO.transactionIO import IsaTransaction
+
+# index of the links between assays, studies and the investigation
+from app.api.IO.linkIndex import LinkIndex, getLinkIndex
+
+# append-only log for the metrics
+from app.api.IO.logIO import logStore
+from app.api.metrics import metrics
+
+# shared retry policies (the file was found, so also retry on 400 and 404 as the datahub may still be processing a recent commit)
+from app.api.retry import recentFileRetryStatus, retryBudget
+
+# verification of the cookies
+from app.api.auth import decodeCookie
+
+# long running operations can be run as background jobs
+from app.api.jobs import reportProgress, startJob
+
+# cache for the parsed isa files
+from app.api.IO.isaCache import getBlobId, isaCache
+
+# process pool for the excel work
+from app.api.IO.excelPool import excelPool, runExcel
+
 # functions to read and write isa files
 from app.api.IO.excelIO import (
     getIsaType,
     readExcelFile,
     readIsaFile,
-    writeIsaFile,
+    writeIsaRows,
     appendAssay,
     appendStudy,
 )
@@ -68,20 +97,6 @@ from app.models.gitlab.arc import Arc
 
 router = APIRouter()
 
-# request sessions to retry the important requests
-retry = Retry(
-    total=5,
-    backoff_factor=4,
-    status_forcelist=[500, 502, 429, 503, 504],
-    allowed_methods=["POST", "PUT", "HEAD", "GET"],
-)
-
-adapter = HTTPAdapter(max_retries=retry)
-
-session = requests.Session()
-session.mount("https://", adapter)
-session.mount("http://", adapter)
-
 
 # sanitize input
 def sanitizeInput(input: str | list) -> str:
@@ -93,40 +108,10 @@ def sanitizeInput(input: str | list) -> str:
     return input
 
 
-# Match the given target repo with the address name in the env file (default is the tübingen gitlab)
-def getTarget(target: str) -> str:
-    match target.lower():
-        case "dev":
-            return "GITLAB_ADDRESS"
-        case "freiburg":
-            return "GITLAB_FREIBURG"
-        case "tübingen":
-            return "GITLAB_TUEBINGEN"
-        case "plantmicrobe":
-            return "GITLAB_PLANTMICROBE"
-        case "tuebingen":
-            return "GITLAB_TUEBINGEN"
-        case "tuebingen_testenv":
-            return "GITLAB_TUEBINGEN_TESTENV"
-        case other:
-            return "GITLAB_TUEBINGEN"
-
-
-# decrypt the cookie data with the corresponding public key
+# decrypt the cookie data with the corresponding public key (cached for repeated requests with the same cookie)
 def getData(data: Annotated[str, Cookie()]):
-    # get public key from .env to decode data (in form of a byte string)
-    public_key = (
-        b"-----BEGIN PUBLIC KEY-----\n"
-        + os.environ.get("PUBLIC_RSA").encode()
-        + b"\n-----END PUBLIC KEY-----"
-    )
-
     try:
-        decodedToken = jwt.decode(data, public_key, algorithms=["RS256", "HS256"])
-        fernetKey = os.environ.get("FERNET").encode()
-        decodedToken["gitlab"] = (
-            Fernet(fernetKey).decrypt(decodedToken["gitlab"].encode()).decode()
-        )
+        decodedToken = decodeCookie(data)
     except:
         logging.warning(
             f"Client connected with no valid cookies/Client is not logged in."
@@ -142,28 +127,6 @@ def getData(data: Annotated[str, Cookie()]):
 commonToken = Annotated[str, Depends(getData)]
 
 
-# writes the log entry into the json log file
-def writeLogJson(endpoint: str, status: int, startTime: float, error=None):
-    try:
-        with open("log.json", "r") as log:
-            jsonLog = json.load(log)
-
-        jsonLog.append(
-            {
-                "endpoint": endpoint,
-                "status": status,
-                "error": str(error),
-                "date": time.strftime("%d/%m/%Y - %H:%M:%S", time.localtime()),
-                "response_time": time.time() - startTime,
-            }
-        )
-
-        with open("log.json", "w") as logWrite:
-            json.dump(jsonLog, logWrite, indent=4, separators=(",", ": "))
-    except:
-        logging.warning("Error while logging to log json!")
-
-
 # converts bit size into human readable byte size
 def fileSizeReadable(size: int) -> str:
     for unit in ("bytes", "Kb", "Mb", "Gb"):
@@ -173,75 +136,88 @@ def fileSizeReadable(size: int) -> str:
     return f"{size} Bits"
 
 
-# checks whether the assay is already linked in a study (if so, update the data)
-async def checkAssayLink(
-    id: int, path: str, request: Request, token: commonToken, branch="main"
-):
+# returns the link index of the arc (the isa files are read through the transaction, so every file is downloaded once)
+async def getLinks(
+    transaction: IsaTransaction, request: Request, token: commonToken
+) -> LinkIndex | None:
+    id = transaction.id
+    branch = transaction.branch
     try:
-        studies = await getStudies(request, id, token, branch)
-
-        for study in studies:
-            studyPath = "studies/" + study + "/isa.study.xlsx"
-            studyTest = await arc_file(id, studyPath, request, token, branch)
-
-            for entry in studyTest:
-                if "Study Assay File Name" in entry:
-                    logging.debug(f"Link found; Syncing {path} into {study} ...")
-                    if path in entry:
-                        syncData = syncAssayContent(
-                            id=id,
-                            pathToAssay=path,
-                            pathToStudy=studyPath,
-                            branch=branch,
-                            assayName=path.split("/")[-2],
-                        )
-                        await syncAssay(request, syncData, token)
-                        await checkStudyLink(
-                            id,
-                            studyPath,
-                            request,
-                            token,
-                            branch,
-                        )
-                        return True
-                    else:
-                        return entry
-            # if the field wasn't found, it doesn't exist. Therefore return False
-        return False
+        return await getLinkIndex(
+            transaction.target,
+            id,
+            branch,
+            transaction.headers,
+            lambda x, ref: transaction.read(
+                x, lambda y: arc_file(id, y, request, token, ref)
+            ),
+        )
     except:
-        logging.warning(f"Failed to sync {path} into {study}")
+        logging.warning(f"Couldn't get the links of the isa files of {id}")
+        return None
+
+
+# checks whether the assay is already linked in studies (if so, sync the assay into the studies within the transaction)
+async def checkAssayLink(
+    transaction: IsaTransaction,
+    links: LinkIndex | None,
+    path: str,
+    request: Request,
+    token: commonToken,
+):
+    if links is None:
         return False
 
+    # all studies are synced before the investigation (the files are locked in the same order by every request)
+    synced = []
+    for study in sorted(links.studiesOf(path.split("/")[-2])):
+        studyPath = "studies/" + study + "/isa.study.xlsx"
+        logging.debug(f"Link found; Syncing {path} into {study} ...")
+        try:
+            syncData = syncAssayContent(
+                id=transaction.id,
+                pathToAssay=path,
+                pathToStudy=studyPath,
+                branch=transaction.branch,
+                assayName=path.split("/")[-2],
+            )
+            await stageAssaySync(transaction, syncData, request, token)
+            synced.append(studyPath)
+        except:
+            logging.warning(f"Failed to sync {path} into {study}")
+
+    for studyPath in synced:
+        await checkStudyLink(transaction, links, studyPath, request, token)
+    return len(synced) > 0
 
-# checks whether the study is already linked in the investigation (if so, update it)
+
+# checks whether the study is already linked in the investigation (if so, sync the study within the transaction)
 async def checkStudyLink(
-    id: int, path: str, request: Request, token: commonToken, branch="main"
+    transaction: IsaTransaction,
+    links: LinkIndex | None,
+    path: str,
+    request: Request,
+    token: commonToken,
 ):
-    try:
-        investTest = await arc_file(
-            id, "isa.investigation.xlsx", request, token, branch
-        )
-
-        for entry in investTest:
-            if "Study File Name" in entry:
-                logging.debug(f"Link found; Syncing {path} into investigation...")
-                if path in entry:
-                    syncData = syncStudyContent(
-                        id=id,
-                        pathToStudy=path,
-                        studyName=path.split("/")[-2],
-                        branch=branch,
-                    )
-                    await syncStudy(request, syncData, token)
-                    return True
-        # if the field wasn't found, it doesn't exist. Therefore return False
+    if links is None or not links.inInvestigation(path.split("/")[-2]):
         return False
+
+    logging.debug(f"Link found; Syncing {path} into investigation...")
+    try:
+        syncData = syncStudyContent(
+            id=transaction.id,
+            pathToStudy=path,
+            studyName=path.split("/")[-2],
+            branch=transaction.branch,
+        )
+        await stageStudySync(transaction, syncData, request, token)
+        return True
     except:
         logging.warning(f"Failed to sync {path} into investigation")
         return False
 
 
-def startRequest(request: Request, token: commonToken, startTime: float, endpoint: str):
+def startRequest(request: Request, token: commonToken):
     try:
         header = {"Authorization": "Bearer " + token["gitlab"]}
         target = getTarget(token["target"])
@@ -249,12 +225,6 @@ def startRequest(request: Request, token: commonToken, startTime: float, endpoin
         logging.warning(
             f"Client connected with no valid cookies/Client is not logged in"
         )
-        writeLogJson(
-            endpoint,
-            401,
-            startTime,
-            f"Client connected with no valid cookies/Client is not logged in.",
-        )
         raise HTTPException(
             status_code=HTTP_401_UNAUTHORIZED,
             detail="You are not authorized! Please authorize or refresh session!",
@@ -288,28 +258,27 @@ async def list_arcs(
     :param page: Which page to show (every page contains 20 ARCs)
     \f
     """
-    startTime = time.time()
 
-    header, target = startRequest(request, token, startTime, "arc_list")
+    header, target = startRequest(request, token)
 
     arcList = []
 
     if owned:
         # first find out how many pages of arcs there are for us to get (check if there are more than 100 arcs at once available)
         try:
-            arcs = session.get(
-                f"{os.environ.get(target)}/api/v4/projects?min_access_level=30&page={page}",
+            arcs = await getClient(target).get(
+                f"/api/v4/projects?min_access_level=30&page={page}",
                 headers=header,
+                retries=5,
             )
         except Exception as e:
             logging.error(e)
-            writeLogJson("arc_list", 504, startTime, e)
             raise HTTPException(
                 status_code=status.HTTP_504_GATEWAY_TIMEOUT,
                 detail=f"Couldn't retrieve list of ARCs! Error: {e}",
             )
         # if there is an error retrieving the content
-        if not arcs.ok:
+        if not arcs.is_success:
             logging.warning(arcs.content)
             try:
                 arcsJson = arcs.json()
@@ -336,12 +305,6 @@ async def list_arcs(
             pages = int(arcs.headers["X-Total-Pages"])
             # if there is an error parsing the data to json, throw an exception
         except:
-            writeLogJson(
-                "arc_list",
-                500,
-                startTime,
-                f"Error while parsing the list of ARCs!",
-            )
             raise HTTPException(
                 status_code=HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Error while parsing the list of ARCs!",
@@ -350,18 +313,18 @@ async def list_arcs(
     # same procedure, but for general available arcs, not just private ones (more likely to be more than 100)
     else:
         try:
-            arcs = session.get(
-                f"{os.environ.get(target)}/api/v4/projects?page={page}",
+            arcs = await getClient(target).get(
+                f"/api/v4/projects?page={page}",
                 headers=header,
+                retries=5,
             )
         except Exception as e:
             logging.error(e)
-            writeLogJson("arc_list", 504, startTime, e)
             raise HTTPException(
                 status_code=status.HTTP_504_GATEWAY_TIMEOUT,
                 detail=f"Couldn't retrieve list of ARCs! Error: {e}",
             )
-        if not arcs.ok:
+        if not arcs.is_success:
             logging.warning(arcs.content)
             try:
                 arcsJson = arcs.json()
@@ -389,19 +352,12 @@ async def list_arcs(
             pages = int(arcs.headers["X-Total-Pages"])
 
         except:
-            writeLogJson(
-                "arc_list",
-                500,
-                startTime,
-                f"Error while parsing the list of ARCs!",
-            )
             raise HTTPException(
                 status_code=HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Error while parsing the list of ARCs!",
             )
 
     logging.info("Sent list of Arcs")
-    writeLogJson("arc_list", 200, startTime)
     return JSONResponse(
         jsonable_encoder(Projects(projects=arcList)),
         headers={
@@ -425,18 +381,17 @@ async def list_arcs_head(
         Query(),
     ] = False,
 ):
-    startTime = time.time()
 
-    header, target = startRequest(request, token, startTime, "arc_list_head")
+    header, target = startRequest(request, token)
 
     if owned:
         # first find out how many pages of arcs there are for us to get (check if there are more than 100 arcs at once available)
-        arcs = requests.head(
-            f"{os.environ.get(target)}/api/v4/projects?min_access_level=30",
+        arcs = await getClient(target).head(
+            "/api/v4/projects?min_access_level=30",
             headers=header,
         )
         # if there is an error retrieving the content
-        if not arcs.ok:
+        if not arcs.is_success:
             try:
                 arcsJson = arcs.json()
             except:
@@ -463,12 +418,6 @@ async def list_arcs_head(
             pages = int(arcs.headers["X-Total-Pages"])
             # if there is an error parsing the data to json, throw an exception
         except:
-            writeLogJson(
-                "arc_list",
-                500,
-                startTime,
-                f"Error while parsing the list of ARCs!",
-            )
             raise HTTPException(
                 status_code=HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Error while parsing the list of ARCs!",
@@ -476,11 +425,11 @@ async def list_arcs_head(
 
     # same procedure, but for general available arcs, not just private ones (more likely to be more than 100)
     else:
-        arcs = requests.head(
-            f"{os.environ.get(target)}/api/v4/projects",
+        arcs = await getClient(target).head(
+            "/api/v4/projects",
             headers=header,
         )
-        if not arcs.ok:
+        if not arcs.is_success:
             try:
                 arcsJson = arcs.json()
             except:
@@ -505,19 +454,12 @@ async def list_arcs_head(
             pages = int(arcs.headers["X-Total-Pages"])
 
         except:
-            writeLogJson(
-                "arc_list_head",
-                500,
-                startTime,
-                f"Error while parsing the list of ARCs!",
-            )
             raise HTTPException(
                 status_code=HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Error while parsing the list of ARCs!",
             )
 
     logging.info("Sent list of Arc list headers")
-    writeLogJson("arc_list_head", 200, startTime)
     return Response(
         headers={
             "total-pages": str(pages),
@@ -544,24 +486,17 @@ async def public_arcs(
     :param page: Which page to show (every page contains 20 ARCs)
     \f
     """
-    startTime = time.time()
     try:
         target = getTarget(target)
     except:
-        writeLogJson(
-            "public_arcs",
-            404,
-            startTime,
-            f"Target git not found!",
-        )
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Target git not found!"
         )
 
     try:
         # if the requested gitlab is not available after 30s, return error 504
-        request = requests.get(
-            f"{os.environ.get(target)}/api/v4/projects?page={page}",
+        request = await getClient(target).get(
+            f"/api/v4/projects?page={page}",
             timeout=15,
         )
         if request.status_code == 502 or request.status_code == 503:
@@ -570,31 +505,18 @@ async def public_arcs(
         requestJson = request.json()
         pages = int(request.headers["X-Total-Pages"])
     except:
-        writeLogJson(
-            "public_arcs",
-            504,
-            startTime,
-            f"DataHUB currently not available!!",
-        )
         raise HTTPException(
             status_code=status.HTTP_504_GATEWAY_TIMEOUT,
             detail="DataHUB currently not available!!",
         )
 
-    if not request.ok:
-        writeLogJson(
-            "public_arcs",
-            500,
-            startTime,
-            f"Error retrieving the arcs! ERROR: {request.content}",
-        )
+    if not request.is_success:
         raise HTTPException(
             status_code=request.status_code,
             detail=f"Error retrieving the arcs! ERROR: {request.content}",
         )
 
     logging.debug("Sent public list of ARCs")
-    writeLogJson("public_arcs", 200, startTime)
     return JSONResponse(
         jsonable_encoder(Projects(projects=requestJson)),
         headers={
@@ -626,40 +548,26 @@ async def arc_tree(
     :param branch: The name of the branch (default is main)
     \f
     """
-    startTime = time.time()
-    header, target = startRequest(request, token, startTime, "arc_tree")
+    header, target = startRequest(request, token)
 
-    arc = requests.get(
-        f"{os.environ.get(target)}/api/v4/projects/{id}/repository/tree?per_page=100&ref={branch}",
+    arc = await getClient(target).get(
+        f"/api/v4/projects/{id}/repository/tree?per_page=100&ref={branch}",
         headers=header,
     )
     try:
         arcJson = arc.json()
     except:
-        writeLogJson(
-            "arc_tree",
-            404,
-            startTime,
-            f"ARC with ID {id} is empty!",
-        )
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="No Content found!"
         )
-    if not arc.ok:
+    if not arc.is_success:
         logging.error(f"Couldn't find ARC with ID {id}; ERROR: {arc.content[0:100]}")
-        writeLogJson(
-            "arc_tree",
-            404,
-            startTime,
-            f"Couldn't find ARC with ID {id}; ERROR: {arc.content[0:100]}",
-        )
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Couldn't find ARC with ID {id}; Error: {arc.content[0:100]}",
         )
 
     logging.info("Sent info of ARC " + str(id))
-    writeLogJson("arc_tree", 200, startTime)
     return Arc(Arc=arcJson)
 
 
@@ -689,17 +597,16 @@ async def arc_path(
     :param branch: The name of the branch (default is main)
     \f
     """
-    startTime = time.time()
-    header, target = startRequest(request, token, startTime, "arc_path")
+    header, target = startRequest(request, token)
 
     try:
-        arcPath = session.get(
-            f"{os.environ.get(target)}/api/v4/projects/{id}/repository/tree?path={path}&page={page}&ref={branch}",
+        arcPath = await getClient(target).get(
+            f"/api/v4/projects/{id}/repository/tree?path={path}&page={page}&ref={branch}",
             headers=header,
+            retries=5,
         )
     except Exception as e:
         logging.error(e)
-        writeLogJson("arc_path", 504, startTime, e)
         raise HTTPException(
             status_code=status.HTTP_504_GATEWAY_TIMEOUT,
             detail=f"Couldn't retrieve content of the path! Error: {e}",
@@ -724,28 +631,21 @@ async def arc_path(
         )
 
     # raise error if the given path gives no result
-    if not arcPath.ok:
+    if not arcPath.is_success:
         logging.error(f"Path not found! Path: { path } ; ERROR: {arcPath.content}")
-        writeLogJson(
-            "arc_path",
-            404,
-            startTime,
-            f"Path not found! Path: { path } ; ERROR: {arcPath.content}",
-        )
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Path not found! Error: {arcPath.content}! Try to login again!",
         )
 
     logging.info(f"Sent info of ARC {id} with path {path}")
-    writeLogJson("arc_path", 200, startTime)
     return JSONResponse(
         jsonable_encoder(Arc(Arc=pathJson)),
         headers=header,
     )
 
 
-# gets the specific file on the given path and either saves it on the backend storage (for isa files) or sends the content directly
+# gets the specific file on the given path and either parses it (for isa files) or sends the content directly
 @router.get(
     "/arc_file",
     summary="Returns the file on the given path",
@@ -769,103 +669,26 @@ async def arc_file(
     :param branch: The name of the branch (default is main)
     \f
     """
-    startTime = time.time()
-    header, target = startRequest(request, token, startTime, "arc_file")
-
-    # get HEAD data for fileSize
-    # url encode the path
-    try:
-        fileHead = session.head(
-            f"{os.environ.get(target)}/api/v4/projects/{id}/repository/files/{quote(path, safe='')}?ref={branch}",
-            headers=header,
-        )
-    except:
-        raise HTTPException(
-            status_code=504,
-            detail=f"Error reaching the Datahub! Please try again later!",
-        )
-
-    # raise error if file not found
-    if not fileHead.ok:
-        logging.error(f"File not found! Path: {path}")
-        writeLogJson(
-            "arc_file",
-            fileHead.status_code,
-            startTime,
-            f"File not found! Path: {path}",
-        )
-        if fileHead.status_code == 401:
-            raise HTTPException(
-                status_code=fileHead.status_code,
-                detail=f"{path.split('/')[-1]} not accessible! Error: Not authorized to view the file! Please login again!",
-            )
-        raise HTTPException(
-            status_code=fileHead.status_code,
-            detail=f"{path.split('/')[-1]} not found! Error: {fileHead.status_code}!",
-        )
-
-    fileSize = fileHead.headers["X-Gitlab-Size"]
-
-    altRetry = Retry(
-        total=5,
-        backoff_factor=4,
-        status_forcelist=[500, 400, 502, 429, 503, 504, 404],
-        allowed_methods=["POST", "PUT", "HEAD", "GET"],
-    )
-
-    altAdapter = HTTPAdapter(max_retries=altRetry)
-
-    altSession = requests.Session()
-
-    altSession.mount("https://", altAdapter)
-    altSession.mount("http://", altAdapter)
-
     # if its a isa file, return the content of the file as json to the frontend
+    # (the file is read in memory; a local copy is only written by the endpoints editing the file)
     if getIsaType(path) != "":
-
-        try:
-            # get the raw ISA file
-            fileRaw = altSession.get(
-                f"{os.environ.get(target)}/api/v4/projects/{id}/repository/files/{quote(path, safe='')}/raw?ref={branch}",
-                headers=header,
-            ).content
-        except Exception as e:
-            logging.error(e)
-            writeLogJson("arc_file", 504, startTime, e)
-            raise HTTPException(
-                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
-                detail=f"File not found! Error: {e}, Try to log-in again!",
-            )
-
-        # construct path to save on the backend
-        pathName = f"{os.environ.get('BACKEND_SAVE')}{token['target']}-{id}/{path}"
-
-        # create directory for the file to save it, skip if it exists already
-        os.makedirs(os.path.dirname(pathName), exist_ok=True)
-        with open(pathName, "wb") as file:
-            file.write(fileRaw)
-
-        logging.debug("Downloading File to " + pathName)
-
-        # read out isa file and create json
-        fileJson = readIsaFile(pathName, getIsaType(path))
+        fileRaw, fileJson, _ = await getIsaContent(id, path, request, token, branch)
 
         logging.info(f"Sent ISA file {path} from ID: {id}")
-        writeLogJson("arc_file", 200, startTime)
         if getIsaType(path) == "datamap":
             return fileJson
         return fileJson["data"]
     # if its not a isa file, return the default metadata of the file to the frontend
     else:
+        header, target = startRequest(request, token)
+
+        # get HEAD data for fileSize
+        fileHead = await getFileHead(id, path, header, target, branch)
+        fileSize = fileHead.headers["X-Gitlab-Size"]
+
         # if file is too big, skip requesting it
         if int(fileSize) > 52428800:
             logging.warning("File too large! Size: " + fileSizeReadable(int(fileSize)))
-            writeLogJson(
-                "arc_file",
-                413,
-                startTime,
-                "File too large! Size: " + fileSize,
-            )
             raise HTTPException(
                 status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
                 detail="File too large! (over 50 MB)",
@@ -873,13 +696,14 @@ async def arc_file(
 
         try:
             # get the file metadata
-            arcFile = altSession.get(
-                f"{os.environ.get(target)}/api/v4/projects/{id}/repository/files/{quote(path, safe='')}?ref={branch}",
+            arcFile = await getClient(target).get(
+                f"/api/v4/projects/{id}/repository/files/{quote(path, safe='')}?ref={branch}",
                 headers=header,
+                retries=5,
+                retryOn=recentFileRetryStatus,
             )
         except Exception as e:
             logging.error(e)
-            writeLogJson("arc_file", 504, startTime, e)
             raise HTTPException(
                 status_code=status.HTTP_504_GATEWAY_TIMEOUT,
                 detail=f"File not found! Error: {e}, Try to log-in again!",
@@ -889,12 +713,6 @@ async def arc_file(
         try:
             arcFileJson = arcFile.json()
         except:
-            writeLogJson(
-                "arc_file",
-                500,
-                startTime,
-                f"Error while retrieving the content of the file!",
-            )
             raise HTTPException(
                 status_code=HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Error while retrieving the content of the file!",
@@ -920,11 +738,10 @@ async def arc_file(
 
             fileJson = arcFileJson
             fileJson["content"] = encoded
-            writeLogJson("arc_file", 200, startTime)
             return fileJson
         elif path.lower().endswith(".xlsx"):
             decoded = base64.b64decode(arcFileJson["content"])
-            return readExcelFile(decoded)
+            return await runExcel(readExcelFile, decoded)
         # if its a pdf, return a html file containing the pdf as images
         elif path.lower().endswith(".pdf"):
             fileName = arcFileJson["file_name"]
@@ -954,12 +771,6 @@ async def arc_file(
                     poppler_path=os.environ.get("BACKEND_SAVE") + "poppler/bin",
                 )
             except:
-                writeLogJson(
-                    "arc_file",
-                    500,
-                    startTime,
-                    "File is not a valid pdf or stored as LFS!",
-                )
                 raise HTTPException(
                     status_code=HTTP_500_INTERNAL_SERVER_ERROR,
                     detail="File is not a supported pdf file or stored as LFS!",
@@ -971,13 +782,100 @@ async def arc_file(
 
             html += "</body></html>"
             logging.info(f"Sent pdf {fileName} from ID: {id}")
-            writeLogJson("arc_file", 200, startTime)
             return HTMLResponse(html)
         else:
-            writeLogJson("arc_file", 200, startTime)
             return arcFileJson
 
 
+# returns the HEAD data of the file (raises an error if the file can't be accessed)
+async def getFileHead(id: int, path: str, header: dict, target: str, branch: str):
+    # url encode the path
+    try:
+        fileHead = await getClient(target).head(
+            f"/api/v4/projects/{id}/repository/files/{quote(path, safe='')}?ref={branch}",
+            headers=header,
+            retries=5,
+        )
+    except:
+        raise HTTPException(
+            status_code=504,
+            detail=f"Error reaching the Datahub! Please try again later!",
+        )
+
+    # raise error if file not found
+    if not fileHead.is_success:
+        logging.error(f"File not found! Path: {path}")
+        if fileHead.status_code == 401:
+            raise HTTPException(
+                status_code=fileHead.status_code,
+                detail=f"{path.split('/')[-1]} not accessible! Error: Not authorized to view the file! Please login again!",
+            )
+        raise HTTPException(
+            status_code=fileHead.status_code,
+            detail=f"{path.split('/')[-1]} not found! Error: {fileHead.status_code}!",
+        )
+    return fileHead
+
+
+# returns the raw isa file, its content as json and the headers of the file (blob id, last commit, ...); the file is
+# parsed in memory and the same version of the file (identified by its blob id) is only downloaded and parsed once
+async def getIsaContent(
+    id: int, path: str, request: Request, token: commonToken, branch: str = "main"
+) -> tuple[bytes, dict | list, dict]:
+    header, target = startRequest(request, token)
+    fileHead = await getFileHead(id, path, header, target, branch)
+
+    # check if the same version of the file was already parsed
+    blobId = getBlobId(fileHead.headers)
+    cacheKey = (target, id, blobId, getIsaType(path))
+    cached = isaCache.get(cacheKey) if blobId else None
+    if cached is not None:
+        return cached[0], cached[1], fileHead.headers
+
+    try:
+        # get the raw ISA file
+        fileRaw = (
+            await getClient(target).get(
+                f"/api/v4/projects/{id}/repository/files/{quote(path, safe='')}/raw?ref={branch}",
+                headers=header,
+                retries=5,
+                retryOn=recentFileRetryStatus,
+            )
+        ).content
+    except Exception as e:
+        logging.error(e)
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=f"File not found! Error: {e}, Try to log-in again!",
+        )
+
+    # read out isa file and create json
+    fileJson = await runExcel(readIsaFile, fileRaw, getIsaType(path))
+    if blobId:
+        isaCache.put(cacheKey, fileRaw, fileJson)
+    return fileRaw, fileJson, fileHead.headers
+
+
+# writes the isa file into the local copy on the backend, so that it can be edited; returns the content like arc_file
+async def getWorkingCopy(
+    id: int, path: str, request: Request, token: commonToken, branch: str = "main"
+) -> list[list] | dict:
+    fileRaw, fileJson, _ = await getIsaContent(id, path, request, token, branch)
+
+    # construct path to save on the backend
+    pathName = f"{os.environ.get('BACKEND_SAVE')}{token['target']}-{id}/{path}"
+
+    # create directory for the file to save it, skip if it exists already
+    os.makedirs(os.path.dirname(pathName), exist_ok=True)
+    with open(pathName, "wb") as file:
+        file.write(fileRaw)
+
+    logging.debug("Downloading File to " + pathName)
+    if getIsaType(path) == "datamap":
+        return fileJson
+    return fileJson["data"]
+
+
 # reads out the content of the put request body; writes the content to the corresponding isa file on the storage
 @router.put(
     "/saveFile",
@@ -993,88 +891,73 @@ async def saveFile(request: Request, isaContent: isaContent, token: commonToken)
     :param token: The user token containing the api token and target datahub (stored in cookies)
     \f
     """
-    startTime = time.time()
     try:
         isaContent.isaInput = sanitizeInput(isaContent.isaInput)
         target = token["target"]
     except:
         logging.error(f"SaveFile Request couldn't be processed! Body: {request.body}")
-        writeLogJson(
-            "saveFile",
-            401,
-            startTime,
-            f"SaveFile Request couldn't be processed! Body: {request.body}",
-        )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Couldn't read request"
         )
 
     logging.debug(f"Content of isa file change: {isaContent}")
 
-    rowName = isaContent.isaInput[0]
-    if isaContent.multiple:
-        for entry in isaContent.isaInput:
-            writeIsaFile(
-                isaContent.isaPath,
-                getIsaType(isaContent.isaPath),
-                entry,
-                isaContent.isaRepo,
-                target,
-            )
-        rowName = "multiple fields"
-    else:
-        # write the content to the isa file and get the name of the edited row
-        rowName = writeIsaFile(
+    header, gitlabTarget = startRequest(request, token)
+    # the edited file and the files it is synced into are committed together
+    async with IsaTransaction(
+        gitlabTarget, isaContent.isaRepo, isaContent.arcBranch, header
+    ) as transaction:
+        # the links of assays and studies are looked up before the file is edited (the index describes the committed files)
+        links = None
+        if "assays" in isaContent.isaPath or "studies" in isaContent.isaPath:
+            links = await getLinks(transaction, request, token)
+
+        # get a working copy of the file to edit it
+        await transaction.load(
+            isaContent.isaPath,
+            lambda x: getIsaContent(
+                isaContent.isaRepo, x, request, token, isaContent.arcBranch
+            ),
+        )
+
+        # write all rows at once to the isa file and get the name of the edited row
+        rowName = await runExcel(
+            writeIsaRows,
             isaContent.isaPath,
             getIsaType(isaContent.isaPath),
-            isaContent.isaInput,
+            isaContent.isaInput if isaContent.multiple else [isaContent.isaInput],
             isaContent.isaRepo,
             target,
+            pathName=transaction.localPath(isaContent.isaPath),
         )
-    logging.debug("write content to isa file...")
-    # the path of the file on the storage for the commit request
-    pathName = f"{os.environ.get('BACKEND_SAVE')}{target}-{isaContent.isaRepo}/{isaContent.isaPath}"
+        if isaContent.multiple:
+            rowName = "multiple fields"
+        logging.debug("write content to isa file...")
 
-    logging.debug("committing file to repo...")
-    # call the commit function
-    try:
-        commitResponse = await commitFile(
-            request,
-            isaContent.isaRepo,
+        transaction.change(
             isaContent.isaPath,
-            token,
-            pathName,
-            isaContent.arcBranch,
-            rowName,
-        )
-    except:
-        logging.warning(f"Isa file could not be edited!")
-        writeLogJson(
-            "saveFile",
-            400,
-            startTime,
-            f"Isa file could not be edited!",
-        )
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="File could not be edited!",
+            f"Updated {isaContent.isaPath}, changed {sanitizeInput(rowName)}",
         )
 
-    if "assays" in isaContent.isaPath:
-        await checkAssayLink(
-            isaContent.isaRepo, isaContent.isaPath, request, token, isaContent.arcBranch
-        )
-    elif "studies" in isaContent.isaPath:
-        await checkStudyLink(
-            isaContent.isaRepo, isaContent.isaPath, request, token, isaContent.arcBranch
-        )
+        if "assays" in isaContent.isaPath:
+            await checkAssayLink(transaction, links, isaContent.isaPath, request, token)
+        elif "studies" in isaContent.isaPath:
+            await checkStudyLink(transaction, links, isaContent.isaPath, request, token)
+
+        logging.debug("committing files to repo...")
+        try:
+            commitResponse = await transaction.commit()
+        except Exception as e:
+            # the file was changed by someone else in the meantime
+            if isinstance(e, HTTPException) and e.status_code == 409:
+                raise
+            logging.warning(f"Isa file could not be edited!")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="File could not be edited!",
+            )
 
     logging.info(f"Sent file {isaContent.isaPath} to ARC {isaContent.isaRepo}")
-    writeLogJson(
-        "saveFile",
-        200,
-        startTime,
-    )
     return str(commitResponse)
 
 
@@ -1104,7 +987,6 @@ async def commitFile(
     :param branch: The name of the branch (default is main)
     \f
     """
-    startTime = time.time()
     # get the data from the body
     requestBody = await request.body()
     try:
@@ -1115,12 +997,6 @@ async def commitFile(
 
     except:
         logging.error(f"SaveFile Request couldn't be processed! Body: {request.body}")
-        writeLogJson(
-            "commitFile",
-            400,
-            startTime,
-            f"SaveFile Request couldn't be processed! Body: {request.body}",
-        )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Couldn't read request"
         )
@@ -1156,33 +1032,26 @@ async def commitFile(
         }
 
     try:
-        response = session.put(
-            f"{os.environ.get(getTarget(targetRepo))}/api/v4/projects/{id}/repository/files/{quote(repoPath, safe='')}",
-            data=json.dumps(payload),
+        response = await getClient(getTarget(targetRepo)).put(
+            f"/api/v4/projects/{id}/repository/files/{quote(repoPath, safe='')}",
+            content=json.dumps(payload),
             headers=header,
+            retries=5,
         )
     except Exception as e:
         logging.error(e)
-        writeLogJson("commitFile", 504, startTime, e)
         raise HTTPException(
             status_code=status.HTTP_504_GATEWAY_TIMEOUT,
             detail=f"Couldn't upload data to the ARC! Error: {e}",
         )
 
-    if not response.ok:
+    if not response.is_success:
         logging.error(f"Couldn't commit to ARC! ERROR: {response.content}")
-        writeLogJson(
-            "commitFile",
-            400,
-            startTime,
-            f"Couldn't commit to ARC! ERROR: {response.content}",
-        )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Couldn't commit file to repo! Error: {response.content}",
         )
     logging.info(f"Updated file on path: {repoPath}")
-    writeLogJson("commitFile", 200, startTime)
     return response.content
 
 
@@ -1195,8 +1064,12 @@ async def commitFile(
     description="Creates a new Project with the given Information and fills it with the necessary files and folders to start your ARC.",
     response_description="Response from gitlab containing the various information of your new created project.",
 )
-async def createArc(request: Request, arcContent: arcContent, token: commonToken):
-    startTime = time.time()
+async def createArc(
+    request: Request,
+    arcContent: arcContent,
+    token: commonToken,
+    background: bool = False,
+):
     try:
         header = {
             "Authorization": "Bearer " + token["gitlab"],
@@ -1205,16 +1078,16 @@ async def createArc(request: Request, arcContent: arcContent, token: commonToken
         target = getTarget(token["target"])
     except:
         logging.warning(f"Client not logged in for ARC creation!")
-        writeLogJson(
-            "createArc",
-            401,
-            startTime,
-            f"Client not logged in for ARC creation!",
-        )
         raise HTTPException(
             status_code=HTTP_401_UNAUTHORIZED,
             detail="Please login to create a new ARC or refresh the session!",
         )
+
+    # create the arc as a background job, if requested (its state can be polled at /jobs/{jobId})
+    if background:
+        return startJob(
+            "createArc", token, lambda: createArc(request, arcContent, token)
+        )
     # read out the new arc properties
     try:
         name = sanitizeInput(arcContent.name)
@@ -1240,27 +1113,21 @@ async def createArc(request: Request, arcContent: arcContent, token: commonToken
         project["namespace_id"] = arcContent.groupId
 
     try:
-        projectPost = session.post(
-            os.environ.get(target) + "/api/v4/projects",
+        projectPost = await getClient(target).post(
+            "/api/v4/projects",
             headers=header,
-            data=json.dumps(project),
+            content=json.dumps(project),
+            retries=5,
         )
     except Exception as e:
         logging.error(e)
-        writeLogJson("createArc", 504, startTime, e)
         raise HTTPException(
             status_code=status.HTTP_504_GATEWAY_TIMEOUT,
             detail=f"Couldn't upload file to repo! Error: {e}",
         )
 
-    if not projectPost.ok:
+    if not projectPost.is_success:
         logging.error(f"Couldn't create new ARC! ERROR: {projectPost.content}")
-        writeLogJson(
-            "createArc",
-            500,
-            startTime,
-            f"Couldn't create new ARC! ERROR: {projectPost.content}",
-        )
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Couldn't create new project! Error: {projectPost.content}",
@@ -1271,27 +1138,21 @@ async def createArc(request: Request, arcContent: arcContent, token: commonToken
     try:
         newArcJson = projectPost.json()
     except:
-        writeLogJson(
-            "createArc",
-            500,
-            startTime,
-            f"Error while retrieving data for new ARC!",
-        )
         raise HTTPException(
             status_code=HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error while retrieving data for new ARC!",
         )
 
     logging.info(f"Created Arc with Id: {newArcJson['id']}")
+    reportProgress(0.3, "Creating the ARC structure")
 
     # replace empty space with underscores
     investIdentifier = investIdentifier.replace(" ", "_")
 
     # allow force push
     try:
-        branchForcePush = requests.patch(
-            os.environ.get(target)
-            + f"/api/v4/projects/{newArcJson['id']}/protected_branches/{newArcJson['default_branch']}?allow_force_push=true",
+        branchForcePush = await getClient(target).patch(
+            f"/api/v4/projects/{newArcJson['id']}/protected_branches/{newArcJson['default_branch']}?allow_force_push=true",
             headers=header,
         )
     except Exception as e:
@@ -1350,102 +1211,65 @@ async def createArc(request: Request, arcContent: arcContent, token: commonToken
         }
     )
     """
-    # wrap the payload into json
-    payload = json.dumps(
-        {
-            "branch": newArcJson["default_branch"],
-            "commit_message": "Initial commit of the arc structure",
-            "actions": arcData,
-        }
+    # send the data to the repo (split into several commits, if it is too large)
+    commit = CommitBuilder(
+        target,
+        newArcJson["id"],
+        newArcJson["default_branch"],
+        "Initial commit of the arc structure",
+        header,
+        errorStatus=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        retries=5,
+        progress=(0.3, 0.6),
     )
-    logging.debug(f"Sent commit request to repo with payload {payload}")
-    try:
-        # send the data to the repo
-        commitRequest = session.post(
-            f"{os.environ.get(target)}/api/v4/projects/{newArcJson['id']}/repository/commits",
-            headers=header,
-            data=payload,
-        )
-    except:
-        logging.error(f"Couldn't upload content to ARC! ERROR: {commitRequest.content}")
-        writeLogJson(
-            "createArc",
-            500,
-            startTime,
-            f"Couldn't upload content to ARC! ERROR: {commitRequest.content}",
-        )
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Couldn't upload content to new ARC! Error: {commitRequest.content}",
-        )
+    commit.extend(arcData)
+    logging.debug(f"Sent commit request to repo with {len(arcData)} actions")
+    commitRequest = (await commit.commit())[-1]
 
-    if not commitRequest.ok:
-        logging.error(f"Couldn't upload content to ARC! ERROR: {commitRequest.content}")
-        writeLogJson(
-            "createArc",
-            500,
-            startTime,
-            f"Couldn't upload content to ARC! ERROR: {commitRequest.content}",
-        )
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Couldn't upload content to new ARC! Error: {commitRequest.content}",
-        )
-    else:
-        logging.info(f"Created new ARC with ID: {newArcJson['id']}")
-
-        # write identifier into investigation file
-        await arc_file(
-            id=newArcJson["id"],
-            path="isa.investigation.xlsx",
-            request=request,
-            token=token,
-            branch=newArcJson["default_branch"],
-        )
-        # fill in the identifier, name and description of the arc into the investigation file
-        writeIsaFile(
-            path="isa.investigation.xlsx",
-            type="investigation",
-            newContent=["Investigation Identifier", investIdentifier],
-            repoId=newArcJson["id"],
-            location=token["target"],
-        )
-        writeIsaFile(
-            path="isa.investigation.xlsx",
-            type="investigation",
-            newContent=["Investigation Title", name],
-            repoId=newArcJson["id"],
-            location=token["target"],
-        )
-        writeIsaFile(
-            path="isa.investigation.xlsx",
-            type="investigation",
-            newContent=["Investigation Description", description],
-            repoId=newArcJson["id"],
-            location=token["target"],
-        )
-
-        await commitFile(
-            request=request,
-            id=newArcJson["id"],
-            repoPath="isa.investigation.xlsx",
-            token=token,
-            filePath=f"{os.environ.get('BACKEND_SAVE')}{token['target']}-{newArcJson['id']}/isa.investigation.xlsx",
-            branch=newArcJson["default_branch"],
-        )
-
-        # allow force push
-        if not branchForcePush.ok:
-            try:
-                branchForcePush = requests.patch(
-                    os.environ.get(target)
-                    + f"/api/v4/projects/{newArcJson['id']}/protected_branches/{newArcJson['default_branch']}?allow_force_push=true",
-                    headers=header,
-                )
-            except Exception as e:
-                logging.error(e)
+    logging.info(f"Created new ARC with ID: {newArcJson['id']}")
+    reportProgress(0.6, "Filling in the investigation")
+
+    # write identifier into investigation file
+    await getWorkingCopy(
+        id=newArcJson["id"],
+        path="isa.investigation.xlsx",
+        request=request,
+        token=token,
+        branch=newArcJson["default_branch"],
+    )
+    # fill in the identifier, name and description of the arc into the investigation file
+    await runExcel(
+        writeIsaRows,
+        path="isa.investigation.xlsx",
+        type="investigation",
+        rows=[
+            ["Investigation Identifier", investIdentifier],
+            ["Investigation Title", name],
+            ["Investigation Description", description],
+        ],
+        repoId=newArcJson["id"],
+        location=token["target"],
+    )
+
+    await commitFile(
+        request=request,
+        id=newArcJson["id"],
+        repoPath="isa.investigation.xlsx",
+        token=token,
+        filePath=f"{os.environ.get('BACKEND_SAVE')}{token['target']}-{newArcJson['id']}/isa.investigation.xlsx",
+        branch=newArcJson["default_branch"],
+    )
+
+    # allow force push
+    if not branchForcePush.is_success:
+        try:
+            branchForcePush = await getClient(target).patch(
+                f"/api/v4/projects/{newArcJson['id']}/protected_branches/{newArcJson['default_branch']}?allow_force_push=true",
+                headers=header,
+            )
+        except Exception as e:
+            logging.error(e)
 
-        writeLogJson("createArc", 201, startTime)
     return [projectPost.content, commitRequest.content]
 
 
@@ -1462,7 +1286,6 @@ async def repairArc(
     id: int,
     branch="main",
 ):
-    startTime = time.time()
     try:
         header = {
             "Authorization": "Bearer " + token["gitlab"],
@@ -1471,12 +1294,6 @@ async def repairArc(
         target = getTarget(token["target"])
     except:
         logging.warning(f"Client not logged in for ARC creation!")
-        writeLogJson(
-            "createArc",
-            401,
-            startTime,
-            f"Client not logged in for ARC creation!",
-        )
         raise HTTPException(
             status_code=HTTP_401_UNAUTHORIZED,
             detail="Please login to repair the ARC or refresh the session!",
@@ -1560,21 +1377,15 @@ async def repairArc(
     )
     logging.debug(f"Sent commit request to repo with payload {payload}")
     # send the data to the repo
-    commitRequest = requests.post(
-        f"{os.environ.get(target)}/api/v4/projects/{id}/repository/commits",
+    commitRequest = await getClient(target).post(
+        f"/api/v4/projects/{id}/repository/commits",
         headers=header,
-        data=payload,
+        content=payload,
     )
-    if not commitRequest.ok:
+    if not commitRequest.is_success:
         logging.error(
             f"Couldn't commit ARC structure to the Hub! ERROR: {commitRequest.content}"
         )
-        writeLogJson(
-            "createArc",
-            500,
-            startTime,
-            f"Couldn't commit ARC structure to the Hub! ERROR: {commitRequest.content}",
-        )
         raise HTTPException(
             status_code=HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Couldn't commit the arc to the repo! Error: {commitRequest.content}",
@@ -1582,7 +1393,7 @@ async def repairArc(
     logging.info(f"Created new ARC with ID: {id}")
 
     # write identifier into investigation file
-    await arc_file(
+    await getWorkingCopy(
         id=id,
         path="isa.investigation.xlsx",
         request=request,
@@ -1590,24 +1401,15 @@ async def repairArc(
         branch=branch,
     )
     # fill in the identifier, name and description of the arc into the investigation file
-    writeIsaFile(
-        path="isa.investigation.xlsx",
-        type="investigation",
-        newContent=["Investigation Identifier", investIdentifier],
-        repoId=id,
-        location=token["target"],
-    )
-    writeIsaFile(
+    await runExcel(
+        writeIsaRows,
         path="isa.investigation.xlsx",
         type="investigation",
-        newContent=["Investigation Title", name],
-        repoId=id,
-        location=token["target"],
-    )
-    writeIsaFile(
-        path="isa.investigation.xlsx",
-        type="investigation",
-        newContent=["Investigation Description", description],
+        rows=[
+            ["Investigation Identifier", investIdentifier],
+            ["Investigation Title", name],
+            ["Investigation Description", description],
+        ],
         repoId=id,
         location=token["target"],
     )
@@ -1633,7 +1435,6 @@ async def repairArc(
     response_description="Response of the commit request from Gitlab.",
 )
 async def createIsa(request: Request, isaContent: newIsa, token: commonToken):
-    startTime = time.time()
     try:
         header = {
             "Authorization": "Bearer " + token["gitlab"],
@@ -1642,12 +1443,6 @@ async def createIsa(request: Request, isaContent: newIsa, token: commonToken):
         target = getTarget(token["target"])
     except:
         logging.warning(f"Client not authorized to create new ISA!")
-        writeLogJson(
-            "createISA",
-            401,
-            startTime,
-            f"Client not authorized to create new ISA!",
-        )
         raise HTTPException(
             status_code=HTTP_401_UNAUTHORIZED,
             detail="Not authorized to create new ISA! Please authorize or refresh session!",
@@ -1661,12 +1456,6 @@ async def createIsa(request: Request, isaContent: newIsa, token: commonToken):
         branch = isaContent.branch
     except:
         logging.error(f"Missing Properties for isa! Data: {isaContent}")
-        writeLogJson(
-            "createISA",
-            400,
-            startTime,
-            f"Missing Properties for isa! Data: {isaContent}",
-        )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Missing Properties for the isa!",
@@ -1737,42 +1526,19 @@ async def createIsa(request: Request, isaContent: newIsa, token: commonToken):
         }
     )
 
-    # wrap the payload into json
-    payload = json.dumps(
-        {
-            "branch": branch,
-            "commit_message": f"Added new {type} {identifier}",
-            "actions": isaData,
-        }
-    )
-    logging.debug("Sent commit request with payload " + str(payload))
-
     # send the data to the repo
-    try:
-        commitRequest = session.post(
-            f"{os.environ.get(target)}/api/v4/projects/{id}/repository/commits",
-            headers=header,
-            data=payload,
-        )
-    except Exception as e:
-        logging.error(e)
-        writeLogJson("createISA", 504, startTime, e)
-        raise HTTPException(
-            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
-            detail=f"Couldn't create new ISA! Error: {e}",
-        )
-    if not commitRequest.ok:
-        logging.error(f"Couldn't commit ISA to ARC! ERROR: {commitRequest.content}")
-        writeLogJson(
-            "createISA",
-            500,
-            startTime,
-            f"Couldn't commit ISA to ARC! ERROR: {commitRequest.content}",
-        )
-        raise HTTPException(
-            status_code=HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Couldn't commit ISA structure to repo! Error: {commitRequest.content}",
-        )
+    commit = CommitBuilder(
+        target,
+        id,
+        branch,
+        f"Added new {type} {identifier}",
+        header,
+        errorStatus=HTTP_500_INTERNAL_SERVER_ERROR,
+        retries=5,
+    )
+    commit.extend(isaData)
+    logging.debug(f"Sent commit request with {len(isaData)} actions")
+    commitRequest = (await commit.commit())[-1]
 
     logging.info(f"Created {identifier} in {type} for ARC {id}")
 
@@ -1782,26 +1548,18 @@ async def createIsa(request: Request, isaContent: newIsa, token: commonToken):
         case "studies":
             # first, get the file
             pathName = f"{type}/{identifier}/isa.study.xlsx"
-            await arc_file(
+            await getWorkingCopy(
                 id, path=pathName, branch=branch, request=request, token=token
             )
 
-            # then write the identifier in the corresponding field
-            writeIsaFile(
+            # then write the identifier and the file name in the corresponding fields
+            await runExcel(
+                writeIsaRows,
                 path=pathName,
                 type="study",
-                newContent=["Study Identifier", identifier],
-                repoId=id,
-                location=token["target"],
-            )
-            # edit also the file Name field
-            writeIsaFile(
-                path=pathName,
-                type="study",
-                newContent=[
-                    "Study File Name",
-                    f"studies/{identifier}/isa.study.xlsx",
-                    "",
+                rows=[
+                    ["Study Identifier", identifier],
+                    ["Study File Name", f"studies/{identifier}/isa.study.xlsx", ""],
                 ],
                 repoId=id,
                 location=token["target"],
@@ -1809,26 +1567,18 @@ async def createIsa(request: Request, isaContent: newIsa, token: commonToken):
         case "assays":
             # first, get the file
             pathName = f"{type}/{identifier}/isa.assay.xlsx"
-            await arc_file(
+            await getWorkingCopy(
                 id, path=pathName, branch=branch, request=request, token=token
             )
 
-            # then write the identifier in the corresponding field
-            writeIsaFile(
-                path=pathName,
-                type="assay",
-                newContent=["Assay Measurement Type", identifier],
-                repoId=id,
-                location=token["target"],
-            )
-            # edit also the file Name field
-            writeIsaFile(
+            # then write the identifier and the file name in the corresponding fields
+            await runExcel(
+                writeIsaRows,
                 path=pathName,
                 type="assay",
-                newContent=[
-                    "Assay File Name",
-                    f"assays/{identifier}/isa.assay.xlsx",
-                    "",
+                rows=[
+                    ["Assay Measurement Type", identifier],
+                    ["Assay File Name", f"assays/{identifier}/isa.assay.xlsx", ""],
                 ],
                 repoId=id,
                 location=token["target"],
@@ -1841,11 +1591,6 @@ async def createIsa(request: Request, isaContent: newIsa, token: commonToken):
         token=token,
         filePath=f"{os.environ.get('BACKEND_SAVE')}{token['target']}-{id}/{pathName}",
     )
-    writeLogJson(
-        "createISA",
-        201,
-        startTime,
-    )
     return commitRequest.content
 
 
@@ -1863,22 +1608,15 @@ async def getChanges(
     token: commonToken,
     branch: str = "main",
 ) -> list:
-    startTime = time.time()
-    header, target = startRequest(request, token, startTime, "getChanges")
+    header, target = startRequest(request, token)
 
-    commits = requests.get(
-        f"{os.environ.get(target)}/api/v4/projects/{id}/repository/commits?per_page=100&ref_name={branch}",
+    commits = await getClient(target).get(
+        f"/api/v4/projects/{id}/repository/commits?per_page=100&ref_name={branch}",
         headers=header,
     )
 
-    if not commits.ok:
+    if not commits.is_success:
         logging.error(f"Commits not found! ID: {id} ; ERROR: {commits.content}")
-        writeLogJson(
-            "getChanges",
-            404,
-            startTime,
-            f"Commits not found! ID: {id} ; ERROR: {commits.content}",
-        )
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Commits not found! Error: {commits.content}! Try to login again!",
@@ -1888,7 +1626,6 @@ async def getChanges(
     except:
         commitJson = {}
 
-    writeLogJson("getChanges", 200, startTime)
     return [
         f"{entry['authored_date'].split('T')[0]}: {entry['title']}"
         for entry in commitJson
@@ -1902,7 +1639,6 @@ async def getChanges(
 async def getStudies(
     request: Request, id: int, token: commonToken, branch="main"
 ) -> list:
-    startTime = time.time()
     try:
         # request arc studies
         studiesJson = await arc_path(
@@ -1910,18 +1646,11 @@ async def getStudies(
         )
     except:
         logging.warning(f"No authorized Cookie found!")
-        writeLogJson(
-            "getStudies",
-            401,
-            startTime,
-            f"No authorized Cookie found!",
-        )
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="No authorized cookie found! Please authorize or refresh session!",
         )
 
-    writeLogJson("getStudies", 200, startTime)
     return [
         x["name"] for x in json.loads(studiesJson.body)["Arc"] if x["type"] == "tree"
     ]
@@ -1934,7 +1663,6 @@ async def getStudies(
 async def getAssays(
     request: Request, id: int, token: commonToken, branch="main"
 ) -> list:
-    startTime = time.time()
     try:
         # request arc assays
         assaysJson = await arc_path(
@@ -1942,50 +1670,23 @@ async def getAssays(
         )
     except:
         logging.warning(f"No authorized Cookie found!")
-        writeLogJson(
-            "getAssays",
-            401,
-            startTime,
-            f"No authorized Cookie found!",
-        )
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="No authorized cookie found! Please authorize or refresh session!",
         )
 
-    writeLogJson("getAssays", 200, startTime)
     return [
         x["name"] for x in json.loads(assaysJson.body)["Arc"] if x["type"] == "tree"
     ]
 
 
-# writes all the assay data into the isa file of the selected study (adds a new column with the data)
-@router.patch(
-    "/syncAssay",
-    summary="Syncs an assay into a study",
-    description="Writes the assay data into the 'Study Assay' part of the given study file, therefore syncing and connecting it to a study.",
-    response_description="Response of the commit request from Gitlab.",
-)
-async def syncAssay(
-    request: Request, syncContent: syncAssayContent, token: commonToken
+# appends the assay to the working copy of the study (the study is committed with the transaction)
+async def stageAssaySync(
+    transaction: IsaTransaction,
+    syncContent: syncAssayContent,
+    request: Request,
+    token: commonToken,
 ):
-    startTime = time.time()
-    try:
-        target = token["target"]
-
-    except:
-        logging.warning(f"No authorized Cookie found!")
-        writeLogJson(
-            "syncAssays",
-            401,
-            startTime,
-            f"No authorized Cookie found!",
-        )
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="No authorized cookie found! Please authorize or refresh session!",
-        )
-
     # get the necessary information from the request
     try:
         id = syncContent.id
@@ -1996,20 +1697,14 @@ async def syncAssay(
 
     except:
         logging.warning(f"Missing Data for Assay sync! Data: {syncContent}")
-        writeLogJson(
-            "syncAssays",
-            400,
-            startTime,
-            f"Missing Data for Assay sync! Data: {syncContent}",
-        )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Missing Data!"
         )
 
-    # get the two files in the backend
+    # get the two files (files already in the transaction aren't downloaded again)
     try:
-        await arc_file(
-            id=id, path=pathToAssay, request=request, branch=branch, token=token
+        await transaction.load(
+            pathToAssay, lambda x: getIsaContent(id, x, request, token, branch)
         )
     except:
         raise HTTPException(
@@ -2017,76 +1712,67 @@ async def syncAssay(
             detail=f"Study '{assayName}' has no isa.assay.xlsx file! Please add/upload one!",
         )
     try:
-        await arc_file(id, pathToStudy, request, token, branch)
+        await transaction.load(
+            pathToStudy, lambda x: getIsaContent(id, x, request, token, branch)
+        )
     except:
         raise HTTPException(
             status_code=404,
             detail=f"Study '{pathToStudy}' has no isa.study.xlsx file! Please add/upload one!",
         )
 
-    assayPath = f"{os.environ.get('BACKEND_SAVE')}{target}-{id}/{pathToAssay}"
-    studyPath = f"{os.environ.get('BACKEND_SAVE')}{target}-{id}/{pathToStudy}"
-
     # append the assay to the study
-    appendAssay(pathToAssay=assayPath, pathToStudy=studyPath, assayName=assayName)
-    logging.debug("committing file to repo...")
-    # call the commit function
-    try:
-        commitResponse = await commitFile(
-            request,
-            id,
-            pathToStudy,
-            token,
-            studyPath,
-            branch,
-            f": synced {pathToAssay} to {pathToStudy}",
-        )
-    except:
-        logging.warning(f"Client is not authorized to commit to ARC!")
-        writeLogJson(
-            "syncAssays",
-            401,
-            startTime,
-            f"Client is not authorized to commit to ARC!",
-        )
-        raise HTTPException(
-            status_code=HTTP_401_UNAUTHORIZED,
-            detail="No authorized session cookie found! Please authorize or refresh session!",
-        )
-
-    logging.info(f"Sent file {pathToStudy} to ARC {id}")
-    writeLogJson("syncAssays", 200, startTime)
-    # frontend gets the response from the commit post back
-    return str(commitResponse)
+    await runExcel(
+        appendAssay,
+        pathToAssay=transaction.localPath(pathToAssay),
+        pathToStudy=transaction.localPath(pathToStudy),
+        assayName=assayName,
+    )
+    transaction.change(pathToStudy, f"Synced {pathToAssay} to {pathToStudy}")
 
 
-# writes all the study data into the investigation file (appends the rows of the study to the investigation)
+# writes all the assay data into the isa file of the selected study (adds a new column with the data)
 @router.patch(
-    "/syncStudy",
-    summary="Syncs a study into the investigation file",
-    description="Writes the full study data into the investigation file or appending it underneath if a study is already in existence. This will sync the study and the assays synced to the study to the investigation file.",
+    "/syncAssay",
+    summary="Syncs an assay into a study",
+    description="Writes the assay data into the 'Study Assay' part of the given study file, therefore syncing and connecting it to a study.",
     response_description="Response of the commit request from Gitlab.",
 )
-async def syncStudy(
-    request: Request, syncContent: syncStudyContent, token: commonToken
+async def syncAssay(
+    request: Request, syncContent: syncAssayContent, token: commonToken
 ):
-    startTime = time.time()
-    try:
-        target = token["target"]
+    header, target = startRequest(request, token)
+    async with IsaTransaction(
+        target, syncContent.id, syncContent.branch, header
+    ) as transaction:
+        await stageAssaySync(transaction, syncContent, request, token)
+
+        logging.debug("committing file to repo...")
+        # call the commit function
+        try:
+            commitResponse = await transaction.commit()
+        except HTTPException as e:
+            # the file was changed by someone else in the meantime
+            if e.status_code == status.HTTP_409_CONFLICT:
+                raise
+            logging.warning(f"Client is not authorized to commit to ARC!")
+            raise HTTPException(
+                status_code=HTTP_401_UNAUTHORIZED,
+                detail="No authorized session cookie found! Please authorize or refresh session!",
+            )
+
+    logging.info(f"Sent file {syncContent.pathToStudy} to ARC {syncContent.id}")
+    # frontend gets the response from the commit post back
+    return str(commitResponse)
 
-    except:
-        logging.warning(f"No authorized Cookie found!")
-        writeLogJson(
-            "syncStudy",
-            401,
-            startTime,
-            f"No authorized Cookie found!",
-        )
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="No authorized cookie found! Please authorize or refresh session!",
-        )
 
+# appends the study to the working copy of the investigation (the investigation is committed with the transaction)
+async def stageStudySync(
+    transaction: IsaTransaction,
+    syncContent: syncStudyContent,
+    request: Request,
+    token: commonToken,
+):
     # get the necessary information from the request
     try:
         id = syncContent.id
@@ -2096,69 +1782,74 @@ async def syncStudy(
 
     except:
         logging.warning(f"Missing Data for Assay sync! Data: {syncContent}")
-        writeLogJson(
-            "syncStudy",
-            400,
-            startTime,
-            f"Missing Data for Assay sync! Data: {syncContent}",
-        )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Missing Data!"
         )
 
-    # get the two files in the backend
+    # get the two files (files already in the transaction aren't downloaded again)
     try:
-        await arc_file(
-            id=id,
-            path="isa.investigation.xlsx",
-            request=request,
-            token=token,
-            branch=branch,
-        )
-    except:
-        raise HTTPException(
-            status_code=404,
-            detail=f"No isa.investigation.xlsx found! Please add/upload one!",
+        await transaction.load(
+            pathToStudy, lambda x: getIsaContent(id, x, request, token, branch)
         )
-    try:
-        await arc_file(id, pathToStudy, request, token, branch)
     except:
         raise HTTPException(
             status_code=404,
             detail=f"Study '{studyName}' has no isa.study.xlsx file! Please add/upload one!",
         )
-
-    investPath = f"{os.environ.get('BACKEND_SAVE')}{target}-{id}/isa.investigation.xlsx"
-    studyPath = f"{os.environ.get('BACKEND_SAVE')}{target}-{id}/{pathToStudy}"
-    # append the study to the investigation file
-    appendStudy(pathToInvest=investPath, pathToStudy=studyPath, studyName=studyName)
-    logging.debug("committing file to repo...")
-    # call the commit function
     try:
-        commitResponse = await commitFile(
-            request,
-            id,
+        await transaction.load(
             "isa.investigation.xlsx",
-            token,
-            investPath,
-            branch,
-            f": synced {pathToStudy} to ISA investigation",
+            lambda x: getIsaContent(id, x, request, token, branch),
         )
     except:
-        logging.warning(f"Client is not authorized to commit to ARC!")
-        writeLogJson(
-            "syncStudy",
-            401,
-            startTime,
-            f"Client is not authorized to commit to ARC!",
-        )
         raise HTTPException(
-            status_code=HTTP_401_UNAUTHORIZED,
-            detail="No authorized session cookie found! Please authorize or refresh session!",
+            status_code=404,
+            detail=f"No isa.investigation.xlsx found! Please add/upload one!",
         )
 
-    logging.info(f"Sent file isa.investigation.xlsx to ARC {id}")
-    writeLogJson("syncStudy", 200, startTime)
+    # append the study to the investigation file
+    await runExcel(
+        appendStudy,
+        pathToInvest=transaction.localPath("isa.investigation.xlsx"),
+        pathToStudy=transaction.localPath(pathToStudy),
+        studyName=studyName,
+    )
+    transaction.change(
+        "isa.investigation.xlsx", f"Synced {pathToStudy} to ISA investigation"
+    )
+
+
+# writes all the study data into the investigation file (appends the rows of the study to the investigation)
+@router.patch(
+    "/syncStudy",
+    summary="Syncs a study into the investigation file",
+    description="Writes the full study data into the investigation file or appending it underneath if a study is already in existence. This will sync the study and the assays synced to the study to the investigation file.",
+    response_description="Response of the commit request from Gitlab.",
+)
+async def syncStudy(
+    request: Request, syncContent: syncStudyContent, token: commonToken
+):
+    header, target = startRequest(request, token)
+    async with IsaTransaction(
+        target, syncContent.id, syncContent.branch, header
+    ) as transaction:
+        await stageStudySync(transaction, syncContent, request, token)
+
+        logging.debug("committing file to repo...")
+        # call the commit function
+        try:
+            commitResponse = await transaction.commit()
+        except HTTPException as e:
+            # the file was changed by someone else in the meantime
+            if e.status_code == status.HTTP_409_CONFLICT:
+                raise
+            logging.warning(f"Client is not authorized to commit to ARC!")
+            raise HTTPException(
+                status_code=HTTP_401_UNAUTHORIZED,
+                detail="No authorized session cookie found! Please authorize or refresh session!",
+            )
+
+    logging.info(f"Sent file isa.investigation.xlsx to ARC {syncContent.id}")
     # frontend gets a simple 'success' as response
     return str(commitResponse)
 
@@ -2173,53 +1864,22 @@ async def getMetrics(request: Request, pwd: str):
     if os.environ.get("METRICS") != pwd:
         raise HTTPException(status_code=HTTP_401_UNAUTHORIZED, detail="Wrong Password!")
 
-    # load the log json containing the data
-    try:
-        with open("log.json", "r") as log:
-            jsonLog = json.load(log)
-        if len(jsonLog) < 1:
-            raise Exception()
-    except:
-        raise HTTPException(status_code=500, detail="No Metrics found!")
-
-    # setup the different metrics
-    responseTimes = {}
-    statusCodes = {}
-    errors = []
-
-    # fill the metrics with respective data
-    for entry in jsonLog:
-        # calculate the average response time for each entry point
-        try:
-            average = responseTimes[entry["endpoint"]][0]
-            count = responseTimes[entry["endpoint"]][1]
-            responseTime = entry["response_time"]
-
-            newAverage = (float(average) * int(count) + float(responseTime)) / int(
-                count + 1
-            )
+    # merge the aggregated metrics of all workers
+    summary = metrics.summary(logStore.path)
 
-            responseTimes[entry["endpoint"]] = [str(newAverage), count + 1]
-
-        # if there is no entry yet for the endpoint, create one
-        except:
-            responseTimes[entry["endpoint"]] = [entry["response_time"], 1]
-
-        # calculate the amount of each status code
-        try:
-            count = statusCodes[entry["status"]]
-            statusCodes[entry["status"]] = int(count) + 1
-        # if the status code is not listed yet, add it
-        except:
-            statusCodes[entry["status"]] = 1
-        # if there is an error, add it to the array
-        if entry["error"] != None and entry["error"] != "None":
-            errors.append(f"{entry['endpoint']}, {entry['status']}: {entry['error']}")
+    # average response time and amount of requests of the last day for each endpoint
+    responseTimes = {
+        endpoint: [windows["24h"]["mean"] / 1000, windows["24h"]["count"]]
+        for endpoint, windows in summary["endpoints"].items()
+    }
 
     return {
         "responseTimes": responseTimes,
-        "statusCodes": statusCodes,
-        "errors": errors,
+        **summary,
+        "connectionPools": poolStats(),
+        "isaCache": isaCache.stats(),
+        "excelPool": excelPool.stats(),
+        "retries": retryBudget.stats(),
     }
 
 
@@ -2233,30 +1893,22 @@ async def getMetrics(request: Request, pwd: str):
 async def getBranches(
     request: Request, id: Annotated[int, Query(ge=1)], token: commonToken
 ) -> list:
-    startTime = time.time()
-    header, target = startRequest(request, token, startTime, "getBranches")
+    header, target = startRequest(request, token)
 
     try:
         # request branches
-        branches = requests.get(
-            f"{os.environ.get(target)}/api/v4/projects/{id}/repository/branches",
+        branches = await getClient(target).get(
+            f"/api/v4/projects/{id}/repository/branches",
             headers=header,
         )
         branchJson = branches.json()
 
     except:
         logging.warning(f"No authorized Cookie found!")
-        writeLogJson(
-            "getBranches",
-            401,
-            startTime,
-            f"No authorized Cookie found!",
-        )
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="No authorized cookie found! Please authorize or refresh session!",
         )
-    writeLogJson("getBranches", 200, startTime)
     try:
         return [x["name"] for x in branchJson]
     except:
@@ -2273,7 +1925,6 @@ async def getBranches(
 async def addDatamap(
     request: Request, datamapContent: datamapContent, token: commonToken
 ):
-    startTime = time.time()
     try:
         header = {
             "Authorization": "Bearer " + token["gitlab"],
@@ -2282,12 +1933,6 @@ async def addDatamap(
         target = getTarget(token["target"])
     except:
         logging.warning(f"Client not authorized to create new datamap!")
-        writeLogJson(
-            "addDatamap",
-            401,
-            startTime,
-            f"Client not authorized to create new datamap!",
-        )
         raise HTTPException(
             status_code=HTTP_401_UNAUTHORIZED,
             detail="Not authorized to create new datamap! Please authorize or refresh session!",
@@ -2300,12 +1945,6 @@ async def addDatamap(
         branch = datamapContent.branch
     except:
         logging.error(f"Missing Properties for datamap! Data: {datamapContent}")
-        writeLogJson(
-            "addDatamap",
-            400,
-            startTime,
-            f"Missing Properties for datamap! Data: {datamapContent}",
-        )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Missing Properties for the datamap!",
@@ -2337,19 +1976,13 @@ async def addDatamap(
     )
     logging.debug("Sent commit request with payload " + str(payload))
     # send the data to the repo
-    commitRequest = requests.post(
-        f"{os.environ.get(target)}/api/v4/projects/{id}/repository/commits",
+    commitRequest = await getClient(target).post(
+        f"/api/v4/projects/{id}/repository/commits",
         headers=header,
-        data=payload,
+        content=payload,
     )
-    if not commitRequest.ok:
+    if not commitRequest.is_success:
         logging.error(f"Couldn't commit datamap to ARC! ERROR: {commitRequest.content}")
-        writeLogJson(
-            "addDatamap",
-            500,
-            startTime,
-            f"Couldn't commit datamap to ARC! ERROR: {commitRequest.content}",
-        )
         raise HTTPException(
             status_code=HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Couldn't commit datamap to repo! Error: {commitRequest.content}",
@@ -2357,11 +1990,6 @@ async def addDatamap(
 
     logging.info(f"Created datamap in study {path} for ARC {id}")
 
-    writeLogJson(
-        "addDatamap",
-        201,
-        startTime,
-    )
     return commitRequest.content
 
 
@@ -2374,21 +2002,14 @@ async def addDatamap(
     status_code=status.HTTP_200_OK,
 )
 async def getBanner(request: Request, token: commonToken) -> Banner | None:
-    startTime = time.time()
-    header, target = startRequest(request, token, startTime, "getBanner")
+    header, target = startRequest(request, token)
 
     # send the data to the repo
-    bannerRequest = requests.get(
-        f"{os.environ.get(target)}/api/v4/broadcast_messages",
+    bannerRequest = await getClient(target).get(
+        "/api/v4/broadcast_messages",
     )
-    if not bannerRequest.ok:
+    if not bannerRequest.is_success:
         logging.error(f"Couldn't get datahub banner! ERROR: {bannerRequest.content}")
-        writeLogJson(
-            "addDatamap",
-            bannerRequest.status_code,
-            startTime,
-            f"Couldn't get datahub banner! ERROR: {bannerRequest.content}",
-        )
         raise HTTPException(
             status_code=bannerRequest.status_code,
             detail=f"Couldn't receive newest Datahub banner! Error: {bannerRequest.content}",
@@ -2399,26 +2020,10 @@ async def getBanner(request: Request, token: commonToken) -> Banner | None:
 
         for entry in banners.banners:
             if entry.active:
-                writeLogJson(
-                    "getBanner",
-                    200,
-                    startTime,
-                )
                 return entry
-        writeLogJson(
-            "getBanner",
-            200,
-            startTime,
-        )
         return None
     except Exception as e:
         logging.error(f"Couldn't get datahub banner! ERROR: {e}")
-        writeLogJson(
-            "addDatamap",
-            500,
-            startTime,
-            f"Couldn't get datahub banner! ERROR: {e}",
-        )
         raise HTTPException(
             status_code=500,
             detail=f"Couldn't receive newest Datahub banner!",
@@ -2432,7 +2037,10 @@ async def getBanner(request: Request, token: commonToken) -> Banner | None:
     status_code=status.HTTP_200_OK,
 )
 async def exportProject(
-    request: Request, token: commonToken, invenioData: InvenioContent
+    request: Request,
+    token: commonToken,
+    invenioData: InvenioContent,
+    background: bool = False,
 ):
     try:
         target = getTarget(token["target"])
@@ -2443,9 +2051,13 @@ async def exportProject(
     except:
         raise HTTPException(status_code=400, detail="Missing information!")
 
-    workDir = f"{os.environ.get('BACKEND_SAVE')}cache"
+    # publish the arc as a background job, if requested (its state can be polled at /jobs/{jobId})
+    if background:
+        return startJob(
+            "publishArc", token, lambda: exportProject(request, token, invenioData)
+        )
 
-    os.chdir(workDir)
+    workDir = f"{os.environ.get('BACKEND_SAVE')}cache"
 
     # cleanup any folders with the same name currently existing
     try:
@@ -2454,23 +2066,41 @@ async def exportProject(
     except Exception as e:
         logging.warning(str(e))
 
+    reportProgress(0.1, "Cloning the ARC")
+
+    # the token is sent as a header (given in the environment of git), so that it isn't part of the address
+    # and doesn't end up in the logs
+    credentials = base64.b64encode(f"oauth2:{token['gitlab']}".encode()).decode()
+    gitEnv = {
+        **os.environ,
+        "GIT_CONFIG_COUNT": "1",
+        "GIT_CONFIG_KEY_0": "http.extraHeader",
+        "GIT_CONFIG_VALUE_0": f"Authorization: Basic {credentials}",
+    }
+
+    # git runs in the threadpool (with the folder as working directory), so that the worker isn't blocked
     try:
-        gitClone = subprocess.run(
+        gitClone = await run_in_threadpool(
+            subprocess.run,
             [
                 "git",
                 "clone",
-                f"https://oauth2:{token['gitlab']}@{os.environ.get(target).split('://')[1]}/{namespace}.git",
-            ]
+                f"https://{os.environ.get(target).split('://')[1]}/{namespace}.git",
+            ],
+            cwd=workDir,
+            env=gitEnv,
         )
     except:
         logging.warning("Git clone failed. Folder probably already existing!")
 
     logging.debug(gitClone)
 
-    os.chdir(f"{workDir}/{arcName}")
+    reportProgress(0.4, "Archiving the ARC")
 
-    gitArchive = subprocess.run(
-        ["git", "archive", "--output=" + workDir + f"/{arcName}.zip", "HEAD"]
+    gitArchive = await run_in_threadpool(
+        subprocess.run,
+        ["git", "archive", "--output=" + workDir + f"/{arcName}.zip", "HEAD"],
+        cwd=f"{workDir}/{arcName}",
     )
 
     logging.debug(gitArchive)
@@ -2493,10 +2123,10 @@ async def exportProject(
 
     payload = [{"key": f"{arcName}.zip"}]
 
-    fileCreation = requests.post(
+    fileCreation = await getClient().post(
         f"{invenioAddress}/records/{invenioId}/draft/files",
         headers=normalHeader,
-        data=json.dumps(payload),
+        content=json.dumps(payload),
     )
 
     try:
@@ -2506,28 +2136,30 @@ async def exportProject(
         logging.error("Could not find/create arc zip file!")
         raise HTTPException(status_code=500, detail="Error archiving the arc!")
 
+    reportProgress(0.5, "Uploading the ARC to Invenio")
+
     try:
-        assert fileCreation.ok
+        assert fileCreation.is_success
 
-        testUpload = requests.put(
+        testUpload = await getClient().put(
             f"{invenioAddress}/records/{invenioId}/draft/files/{arcName}.zip/content",
             headers=uploadHeader,
-            data=fileData,
+            content=fileData,
+            timeout=None,
         )
 
-        assert testUpload.ok
+        assert testUpload.is_success
 
-        fileCommit = requests.post(
+        fileCommit = await getClient().post(
             f"{invenioAddress}/records/{invenioId}/draft/files/{arcName}.zip/commit",
             headers=normalHeader,
         )
 
-        assert fileCommit.ok
+        assert fileCommit.is_success
     except Exception as e:
         logging.error(str(e))
         raise HTTPException(status_code=500, detail="Arc could not be published!")
     try:
-        os.chdir(f"{workDir}")
         shutil.rmtree(f"{workDir}/{arcName}")
         os.remove(f"{workDir}/{arcName}.zip")
     except Exception as e:
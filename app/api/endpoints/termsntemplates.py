@@ -2,7 +2,6 @@ import datetime
 import json
 import logging
 import os
-import time
 from typing import Annotated
 import uuid
 from fastapi import (
@@ -16,10 +15,18 @@ from fastapi import (
     Request,
     Header,
 )
-import requests
+import httpx
 
 from app.api.IO.excelIO import createSheet, getIsaType, getSwateSheets
-from app.api.endpoints.projects import arc_file, commitFile, getData, writeLogJson
+from app.api.IO.excelPool import runExcel
+from app.api.IO.gitlabIO import getClient
+from app.api.IO.transactionIO import IsaTransaction
+from app.api.endpoints.projects import (
+    getData,
+    getIsaContent,
+    sanitizeInput,
+    startRequest,
+)
 from app.models.gitlab.input import sheetContent, templateContent
 from app.models.swate.template import Templates
 from app.models.swate.templateBuildingBlock import TemplateBB
@@ -39,12 +46,11 @@ commonToken = Annotated[str, Depends(getData)]
     response_description="Array containing all templates with detailed information, such as name, description, table layout, author etc.",
 )
 async def getTemplates() -> Templates:
-    startTime = time.time()
     # send get request to swate template registry api requesting all templates
-    request = requests.get("https://str.nfdi4plants.org/api/v1/templates")
+    request = await getClient().get("https://str.nfdi4plants.org/api/v1/templates")
 
     # if request was successful, parse the data
-    if request.ok:
+    if request.is_success:
         try:
             templateList = [
                 json.loads(entry["TemplateContent"]) for entry in request.json()
@@ -64,20 +70,14 @@ async def getTemplates() -> Templates:
 
     # if STR is down, try swate alpha
     else:
-        request = requests.get(
+        request = await getClient().get(
             "https://swate-alpha.nfdi4plants.org/api/ITemplateAPIv1/getTemplates"
         )
         # if swate alpha is also down, return error
-        if not request.ok:
+        if not request.is_success:
             logging.error(
                 f"There was an error retrieving the swate templates! ERROR: {templateJson}"
             )
-            writeLogJson(
-                "getTemplates",
-                500,
-                startTime,
-                f"There was an error retrieving the swate templates! ERROR: {templateJson}",
-            )
             raise HTTPException(
                 status_code=request.status_code,
                 detail="Couldn't receive swate templates",
@@ -107,11 +107,6 @@ async def getTemplates() -> Templates:
             pass
 
     logging.info("Sent list of swate templates to client!")
-    writeLogJson(
-        "getTemplates",
-        200,
-        startTime,
-    )
 
     return Templates(templates=templateList)
 
@@ -125,42 +120,30 @@ async def getTemplates() -> Templates:
     include_in_schema=False,
 )
 async def getTemplate(id: str) -> TemplateBB:
-    startTime = time.time()
     # wrap the desired id in an json array
     payload = json.dumps([id])
 
     logging.debug("Getting template with id: " + id)
     # request the template
-    request = requests.post(
+    request = await getClient().post(
         "https://swate.nfdi4plants.org/api/IProtocolAPIv1/getProtocolById",
-        data=payload,
+        content=payload,
     )
     try:
         templateJson = request.json()
     except:
         templateJson = {}
     # if swate is down (or the desired template somehow not available) return error 400
-    if not request.ok:
+    if not request.is_success:
         logging.error(
             f"There was an error retrieving the swate template with id {id} ! ERROR: {templateJson}"
         )
-        writeLogJson(
-            "getTemplate",
-            400,
-            startTime,
-            f"There was an error retrieving the swate template with id {id} ! ERROR: {templateJson}",
-        )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Couldn't find template with id: " + id,
         )
 
     logging.info(f"Sending template with id {id} to client!")
-    writeLogJson(
-        "getTemplate",
-        200,
-        startTime,
-    )
     return TemplateBB(templateBB=templateJson["TemplateBuildingBlocks"])
 
 
@@ -175,12 +158,11 @@ async def getTemplate(id: str) -> TemplateBB:
 async def getTerms(
     input: str,
 ) -> Terms:
-    startTime = time.time()
     # the following requests will timeout after 7s (10s for extended), because swate could otherwise freeze the backend by not returning any answer
     try:
-        request = requests.post(
+        request = await getClient().post(
             "https://swate-alpha.nfdi4plants.org/api/IOntologyAPIv3/searchTerm",
-            data=json.dumps(
+            content=json.dumps(
                 [
                     {
                         "limit": 50,
@@ -197,14 +179,8 @@ async def getTerms(
         except:
             termJson = {}
     # if there is a timeout, respond with an error 504
-    except requests.exceptions.Timeout:
+    except httpx.TimeoutException:
         logging.warning("Request took to long! Sending timeout error to client...")
-        writeLogJson(
-            "getTerms",
-            504,
-            startTime,
-            "Request took to long! Sending timeout error to client...",
-        )
         raise HTTPException(
             status_code=status.HTTP_504_GATEWAY_TIMEOUT,
             detail="No term could be found in time!",
@@ -215,19 +191,12 @@ async def getTerms(
         logging.error(
             f"There was an error retrieving the terms for '{input}'! ERROR: {termJson}"
         )
-        writeLogJson(
-            "getTerms",
-            400,
-            startTime,
-            f"There was an error retrieving the terms for '{input}'! ERROR: {termJson}",
-        )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Your request couldn't be processed!",
         )
 
     logging.info(f"Sent a list of terms for '{input}' to client!")
-    writeLogJson("getTerms", 200, startTime)
     try:
         output = Terms(terms=termJson)
     except:
@@ -250,13 +219,12 @@ async def getTerms(
 async def getTermSuggestionsByParentTerm(
     parentName: str, parentTermAccession: str
 ) -> Terms:
-    startTime = time.time()
     # the following requests will timeout after 7s (10s for extended), because swate could otherwise freeze the backend by not returning any answer
     try:
         # default is an request call containing the parentTerm values
-        request = requests.post(
+        request = await getClient().post(
             "https://swate-alpha.nfdi4plants.org/api/IOntologyAPIv2/getAllTermsByParentTerm",
-            data=json.dumps(
+            content=json.dumps(
                 [
                     {
                         "Name": parentName,
@@ -274,14 +242,8 @@ async def getTermSuggestionsByParentTerm(
         except:
             termJson = {}
     # if there is a timeout, respond with error 504
-    except requests.exceptions.Timeout:
+    except httpx.TimeoutException:
         logging.warning("Request took to long! Sending timeout error to client...")
-        writeLogJson(
-            "getTermSbPT",
-            504,
-            startTime,
-            "Request took to long! Sending timeout error to client...",
-        )
         raise HTTPException(
             status_code=status.HTTP_504_GATEWAY_TIMEOUT,
             detail="No terms could be found in time!",
@@ -292,22 +254,11 @@ async def getTermSuggestionsByParentTerm(
         logging.error(
             f"There was an error retrieving the terms for '{parentName}'! ERROR: {termJson}"
         )
-        writeLogJson(
-            "getTermSbPT",
-            400,
-            startTime,
-            f"There was an error retrieving the terms for '{parentName}'! ERROR: {termJson}",
-        )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Your request couldn't be processed!",
         )
     logging.info(f"Sent a list of terms for '{parentName}' to client!")
-    writeLogJson(
-        "getTermSbPT",
-        200,
-        startTime,
-    )
     try:
         output = Terms(terms=termJson)
     except:
@@ -329,13 +280,12 @@ async def getTermSuggestionsByParentTerm(
     include_in_schema=False,
 )
 async def getTermSuggestions(input: str, n=20) -> Terms:
-    startTime = time.time()
     # the following requests will timeout after 7s (10s for extended), because swate could otherwise freeze the backend by not returning any answer
     try:
         # default is an request call containing the parentTerm values
-        request = requests.post(
+        request = await getClient().post(
             "https://swate.nfdi4plants.org/api/IOntologyAPIv2/getTermSuggestions",
-            data=json.dumps(
+            content=json.dumps(
                 [
                     {
                         "n": n,
@@ -353,14 +303,8 @@ async def getTermSuggestions(input: str, n=20) -> Terms:
 
         logging.debug(f"Getting list of suggestion terms for the input '{input}'!")
     # if there is a timeout, respond with an error 504
-    except requests.exceptions.Timeout:
+    except httpx.TimeoutException:
         logging.warning("Request took to long! Sending timeout error to client...")
-        writeLogJson(
-            "getTermSugg.",
-            504,
-            startTime,
-            "Request took to long! Sending timeout error to client...",
-        )
         raise HTTPException(
             status_code=status.HTTP_504_GATEWAY_TIMEOUT,
             detail="No terms could be found in time!",
@@ -371,22 +315,11 @@ async def getTermSuggestions(input: str, n=20) -> Terms:
         logging.error(
             f"There was an error retrieving the terms for '{input}'! ERROR: {termJson}"
         )
-        writeLogJson(
-            "getTermSugg.",
-            400,
-            startTime,
-            f"There was an error retrieving the terms for '{input}'! ERROR: {termJson}",
-        )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Your request couldn't be processed!",
         )
     logging.info(f"Sent a list of terms for '{input}' to client!")
-    writeLogJson(
-        "getTermSugg.",
-        200,
-        startTime,
-    )
     try:
         output = Terms(terms=termJson)
     except:
@@ -407,7 +340,6 @@ async def getTermSuggestions(input: str, n=20) -> Terms:
     response_description="Response of the commit from Gitlab.",
 )
 async def saveSheet(request: Request, content: sheetContent, token: commonToken):
-    startTime = time.time()
     try:
         target = token["target"]
 
@@ -419,36 +351,32 @@ async def saveSheet(request: Request, content: sheetContent, token: commonToken)
     # if there are either the name or the accession missing, return error 400
     except:
         logging.warning("Client request couldn't be processed, the content is missing!")
-        writeLogJson(
-            "saveSheet",
-            400,
-            startTime,
-            "Client request couldn't be processed, the content is missing!",
-        )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Couldn't retrieve content of table",
         )
 
-    # get the file in the backend
-    await arc_file(projectId, path, request, token)
-
-    pathName = f"{os.environ.get('BACKEND_SAVE')}{target}-{projectId}/{path}"
-
     # if no sheet name is given, name it "sheet1"
     if name == "":
         name = "sheet1"
 
-    # add the new sheet to the file
-    createSheet(content, target)
+    header, gitlabTarget = startRequest(request, token)
+    async with IsaTransaction(gitlabTarget, projectId, branch, header) as transaction:
+        # get a working copy of the file
+        await transaction.load(
+            path, lambda x: getIsaContent(projectId, x, request, token, branch)
+        )
 
-    name = name.replace(" ", "_")
+        # add the new sheet to the file
+        await runExcel(
+            createSheet, content, target, pathName=transaction.localPath(path)
+        )
 
-    # send the edited file back to gitlab
-    response = await commitFile(
-        request, projectId, path, token, pathName, message=name, branch=branch
-    )
-    writeLogJson("saveSheet", 200, startTime)
+        name = name.replace(" ", "_")
+
+        # send the edited file back to gitlab
+        transaction.change(path, f"Updated {path}, changed {sanitizeInput(name)}")
+        response = await transaction.commit()
     return str(response)
 
 
@@ -466,16 +394,11 @@ async def getSheets(
     token: commonToken,
     branch: str = "main",
 ) -> tuple[list, list[str]]:
-    startTime = time.time()
-
-    # get the file in the backend
-    await arc_file(id, path, request, token, branch)
 
-    # construct path to the backend
-    pathName = f"{os.environ.get('BACKEND_SAVE')}{token['target']}-{id}/{path}"
+    # get the file (read in memory, as it isn't edited)
+    fileRaw, *_ = await getIsaContent(id, path, request, token, branch)
 
-    writeLogJson("getSheets", 200, startTime)
-    return getSwateSheets(pathName, getIsaType(path))
+    return await runExcel(getSwateSheets, fileRaw, getIsaType(path))
 
 
 @router.put(
@@ -486,7 +409,6 @@ async def getSheets(
     response_description="Empty response",
 )
 async def saveTemplate(request: Request, content: templateContent):
-    startTime = time.time()
 
     # get the full template data
     try:
@@ -504,12 +426,6 @@ async def saveTemplate(request: Request, content: templateContent):
     # if there are either the name or the accession missing, return error 400
     except:
         logging.warning("Client request couldn't be processed, the content is missing!")
-        writeLogJson(
-            "saveTemplate",
-            400,
-            startTime,
-            "Client request couldn't be processed, the content is missing!",
-        )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Couldn't retrieve content of table",
@@ -611,9 +527,6 @@ async def saveTemplate(request: Request, content: templateContent):
             json.dump(jsonFile, f, ensure_ascii=False, indent=4)
     except:
         logging.error("An error occurred trying to save the template!")
-        writeLogJson(
-            "saveTemplate", 500, startTime, "Error trying to save the template!"
-        )
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Couldn't save template!",
@@ -623,5 +536,4 @@ async def saveTemplate(request: Request, content: templateContent):
         f"Saved Template with name {username['firstName']}-{username['lastName']}-{identifier}.json"
     )
 
-    writeLogJson("saveTemplate", 200, startTime)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -1,6 +1,5 @@
 import logging
 import os
-import time
 from typing import Annotated
 from fastapi import (
     APIRouter,
@@ -10,9 +9,9 @@ from fastapi import (
     status,
     Request,
 )
-import requests
 
-from app.api.endpoints.projects import getData, getTarget, writeLogJson
+from app.api.IO.gitlabIO import getClient, getTarget
+from app.api.endpoints.projects import getData
 from app.models.gitlab.input import userContent
 from app.models.gitlab.user import Users
 
@@ -29,46 +28,32 @@ commonToken = Annotated[str, Depends(getData)]
     response_description="Array containing every possible user with details such as the id, name, avatar and more",
 )
 async def getUser(request: Request, token: commonToken) -> Users:
-    startTime = time.time()
     try:
         header = {"Authorization": "Bearer " + token["gitlab"]}
         target = getTarget(token["target"])
     except:
         logging.warning(f"No authorized Cookie found! Cookies: {request.cookies}")
-        writeLogJson(
-            "getUser",
-            401,
-            startTime,
-            f"No authorized Cookie found!",
-        )
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="No authorized cookie found! Please authorize or refresh session!",
         )
 
     userList = []
-    users = requests.head(
-        f"{os.environ.get(target)}/api/v4/users?per_page=100",
+    users = await getClient(target).head(
+        "/api/v4/users?per_page=100",
         headers=header,
     )
     try:
         pages = users.headers["x-total-pages"]
     except:
-        writeLogJson(
-            "getUser",
-            404,
-            startTime,
-            "No users found! Reason: " + users.reason,
-        )
         raise HTTPException(
             status_code=users.status_code,
-            detail="No users found! Reason: " + users.reason,
+            detail="No users found! Reason: " + users.reason_phrase,
         )
 
     for x in range(int(pages)):
-        users = requests.get(
-            f"{os.environ.get(target)}/api/v4/users?per_page=100&without_project_bots=true&page="
-            + str(x + 1),
+        users = await getClient(target).get(
+            "/api/v4/users?per_page=100&without_project_bots=true&page=" + str(x + 1),
             headers=header,
         )
         try:
@@ -77,7 +62,6 @@ async def getUser(request: Request, token: commonToken) -> Users:
             userList += {}
 
     logging.info(f"Sent list of all users of the datahub!")
-    writeLogJson("getUser", 200, startTime)
 
     return Users(users=userList)
 
@@ -90,7 +74,6 @@ async def getUser(request: Request, token: commonToken) -> Users:
     response_description="User {name} was added successfully!",
 )
 async def addUser(request: Request, userData: userContent, token: commonToken):
-    startTime = time.time()
     try:
         header = {
             "Authorization": "Bearer " + token["gitlab"],
@@ -99,12 +82,6 @@ async def addUser(request: Request, userData: userContent, token: commonToken):
         target = getTarget(token["target"])
     except:
         logging.warning(f"No authorized Cookie found! Cookies: {request.cookies}")
-        writeLogJson(
-            "addUser",
-            401,
-            startTime,
-            f"No authorized Cookie found!",
-        )
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="No authorized cookie found! Please authorize or refresh session!",
@@ -121,25 +98,18 @@ async def addUser(request: Request, userData: userContent, token: commonToken):
     except:
         userRole = 30
 
-    addRequest = requests.post(
-        f"{os.environ.get(target)}/api/v4/projects/{arcId}/members",
+    addRequest = await getClient(target).post(
+        f"/api/v4/projects/{arcId}/members",
         headers=header,
-        data=f"user_id={userId}&access_level={userRole}",
+        content=f"user_id={userId}&access_level={userRole}",
     )
-    if not addRequest.ok:
+    if not addRequest.is_success:
         logging.error(f"Couldn't add user {name} ! ERROR: {addRequest.content}")
-        writeLogJson(
-            "addUser",
-            400,
-            startTime,
-            f"Couldn't add user {name} ! ERROR: {addRequest.content}",
-        )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Couldn't add user to project! Error: {addRequest.content}",
         )
     logging.info(f"Added user {name} to project {arcId} with role {userRole}")
-    writeLogJson("addUser", 201, startTime)
 
     return f"The user {name} was added successfully!"
 
@@ -154,47 +124,33 @@ async def addUser(request: Request, userData: userContent, token: commonToken):
 async def getArcUser(
     request: Request, id: Annotated[int, Query(ge=1)], token: commonToken
 ) -> Users:
-    startTime = time.time()
     try:
         header = {"Authorization": "Bearer " + token["gitlab"]}
         target = getTarget(token["target"])
     except:
         logging.warning(f"No authorized Cookie found! Cookies: {request.cookies}")
-        writeLogJson(
-            "getArcUser",
-            401,
-            startTime,
-            f"No authorized Cookie found!",
-        )
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="No authorized cookie found! Please authorize or refresh session!",
         )
 
     # request to get all users for the specific arc
-    users = requests.get(
-        f"{os.environ.get(target)}/api/v4/projects/{id}/members?per_page=100",
+    users = await getClient(target).get(
+        f"/api/v4/projects/{id}/members?per_page=100",
         headers=header,
     )
-    if not users.ok:
+    if not users.is_success:
         try:
             userJson = users.json()
             userJson["error"] != None
         except:
             userJson = {"error": "Not found!", "error_description": "No user found!"}
-        writeLogJson(
-            "getArcUser",
-            users.status_code,
-            startTime,
-            f"{userJson['error']}, {userJson['error_description']}",
-        )
         raise HTTPException(
             status_code=users.status_code,
             detail=f"{userJson['error']}, {userJson['error_description']}",
         )
 
     logging.info(f"Sent list of users for project {id}")
-    writeLogJson("getArcUser", 200, startTime)
     try:
         userList = users.json()
     except:
@@ -217,7 +173,6 @@ async def removeUser(
     username: str,
     token: commonToken,
 ):
-    startTime = time.time()
     try:
         header = {
             "Authorization": "Bearer " + token["gitlab"],
@@ -225,38 +180,25 @@ async def removeUser(
         target = getTarget(token["target"])
     except:
         logging.warning(f"No authorized Cookie found! Cookies: {request.cookies}")
-        writeLogJson(
-            "removeUser",
-            401,
-            startTime,
-            f"No authorized Cookie found!",
-        )
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="No authorized cookie found! Please authorize or refresh session!",
         )
 
     # request to delete the given user
-    removeRequest = requests.delete(
-        f"{os.environ.get(target)}/api/v4/projects/{id}/members/{userId}",
+    removeRequest = await getClient(target).delete(
+        f"/api/v4/projects/{id}/members/{userId}",
         headers=header,
     )
-    if not removeRequest.ok:
+    if not removeRequest.is_success:
         logging.error(
             f"Couldn't remove user {username} ! ERROR: {removeRequest.content}"
         )
-        writeLogJson(
-            "removeUser",
-            400,
-            startTime,
-            f"Couldn't remove user {username} ! ERROR: {removeRequest.content}",
-        )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Couldn't remove user from project! Error: {removeRequest.content}",
         )
     logging.info(f"Removed user {username} from project {id}")
-    writeLogJson("removeUser", 200, startTime)
 
     return f"The user {username} was removed successfully!"
 
@@ -269,7 +211,6 @@ async def removeUser(
     response_description="User {name} was edited successfully!",
 )
 async def editUser(request: Request, userData: userContent, token: commonToken):
-    startTime = time.time()
     try:
         header = {
             "Authorization": "Bearer " + token["gitlab"],
@@ -277,12 +218,6 @@ async def editUser(request: Request, userData: userContent, token: commonToken):
         target = getTarget(token["target"])
     except:
         logging.warning(f"No authorized Cookie found! Cookies: {request.cookies}")
-        writeLogJson(
-            "editUser",
-            401,
-            startTime,
-            f"No authorized Cookie found!",
-        )
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="No authorized cookie found! Please authorize or refresh session!",
@@ -294,24 +229,17 @@ async def editUser(request: Request, userData: userContent, token: commonToken):
     role = userData.role
 
     # request to update user with given role
-    editRequest = requests.put(
-        f"{os.environ.get(target)}/api/v4/projects/{id}/members/{userId}?access_level={role}",
+    editRequest = await getClient(target).put(
+        f"/api/v4/projects/{id}/members/{userId}?access_level={role}",
         headers=header,
     )
-    if not editRequest.ok:
+    if not editRequest.is_success:
         logging.error(f"Couldn't edit user {username} ! ERROR: {editRequest.content}")
-        writeLogJson(
-            "editUser",
-            400,
-            startTime,
-            f"Couldn't edit user {username} ! ERROR: {editRequest.content}",
-        )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Couldn't edit user from project {id} to role {role}! Error: {editRequest.content}",
         )
     logging.info(f"Edited user {username} from project {id} to role {role}")
-    writeLogJson("editUser", 200, startTime)
 
     return f"The user {username} was edited successfully!"
 
@@ -324,24 +252,17 @@ async def editUser(request: Request, userData: userContent, token: commonToken):
     response_description="Array containing the name and id of every group you are a part of",
 )
 async def getGroups(request: Request, token: commonToken) -> list:
-    startTime = time.time()
     try:
         header = {"Authorization": "Bearer " + token["gitlab"]}
         target = getTarget(token["target"])
         # request arc studies
-        groups = requests.get(
-            f"{os.environ.get(target)}/api/v4/groups",
+        groups = await getClient(target).get(
+            "/api/v4/groups",
             headers=header,
         )
 
     except:
         logging.warning(f"No authorized Cookie found! Cookies: {request.cookies}")
-        writeLogJson(
-            "getStudies",
-            401,
-            startTime,
-            f"No authorized Cookie found!",
-        )
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="No authorized cookie found! Please authorize or refresh session!",
@@ -353,8 +274,7 @@ async def getGroups(request: Request, token: commonToken) -> list:
             status_code=groups.status_code,
             detail="Error retrieving the list of groups!",
         )
-    if not groups.ok:
+    if not groups.is_success:
         raise HTTPException(status_code=groups.status_code, detail=groupsJson)
 
-    writeLogJson("getStudies", 200, startTime)
     return [{"name": x["name"], "id": x["id"]} for x in groupsJson]
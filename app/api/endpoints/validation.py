@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-import time
 from typing import Annotated
 
 from fastapi import (
@@ -13,7 +12,6 @@ from fastapi import (
 
 from app.api.endpoints.projects import (
     getData,
-    writeLogJson,
 )
 from app.arc_validation import ArcValidationResponse, ArcValidator, GitlabClient
 
@@ -22,19 +20,16 @@ router = APIRouter()
 commonToken = Annotated[str, Depends(getData)]
 
 
-# validates the arc
+# validates the arc (the validator uses a blocking client, so this runs in the threadpool instead of the event loop)
 @router.get(
     "/validateArc",
     summary="Validates the ARC",
     description="Validates the ARC by checking if all necessary folders are present, the investigation has a title, description and all contacts have the necessary fields filled out.",
     response_description="Dictionary containing the individual results of the different checks containing information whether they were successful or what is missing in your ARC",
 )
-async def validateArc(
+def validateArc(
     _request: Request, id: Annotated[int, Query(ge=1)], token: commonToken
 ) -> ArcValidationResponse:
-    # this is for measuring the response time of the api
-    startTime = time.time()
-
     client = GitlabClient(token)
     validator = ArcValidator(id, client)
 
@@ -58,7 +53,4 @@ async def validateArc(
         # has_license=ValidationResult(is_valid=False, messages=[]),
     )
 
-    # save the response time and return the dict to the user
-    writeLogJson("validateArc", 200, startTime)
-
     return response
@@ -0,0 +1,407 @@
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, Response, status
+from fastapi.encoders import jsonable_encoder
+
+from app.api.auth import getUserKey
+from app.api.IO.gitlabIO import getTarget
+from app.api.IO.logIO import writeLogJson
+from app.api.middleware import requestRetries, requestTimings, summarizeTimings
+
+load_dotenv()
+
+# states of a job; the last three are final
+jobStates = ["queued", "running", "done", "failed", "cancelled"]
+finalStates = jobStates[2:]
+
+# minimum time between two saves of the progress of a job into the database (in seconds)
+progressInterval = 0.5
+
+# larger results aren't kept (e.g. the json of all public arcs, which can be requested separately)
+resultLimit = int(os.environ.get("JOB_RESULT_LIMIT", 1)) * 1024 * 1024
+
+
+# a long running operation (e.g. deleting a folder) that runs in the background of the worker
+class Job:
+    def __init__(self, kind: str, owner: str | None, datahub: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.owner = owner
+        self.datahub = datahub
+        self.status = "queued"
+        self.progress = 0.0
+        self.message = ""
+        # status code and content of the response of the operation (or the error)
+        self.resultStatus: int | None = None
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started: float | None = None
+        self.finished: float | None = None
+        self.pid = os.getpid()
+        self.saved = 0.0
+
+    def toDict(self) -> dict:
+        return {
+            "jobId": self.id,
+            "kind": self.kind,
+            "owner": self.owner,
+            "datahub": self.datahub,
+            "status": self.status,
+            "progress": round(self.progress, 4),
+            "message": self.message,
+            "resultStatus": self.resultStatus,
+            "result": self.result,
+            "error": self.error,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "pid": self.pid,
+        }
+
+    @classmethod
+    def fromDict(cls, data: dict) -> "Job":
+        job = cls(data["kind"], data["owner"], data["datahub"])
+        job.id = data["jobId"]
+        for key in [
+            "status",
+            "progress",
+            "message",
+            "resultStatus",
+            "result",
+            "error",
+            "created",
+            "started",
+            "finished",
+            "pid",
+        ]:
+            setattr(job, key, data[key])
+        return job
+
+    # the state of the job returned to the client (without the result and the owner)
+    def state(self) -> dict:
+        data = self.toDict()
+        for key in ["owner", "result", "pid"]:
+            del data[key]
+        return data
+
+
+# the jobs of this worker are kept in memory; with a database (JOB_DB) they are also saved, so that every worker
+# can return the state of a job and finished jobs survive a restart
+class JobStore:
+    def __init__(self, path: str | None, keep: float):
+        self.path = path
+        self.keep = keep
+        self.jobs: dict[str, Job] = {}
+        self.lock = threading.Lock()
+        self.db = None
+        if path:
+            self.db = sqlite3.connect(path, timeout=10, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, owner TEXT, updated REAL, data TEXT)"
+            )
+            self.db.commit()
+            self.recover()
+
+    def save(self, job: Job):
+        with self.lock:
+            self.jobs[job.id] = job
+            self.write(job)
+
+    def write(self, job: Job):
+        job.saved = time.time()
+        if self.db is not None:
+            self.db.execute(
+                "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?)",
+                (job.id, job.owner, job.saved, json.dumps(job.toDict())),
+            )
+            self.db.commit()
+
+    def get(self, jobId: str) -> Job | None:
+        with self.lock:
+            job = self.jobs.get(jobId)
+            if job is not None or self.db is None:
+                return job
+            row = self.db.execute(
+                "SELECT data FROM jobs WHERE id = ?", (jobId,)
+            ).fetchone()
+        return Job.fromDict(json.loads(row[0])) if row else None
+
+    # the jobs of the user (newest first)
+    def list(self, owner: str | None) -> list[Job]:
+        with self.lock:
+            jobs = {x.id: x for x in self.jobs.values() if x.owner == owner}
+            if self.db is not None:
+                for (data,) in self.db.execute(
+                    "SELECT data FROM jobs WHERE owner IS ?", (owner,)
+                ):
+                    job = Job.fromDict(json.loads(data))
+                    jobs.setdefault(job.id, job)
+        return sorted(jobs.values(), key=lambda x: x.created, reverse=True)
+
+    # remove the finished jobs that are older than the retention time
+    def cleanUp(self):
+        limit = time.time() - self.keep
+        with self.lock:
+            for jobId in [
+                x.id
+                for x in self.jobs.values()
+                if x.status in finalStates and x.finished < limit
+            ]:
+                del self.jobs[jobId]
+            if self.db is not None:
+                self.db.execute("DELETE FROM jobs WHERE updated < ?", (limit,))
+                self.db.commit()
+
+    # jobs of workers that don't exist anymore were interrupted (e.g. by a restart of the server)
+    def recover(self):
+        rows = self.db.execute("SELECT data FROM jobs").fetchall()
+        for (data,) in rows:
+            job = Job.fromDict(json.loads(data))
+            if job.status in finalStates or isAlive(job.pid):
+                continue
+            job.status = "failed"
+            job.resultStatus = status.HTTP_503_SERVICE_UNAVAILABLE
+            job.error = (
+                "The job was interrupted by a restart of the server! Please try again!"
+            )
+            job.finished = time.time()
+            self.write(job)
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+
+def isAlive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+# the job of the currently running operation (so the operation can report its progress)
+currentJob: contextvars.ContextVar[Job | None] = contextvars.ContextVar(
+    "currentJob", default=None
+)
+
+
+# converts the return value of the operation into a json response (status code and content)
+def encodeResult(result) -> tuple[int, object]:
+    if isinstance(result, Response):
+        try:
+            content = json.loads(result.body)
+        except Exception:
+            content = result.body.decode(errors="replace")
+        return result.status_code, content
+    if isinstance(result, bytes):
+        result = result.decode(errors="replace")
+    return status.HTTP_200_OK, jsonable_encoder(result)
+
+
+def limitResult(result):
+    if len(json.dumps(result)) > resultLimit:
+        return "The job was successful, but its result is too large to be kept!"
+    return result
+
+
+# runs the jobs as asyncio tasks; the number of running jobs is limited in total, per user and per datahub
+class JobRunner:
+    def __init__(
+        self,
+        store: JobStore,
+        workers: int,
+        perUser: int,
+        perDatahub: int,
+        maxQueue: int,
+    ):
+        self.store = store
+        self.workers = workers
+        self.perUser = perUser
+        self.perDatahub = perDatahub
+        self.maxQueue = maxQueue
+        self.slots: asyncio.Semaphore | None = None
+        self.userSlots: dict[str | None, asyncio.Semaphore] = {}
+        self.datahubSlots: dict[str, asyncio.Semaphore] = {}
+        self.tasks: dict[str, asyncio.Task] = {}
+
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def getSlots(self, slots: dict, key, limit: int) -> asyncio.Semaphore:
+        if key not in slots:
+            slots[key] = asyncio.Semaphore(limit)
+        return slots[key]
+
+    # start the operation as a job (raises 429 if the user already has too many waiting jobs)
+    def submit(
+        self,
+        kind: str,
+        owner: str | None,
+        datahub: str,
+        operation: Callable[[], Awaitable],
+    ) -> Job:
+        waiting = [
+            x
+            for x in self.store.jobs.values()
+            if x.owner == owner and x.status not in finalStates
+        ]
+        if len(waiting) >= self.maxQueue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="You already have too many running jobs! Please wait until they are finished!",
+            )
+
+        self.store.cleanUp()
+        job = Job(kind, owner, datahub)
+        self.store.save(job)
+
+        # the job runs in its own context, so it isn't connected to the request that started it
+        task = asyncio.create_task(
+            self.run(job, operation), context=contextvars.Context()
+        )
+        self.tasks[job.id] = task
+        task.add_done_callback(lambda x: self.tasks.pop(job.id, None))
+        logging.info(f"Started job {job.id} ({kind}) on {datahub}")
+        return job
+
+    async def run(self, job: Job, operation: Callable[[], Awaitable]):
+        if self.slots is None:
+            self.slots = asyncio.Semaphore(self.workers)
+
+        # the timings and retries of the job are logged like the ones of a request
+        timings = {}
+        retries = {}
+        requestTimings.set(timings)
+        requestRetries.set(retries)
+        currentJob.set(job)
+
+        try:
+            # wait for a free slot of the user first, so that the jobs of one user don't block the others
+            async with self.getSlots(
+                self.userSlots, job.owner, self.perUser
+            ), self.getSlots(
+                self.datahubSlots, job.datahub, self.perDatahub
+            ), self.slots:
+                job.status = "running"
+                job.started = time.time()
+                self.store.save(job)
+
+                job.resultStatus, result = encodeResult(await operation())
+                job.result = limitResult(result)
+                job.status = "done"
+                job.progress = 1.0
+                self.completed += 1
+        except HTTPException as e:
+            job.status = "failed"
+            job.resultStatus = e.status_code
+            job.error = e.detail
+            self.failed += 1
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+            job.error = "The job was cancelled!"
+        except Exception as e:
+            logging.exception(f"Job {job.id} ({job.kind}) failed!")
+            job.status = "failed"
+            job.resultStatus = status.HTTP_500_INTERNAL_SERVER_ERROR
+            job.error = f"{type(e).__name__}: {e}"
+            self.failed += 1
+        finally:
+            job.finished = time.time()
+            self.store.save(job)
+            writeLogJson(
+                f"{job.kind} (job)",
+                job.resultStatus or 499,
+                job.started or job.created,
+                job.error,
+                timings=summarizeTimings(timings),
+                retries=retries,
+            )
+
+    # update the progress of the job (saved at most every progressInterval seconds)
+    def progress(self, job: Job, progress: float | None, message: str | None):
+        if progress is not None:
+            job.progress = max(0.0, min(progress, 1.0))
+        if message is not None:
+            job.message = message
+        if time.time() - job.saved >= progressInterval:
+            self.store.save(job)
+
+    # cancel a job of this worker (returns False if the job runs in another worker or is already finished)
+    def cancel(self, jobId: str) -> bool:
+        task = self.tasks.get(jobId)
+        if task is None:
+            return False
+        task.cancel()
+        return True
+
+    async def shutdown(self):
+        for task in list(self.tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+        self.store.close()
+
+    def stats(self) -> dict:
+        jobs = list(self.store.jobs.values())
+        return {
+            "workers": self.workers,
+            "running": len([x for x in jobs if x.status == "running"]),
+            "queued": len([x for x in jobs if x.status == "queued"]),
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
+
+
+jobRunner = JobRunner(
+    JobStore(
+        os.environ.get("JOB_DB") or None,
+        float(os.environ.get("JOB_KEEP", 24)) * 3600,
+    ),
+    workers=int(os.environ.get("JOB_WORKERS", 4)),
+    perUser=int(os.environ.get("JOB_PER_USER", 2)),
+    perDatahub=int(os.environ.get("JOB_PER_DATAHUB", 4)),
+    maxQueue=int(os.environ.get("JOB_QUEUE", 10)),
+)
+
+
+# report the progress of the current job (does nothing outside of a job)
+def reportProgress(progress: float | None = None, message: str | None = None):
+    job = currentJob.get()
+    if job is not None:
+        jobRunner.progress(job, progress, message)
+
+
+# run the operation as a background job; returns the id of the job to poll its state at /jobs/{jobId}
+def startJob(
+    kind: str, token: dict | None, operation: Callable[[], Awaitable]
+) -> Response:
+    if token is None:
+        owner, datahub = None, "all"
+    else:
+        owner, datahub = getUserKey(token), getTarget(token["target"])
+    job = jobRunner.submit(kind, owner, datahub, operation)
+    return Response(
+        json.dumps(job.state()),
+        status.HTTP_202_ACCEPTED,
+        media_type="application/json",
+    )
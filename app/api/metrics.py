@@ -0,0 +1,256 @@
+import glob
+import json
+import math
+import os
+import threading
+import time
+
+# the requests are counted in time slices: short slices for the last 15 minutes and longer ones for the last day
+# (name: (length of a slice in seconds, how long the slices are kept))
+sliceTiers = {"fine": (10, 900), "coarse": (300, 86400)}
+
+# the windows returned by the metrics (name: (tier, length in seconds))
+windows = {"1m": ("fine", 60), "15m": ("fine", 900), "24h": ("coarse", 86400)}
+
+# the response times are sorted into logarithmic buckets, each one 5% larger than the one before
+bucketGrowth = 1.05
+
+percentiles = {"p50": 0.5, "p90": 0.9, "p99": 0.99}
+
+
+def newSlice() -> dict:
+    return {
+        "count": 0,
+        "sum": 0.0,
+        "max": 0.0,
+        "buckets": {},
+        "status": {},
+        "timings": {},
+        "retries": {},
+    }
+
+
+# returns the bucket of the given response time (in ms)
+def getBucket(duration: float) -> int:
+    if duration <= 1:
+        return 0
+    return math.ceil(math.log(duration) / math.log(bucketGrowth))
+
+
+# adds the counts of the second slice to the first one
+def mergeSlice(target: dict, other: dict):
+    target["count"] += other["count"]
+    target["sum"] += other["sum"]
+    target["max"] = max(target["max"], other["max"])
+    for key, value in other["buckets"].items():
+        target["buckets"][str(key)] = target["buckets"].get(str(key), 0) + value
+    for key, value in other["status"].items():
+        target["status"][str(key)] = target["status"].get(str(key), 0) + value
+    for key, value in other.get("timings", {}).items():
+        target["timings"][key] = target["timings"].get(key, 0) + value
+    for key, value in other.get("retries", {}).items():
+        target["retries"][key] = target["retries"].get(key, 0) + value
+
+
+# calculates the percentiles of the merged slice (the upper bound of the matching bucket, capped by the max)
+def summarizeSlice(merged: dict, seconds: int) -> dict:
+    count = merged["count"]
+    summary = {
+        "count": count,
+        "rate": round(count / seconds, 4),
+        "mean": round(merged["sum"] / count, 2) if count > 0 else 0,
+        "max": round(merged["max"], 2),
+        "status": merged["status"],
+        # average time spent in the datahubs, other services, excel parsing and our own code (in ms)
+        "timings": {
+            key: round(value / count, 2) for key, value in merged["timings"].items()
+        },
+        # number of retries of the requests to the datahubs
+        "retries": merged["retries"],
+    }
+
+    buckets = sorted((int(key), value) for key, value in merged["buckets"].items())
+    for name, quantile in percentiles.items():
+        summary[name] = 0
+        seen = 0
+        for bucket, value in buckets:
+            seen += value
+            if seen >= quantile * count:
+                summary[name] = round(min(bucketGrowth**bucket, merged["max"]), 2)
+                break
+
+    return summary
+
+
+# incrementally maintained metrics of the requests of this worker
+class Metrics:
+    def __init__(self, errorLimit: int = 100):
+        self.errorLimit = errorLimit
+        self.lock = threading.Lock()
+        # endpoint -> tier -> start of the slice -> slice
+        self.endpoints: dict[str, dict[str, dict[int, dict]]] = {}
+        # "endpoint, status: error" -> [count, last seen]
+        self.errors: dict[str, list] = {}
+        # whether there are new requests since the last save
+        self.changed = False
+
+    # add the request to the current slices of the endpoint (duration and timings in seconds)
+    def record(
+        self,
+        endpoint: str,
+        status: int,
+        duration: float,
+        error=None,
+        timestamp: float | None = None,
+        timings: dict | None = None,
+        retries: dict | None = None,
+    ):
+        timestamp = timestamp or time.time()
+        duration = duration * 1000
+        bucket = str(getBucket(duration))
+
+        with self.lock:
+            self.changed = True
+            tiers = self.endpoints.setdefault(endpoint, {x: {} for x in sliceTiers})
+            for tier, (length, keep) in sliceTiers.items():
+                slices = tiers[tier]
+                start = int(timestamp // length * length)
+                current = slices.get(start)
+                if current is None:
+                    current = newSlice()
+                    slices[start] = current
+                    # drop the slices that are too old
+                    for old in [x for x in slices if x <= timestamp - keep - length]:
+                        del slices[old]
+
+                current["count"] += 1
+                current["sum"] += duration
+                current["max"] = max(current["max"], duration)
+                current["buckets"][bucket] = current["buckets"].get(bucket, 0) + 1
+                current["status"][str(status)] = (
+                    current["status"].get(str(status), 0) + 1
+                )
+                for key, value in (timings or {}).items():
+                    current["timings"][key] = (
+                        current["timings"].get(key, 0) + value * 1000
+                    )
+                for key, value in (retries or {}).items():
+                    current["retries"][key] = current["retries"].get(key, 0) + value
+
+            if error is not None and str(error) != "None":
+                self.addError(f"{endpoint}, {status}: {error}", 1, timestamp)
+
+    # errors are deduplicated; if there are too many, the oldest ones are removed
+    def addError(self, message: str, count: int, lastSeen: float):
+        entry = self.errors.get(message)
+        if entry is not None:
+            entry[0] += count
+            entry[1] = max(entry[1], lastSeen)
+            return
+
+        if len(self.errors) >= self.errorLimit:
+            oldest = min(self.errors, key=lambda x: self.errors[x][1])
+            if self.errors[oldest][1] > lastSeen:
+                return
+            del self.errors[oldest]
+        self.errors[message] = [count, lastSeen]
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return json.loads(
+                json.dumps({"endpoints": self.endpoints, "errors": self.errors})
+            )
+
+    # write the snapshot of this worker, so that the other workers can include it in their metrics
+    def save(self, path: str):
+        if not self.changed:
+            return
+        self.changed = False
+        os.makedirs(path, exist_ok=True)
+        fileName = os.path.join(path, f"metrics-{os.getpid()}.json")
+        with open(fileName + ".tmp", "w") as snapshotFile:
+            json.dump(self.snapshot(), snapshotFile)
+        os.replace(fileName + ".tmp", fileName)
+
+    # merge the metrics of this worker with the snapshots of the other workers
+    def summary(self, path: str | None = None) -> dict:
+        snapshots = [self.snapshot()]
+        if path is not None:
+            snapshots += loadSnapshots(path)
+        return summarize(snapshots, errorLimit=self.errorLimit)
+
+
+# checks if the process of a worker is still running
+def isAlive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+# read the saved snapshots of the other workers (snapshots of stopped workers or older than a day are removed)
+def loadSnapshots(path: str) -> list[dict]:
+    snapshots = []
+    for fileName in glob.glob(os.path.join(path, "metrics-*.json")):
+        if fileName == os.path.join(path, f"metrics-{os.getpid()}.json"):
+            continue
+        try:
+            # the snapshots of workers that are gone (e.g. after a restart) are removed, so they aren't counted as workers
+            pid = int(os.path.basename(fileName)[len("metrics-") : -len(".json")])
+            if (
+                not isAlive(pid)
+                or time.time() - os.path.getmtime(fileName) > sliceTiers["coarse"][1]
+            ):
+                os.remove(fileName)
+                continue
+            with open(fileName, "r") as snapshotFile:
+                snapshots.append(json.load(snapshotFile))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+
+# combine the snapshots into the metrics for every window
+def summarize(snapshots: list[dict], now: float | None = None, errorLimit=100) -> dict:
+    now = now or time.time()
+    endpoints = {}
+    statusCodes = {}
+    errors = Metrics(errorLimit)
+
+    names = set(x for snapshot in snapshots for x in snapshot["endpoints"])
+    for endpoint in sorted(names):
+        endpoints[endpoint] = {}
+        for window, (tier, seconds) in windows.items():
+            length = sliceTiers[tier][0]
+            merged = newSlice()
+            for snapshot in snapshots:
+                slices = snapshot["endpoints"].get(endpoint, {}).get(tier, {})
+                for start, entry in slices.items():
+                    if int(start) + length > now - seconds:
+                        mergeSlice(merged, entry)
+            endpoints[endpoint][window] = summarizeSlice(merged, seconds)
+
+        for code, count in endpoints[endpoint]["24h"]["status"].items():
+            statusCodes[code] = statusCodes.get(code, 0) + count
+
+    for snapshot in snapshots:
+        for message, (count, lastSeen) in snapshot["errors"].items():
+            errors.addError(message, count, lastSeen)
+
+    return {
+        "endpoints": endpoints,
+        "statusCodes": statusCodes,
+        "errors": [
+            {"error": message, "count": count, "lastSeen": lastSeen}
+            for message, (count, lastSeen) in sorted(
+                errors.errors.items(), key=lambda x: x[1][1], reverse=True
+            )
+        ],
+        "workers": len(snapshots),
+    }
+
+
+metrics = Metrics()
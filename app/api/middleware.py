@@ -0,0 +1,186 @@
+import contextvars
+import functools
+import inspect
+import json
+import time
+
+from app.api.IO.logIO import writeLogJson
+
+# time spent in the upstream services and the excel parsing during the current request
+# (name -> list of [start, end] of every call, as perf_counter times; concurrent calls overlap)
+requestTimings: contextvars.ContextVar[dict | None] = contextvars.ContextVar(
+    "requestTimings", default=None
+)
+
+# number of retries of the requests to the datahubs during the current request (name -> count)
+requestRetries: contextvars.ContextVar[dict | None] = contextvars.ContextVar(
+    "requestRetries", default=None
+)
+
+# maximum size of an error response that is read out for the log
+errorBodyLimit = 4096
+
+
+# adds the call that just ended after the given duration to the timings of the current request
+# (does nothing outside of a request)
+def recordTiming(name: str, duration: float):
+    timings = requestTimings.get()
+    if timings is not None:
+        end = time.perf_counter()
+        timings.setdefault(name, []).append([end - duration, end])
+
+
+# the time covered by the intervals (overlapping intervals, e.g. of calls running at the same time, count once)
+def getWallTime(intervals: list[list[float]]) -> float:
+    total = 0.0
+    currentStart, currentEnd = None, None
+    for start, end in sorted(intervals):
+        if currentEnd is None or start > currentEnd:
+            if currentEnd is not None:
+                total += currentEnd - currentStart
+            currentStart, currentEnd = start, end
+        else:
+            currentEnd = max(currentEnd, end)
+    if currentEnd is not None:
+        total += currentEnd - currentStart
+    return total
+
+
+# the wall time of every category of the timings (in seconds); with the duration of the request, "own" is the
+# time that wasn't spent in any of them
+def summarizeTimings(timings: dict, duration: float | None = None) -> dict:
+    summary = {x: round(getWallTime(y), 4) for x, y in timings.items()}
+    if duration is not None:
+        allIntervals = [x for intervals in timings.values() for x in intervals]
+        summary["own"] = round(max(duration - getWallTime(allIntervals), 0), 4)
+    return summary
+
+
+# counts a retry for the current request (does nothing outside of a request)
+def recordRetry(name: str):
+    retries = requestRetries.get()
+    if retries is not None:
+        retries[name] = retries.get(name, 0) + 1
+
+
+# names of the timings that are currently measured (so nested calls aren't counted twice)
+activeTimings: contextvars.ContextVar[frozenset] = contextvars.ContextVar(
+    "activeTimings", default=frozenset()
+)
+
+
+# decorator recording the duration of the (sync or async) function under the given name
+def timed(name: str):
+    def decorator(function):
+        if inspect.iscoroutinefunction(function):
+
+            @functools.wraps(function)
+            async def asyncWrapper(*args, **kwargs):
+                active = activeTimings.get()
+                if name in active:
+                    return await function(*args, **kwargs)
+                token = activeTimings.set(active | {name})
+                start = time.perf_counter()
+                try:
+                    return await function(*args, **kwargs)
+                finally:
+                    recordTiming(name, time.perf_counter() - start)
+                    activeTimings.reset(token)
+
+            return asyncWrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            active = activeTimings.get()
+            if name in active:
+                return function(*args, **kwargs)
+            token = activeTimings.set(active | {name})
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                recordTiming(name, time.perf_counter() - start)
+                activeTimings.reset(token)
+
+        return wrapper
+
+    return decorator
+
+
+# reads out the error message of the response (the detail of the HTTPException)
+def getErrorDetail(body: bytes):
+    try:
+        return json.loads(body)["detail"]
+    except:
+        return body.decode(errors="replace") or None
+
+
+# ASGI middleware logging every request with its endpoint, status, duration, transferred bytes,
+# the time spent in the datahubs, other services and the excel parsing and the retries
+class TimingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        startTime = time.time()
+        timings = {}
+        token = requestTimings.set(timings)
+        retries = {}
+        retriesToken = requestRetries.set(retries)
+        details = {"status": 500, "bytesIn": 0, "bytesOut": 0, "errorBody": b""}
+
+        async def receiveWrapper():
+            message = await receive()
+            if message["type"] == "http.request":
+                details["bytesIn"] += len(message.get("body", b""))
+            return message
+
+        async def sendWrapper(message):
+            if message["type"] == "http.response.start":
+                details["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                body = message.get("body", b"")
+                details["bytesOut"] += len(body)
+                # keep the beginning of error responses for the log
+                if (
+                    details["status"] >= 400
+                    and len(details["errorBody"]) < errorBodyLimit
+                ):
+                    details["errorBody"] += body[
+                        : errorBodyLimit - len(details["errorBody"])
+                    ]
+            await send(message)
+
+        error = None
+        try:
+            await self.app(scope, receiveWrapper, sendWrapper)
+        except Exception as e:
+            details["status"] = 500
+            error = e
+            raise
+        finally:
+            requestTimings.reset(token)
+            requestRetries.reset(retriesToken)
+            if error is None and details["status"] >= 400:
+                error = getErrorDetail(details["errorBody"])
+
+            # the route is only known if the request matched one of the endpoints
+            route = scope.get("route")
+            endpoint = scope.get("endpoint")
+            duration = time.time() - startTime
+            writeLogJson(
+                getattr(endpoint, "__name__", "unknown"),
+                details["status"],
+                startTime,
+                error,
+                route=getattr(route, "path", scope.get("path")),
+                method=scope.get("method"),
+                bytesIn=details["bytesIn"],
+                bytesOut=details["bytesOut"],
+                timings=summarizeTimings(timings, duration),
+                retries=retries,
+            )
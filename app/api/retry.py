@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+
+import httpx
+from dotenv import load_dotenv
+
+from app.api.middleware import recordRetry
+
+load_dotenv()
+
+# status codes indicating that the datahub is currently overwhelmed or not available
+retryStatus = [500, 502, 429, 503, 504]
+
+# gitlab returns 400 for commits if it is overwhelmed (e.g. for many commits on the same branch at once)
+commitRetryStatus = retryStatus + [400]
+
+# right after a commit, gitlab may return 400 or 404 for the new file until it is processed
+recentFileRetryStatus = commitRetryStatus + [404]
+
+# creating a commit isn't idempotent: after a 5xx or a timeout, gitlab may have applied the commit already, so
+# a commit is only retried if it surely wasn't applied (rate limited or the request wasn't sent at all)
+commitSafeRetryStatus = [429]
+commitSafeRetryErrors = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+# longest time a Retry-After header of the datahub is followed (in seconds)
+maxRetryAfter = 60
+
+
+# limits the retries of this worker to a share of its requests, so that a datahub that is down
+# isn't flooded with retries (but a few retries are always allowed)
+class RetryBudget:
+    def __init__(self, ratio: float, minRetries: int, window: float):
+        self.ratio = ratio
+        self.minRetries = minRetries
+        self.window = window
+        self.lock = threading.Lock()
+        self.windowStart = time.time()
+        self.requests = 0
+        self.retries = 0
+
+        # totals since the start of the worker
+        self.totalRetries = 0
+        self.rejected = 0
+
+    def resetWindow(self):
+        now = time.time()
+        if now - self.windowStart > self.window:
+            self.windowStart = now
+            self.requests = 0
+            self.retries = 0
+
+    # count a first attempt of a request
+    def request(self):
+        with self.lock:
+            self.resetWindow()
+            self.requests += 1
+
+    def available(self) -> bool:
+        with self.lock:
+            self.resetWindow()
+            return self.retries < self.minRetries + self.ratio * self.requests
+
+    # take a retry from the budget (returns False if there is none left)
+    def spend(self) -> bool:
+        with self.lock:
+            self.resetWindow()
+            if self.retries >= self.minRetries + self.ratio * self.requests:
+                self.rejected += 1
+                return False
+            self.retries += 1
+            self.totalRetries += 1
+            return True
+
+    def stats(self) -> dict:
+        with self.lock:
+            self.resetWindow()
+            return {
+                "retries": self.totalRetries,
+                "rejected": self.rejected,
+                "window": {"requests": self.requests, "retries": self.retries},
+            }
+
+
+retryBudget = RetryBudget(
+    float(os.environ.get("RETRY_BUDGET_RATIO", 0.2)),
+    int(os.environ.get("RETRY_BUDGET_MIN", 10)),
+    float(os.environ.get("RETRY_BUDGET_WINDOW", 60)),
+)
+
+
+# a single attempt of a retried operation
+class Attempt:
+    def __init__(self, number: int, last: bool):
+        self.number = number
+        # whether there won't be another attempt (no attempts or budget left)
+        self.last = last
+        # the failed response of the attempt (its Retry-After is respected for the next attempt)
+        self.response: httpx.Response | None = None
+
+
+# when and how often an operation is retried: exponential backoff with jitter, limited by the retry budget
+class RetryPolicy:
+    def __init__(
+        self,
+        name: str,
+        maxAttempts: int,
+        baseDelay: float,
+        maxDelay: float = 60,
+        retryOn: list[int] = retryStatus,
+        budget: RetryBudget = retryBudget,
+    ):
+        self.name = name
+        self.maxAttempts = maxAttempts
+        self.baseDelay = baseDelay
+        self.maxDelay = maxDelay
+        self.retryOn = retryOn
+        self.budget = budget
+
+    # the delay before the given retry (1 is the first retry); a random part of the delay is left out,
+    # so that requests failing at the same time aren't retried at the same time again
+    def delay(self, retry: int, response: httpx.Response | None = None) -> float:
+        delay = min(self.maxDelay, self.baseDelay * 2 ** (retry - 1))
+        delay = random.uniform(delay / 2, delay)
+
+        # follow the Retry-After of the datahub (only given in seconds by gitlab)
+        if response is not None and response.status_code in [429, 503]:
+            try:
+                delay = max(
+                    delay, min(float(response.headers["Retry-After"]), maxRetryAfter)
+                )
+            except (KeyError, ValueError):
+                pass
+        return delay
+
+    def isRetryable(self, response: httpx.Response) -> bool:
+        return response.status_code in self.retryOn
+
+    # waits before the next retry; returns False if the operation shouldn't be retried anymore
+    async def wait(
+        self, retry: int, response: httpx.Response | None = None, label: str = ""
+    ) -> bool:
+        if retry >= self.maxAttempts or not self.budget.spend():
+            return False
+        recordRetry(self.name)
+        delay = self.delay(retry, response)
+        logging.debug(
+            f"Retry {retry} for {label or self.name} in {round(delay, 2)} seconds"
+        )
+        await asyncio.sleep(delay)
+        return True
+
+    # yields the attempts of the operation (waiting before every retry); the loop has to be left with break on success
+    async def attempts(self, label: str = ""):
+        self.budget.request()
+        attempt = None
+        for number in range(self.maxAttempts):
+            if attempt is not None and not await self.wait(
+                number, attempt.response, label
+            ):
+                return
+            last = number + 1 >= self.maxAttempts or not self.budget.available()
+            attempt = Attempt(number, last)
+            yield attempt
+
+
+# the whole upload of a file (gitlab may need some time to process the lfs object or to accept new commits)
+uploadRetry = RetryPolicy(
+    "upload", maxAttempts=4, baseDelay=10, retryOn=commitRetryStatus
+)
+
+# the read-modify-write of the .gitattributes (only retried if the commit was rejected)
+gitattributesRetry = RetryPolicy(
+    "gitattributes", maxAttempts=5, baseDelay=1, maxDelay=16, retryOn=commitRetryStatus
+)
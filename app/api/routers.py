@@ -9,6 +9,7 @@ from app.api.endpoints import (
     user,
     validation,
     arcsearch,
+    jobs,
 )
 
 
@@ -28,3 +29,4 @@ api_router.include_router(
 )
 api_router.include_router(validation.router, prefix="/validate", tags=["Validation"])
 api_router.include_router(arcsearch.router, prefix="/search", tags=["Search"])
+api_router.include_router(jobs.router, prefix="/jobs", tags=["Jobs"])
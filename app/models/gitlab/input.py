@@ -68,6 +68,26 @@ class folderContent(BaseModel):
     branch: str = Field(examples=["main"])
 
 
+class uploadSessionContent(BaseModel):
+    name: str = Field(examples=["data.csv"])
+    id: int = Field(examples=[230], ge=1)
+    path: str = Field(examples=["assays/assay1/dataset/data.csv"])
+    branch: str = Field(examples=["main"], default="main")
+    namespace: str = Field(examples=["user/test Arc"], default="")
+    lfs: LFSUpload = Field(default=LFSUpload.false)
+    # at most maxChunks of the uploads (app/api/IO/uploadIO.py)
+    totalChunks: int = Field(examples=[12], ge=1, le=100000)
+
+
+class uploadBatchContent(BaseModel):
+    id: int = Field(examples=[230], ge=1)
+    branch: str = Field(examples=["main"], default="main")
+    sessions: list[str] = Field(
+        examples=[["5f0c6a1e2b7d4c8e9a3b1d2c4e6f8a0b"]], min_length=1
+    )
+    message: str = Field(examples=["Upload of the raw data"], default="")
+
+
 class userContent(BaseModel):
     userId: int = Field(examples=[137], ge=1)
     username: str = Field(examples=["lu98be"])
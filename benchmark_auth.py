@@ -0,0 +1,72 @@
+# micro-benchmark of the cookie verification done on every request (python benchmark_auth.py)
+# compares the old way (parsing the keys, verifying the signature and decrypting the token every time)
+# with the loaded keys and the token cache
+import base64
+import os
+import time
+import timeit
+
+import jwt
+from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+# generate a temporary key pair in the format of the .env file (the base64 part of the pem without header and footer)
+privateKey = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+privatePem = privateKey.private_bytes(
+    serialization.Encoding.PEM,
+    serialization.PrivateFormat.TraditionalOpenSSL,
+    serialization.NoEncryption(),
+)
+publicPem = privateKey.public_key().public_bytes(
+    serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+)
+os.environ["PRIVATE_RSA"] = "".join(privatePem.decode().strip().split("\n")[1:-1])
+os.environ["PUBLIC_RSA"] = "".join(publicPem.decode().strip().split("\n")[1:-1])
+os.environ["FERNET"] = Fernet.generate_key().decode()
+
+from app.api.auth import decodeCookie, tokenCache
+
+fernet = Fernet(os.environ["FERNET"].encode())
+cookie = jwt.encode(
+    {
+        "gitlab": fernet.encrypt(base64.b64encode(os.urandom(20))).decode(),
+        "target": "tuebingen",
+        "refresh": fernet.encrypt(base64.b64encode(os.urandom(20))).decode(),
+    },
+    privateKey,
+    algorithm="RS256",
+)
+
+
+# the verification as it was done before in getData
+def oldDecode(data: str) -> dict:
+    public_key = (
+        b"-----BEGIN PUBLIC KEY-----\n"
+        + os.environ.get("PUBLIC_RSA").encode()
+        + b"\n-----END PUBLIC KEY-----"
+    )
+    decodedToken = jwt.decode(data, public_key, algorithms=["RS256", "HS256"])
+    fernetKey = os.environ.get("FERNET").encode()
+    decodedToken["gitlab"] = (
+        Fernet(fernetKey).decrypt(decodedToken["gitlab"].encode()).decode()
+    )
+    return decodedToken
+
+
+def uncachedDecode(data: str) -> dict:
+    tokenCache.clear()
+    return decodeCookie(data)
+
+
+def measure(name: str, function, number: int = 2000):
+    function(cookie)
+    seconds = min(timeit.repeat(lambda: function(cookie), number=number, repeat=5))
+    print(f"{name:<30} {seconds / number * 1e6:>10.1f} µs per request")
+
+
+if __name__ == "__main__":
+    assert oldDecode(cookie) == decodeCookie(cookie)
+    measure("old (parse keys every time)", oldDecode)
+    measure("loaded keys, no cache", uncachedDecode)
+    measure("loaded keys and cache", decodeCookie, 200000)
@@ -1,5 +1,7 @@
+import asyncio
 import logging
 import os
+from contextlib import asynccontextmanager
 
 import dotenv
 from dotenv import load_dotenv
@@ -9,6 +11,12 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from starlette.middleware.sessions import SessionMiddleware
 from app.api.routers import api_router
+from app.api.IO.gitlabIO import closeClients, openClients
+from app.api.IO.excelPool import excelPool
+from app.api.IO.logIO import logStore
+from app.api.IO.uploadIO import cleanUploadsPeriodically
+from app.api.jobs import jobRunner
+from app.api.middleware import TimingMiddleware
 import urllib3.util.connection
 
 description = """
@@ -29,6 +37,23 @@ logging.basicConfig(
     level=logging.DEBUG,
 )
 
+
+# open the connection pools to the datahubs on startup and close them when the worker shuts down
+# (the remaining metrics are written to the log on shutdown)
+# abandoned uploads are removed in the background
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    openClients()
+    cleaner = asyncio.create_task(cleanUploadsPeriodically())
+    yield
+    cleaner.cancel()
+    # the running jobs are cancelled before the connections are closed
+    await jobRunner.shutdown()
+    await closeClients()
+    excelPool.shutdown()
+    logStore.close()
+
+
 app = FastAPI(
     title="ARCmanager API",
     summary="ARCmanager API enables you to read out and write to your ARC in any datahub",
@@ -36,13 +61,9 @@ app = FastAPI(
     openapi_url="/arcmanager/api/v1/openapi.json",
     version="1.2.0",
     description=description,
+    lifespan=lifespan,
 )
 
-# clear the current custom log
-with open("log.json", "w") as log:
-    log.write("[]")
-log.close()
-
 # load the environment variables from the .env file
 load_dotenv()
 
@@ -69,6 +90,9 @@ app.add_middleware(
     SessionMiddleware, secret_key=os.environ.get("SECRET_KEY"), max_age=None
 )
 
+# log the endpoint, status, duration and the time spent in the datahubs for every request
+app.add_middleware(TimingMiddleware)
+
 app.include_router(api_router)
 
 # force the app to use IPv4 (preventing issues with IPv6)
@@ -0,0 +1,34 @@
+import time
+
+from app.api.auth import TokenCache
+
+testKey = b"cookie"
+
+
+def test_tokenCache():
+    cache = TokenCache(2, 60)
+
+    assert cache.get(testKey) is None
+    cache.put(testKey, {"gitlab": "token", "target": "tuebingen"})
+
+    # changes to the returned token must not change the cached one
+    cache.get(testKey)["target"] = "freiburg"
+    assert cache.get(testKey) == {"gitlab": "token", "target": "tuebingen"}
+    assert cache.stats()["hits"] == 2
+
+
+def test_tokenCacheSize():
+    cache = TokenCache(2, 60)
+    for key in [b"1", b"2", b"3"]:
+        cache.put(key, {"gitlab": "token"})
+
+    assert cache.get(b"1") is None
+    assert cache.get(b"3") is not None
+
+
+def test_tokenExpiry():
+    cache = TokenCache(2, 60)
+
+    # the cache never returns a token after its expiration date
+    cache.put(testKey, {"gitlab": "token", "exp": time.time() - 1})
+    assert cache.get(testKey) is None
@@ -0,0 +1,49 @@
+from app.api.IO.isaCache import IsaCache, getBlobId
+
+testKey = ("GITLAB_TUEBINGEN", 230, "abc123", "investigation")
+
+
+def test_cacheHit():
+    cache = IsaCache(1024 * 1024)
+
+    assert cache.get(testKey) is None
+    cache.put(testKey, b"raw", {"data": [[1, 2]]})
+
+    raw, parsed = cache.get(testKey)
+    assert raw == b"raw"
+    assert parsed == {"data": [[1, 2]]}
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_cacheCopy():
+    cache = IsaCache(1024 * 1024)
+    cache.put(testKey, b"raw", {"data": [[1, 2]]})
+
+    # changes to the returned json must not change the cached entry
+    cache.get(testKey)[1]["data"].pop(0)
+    assert cache.get(testKey)[1] == {"data": [[1, 2]]}
+
+
+def test_cacheEviction():
+    cache = IsaCache(300)
+    keys = [("GITLAB_TUEBINGEN", 230, str(i), "assay") for i in range(3)]
+
+    cache.put(keys[0], b"x" * 100, [])
+    cache.put(keys[1], b"x" * 100, [])
+
+    # use the first entry, so that the second one is the least recently used
+    cache.get(keys[0])
+    cache.put(keys[2], b"x" * 100, [])
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[2]) is not None
+    assert cache.stats()["bytes"] <= 300
+    assert cache.stats()["evictions"] == 1
+
+
+def test_blobId():
+    assert getBlobId({"X-Gitlab-Blob-Id": "abc"}) == "abc"
+    assert getBlobId({"X-Gitlab-Content-Sha256": "def"}) == "def"
+    assert getBlobId({}) is None
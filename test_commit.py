@@ -0,0 +1,138 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.api.IO import gitlabIO
+from app.api.IO.commitIO import CommitBuilder
+from app.api.IO.gitlabIO import ApiClient
+
+
+# fake gitlab commit api; the commits with the given numbers fail
+def fakeGitlab(failing: list[int]) -> list[dict]:
+    commits = []
+
+    def handler(request: httpx.Request):
+        commits.append(json.loads(request.content))
+        if len(commits) in failing:
+            return httpx.Response(
+                400, json={"message": "A file with this name doesn't exist"}
+            )
+        return httpx.Response(201, json={"id": f"commit{len(commits)}"})
+
+    client = ApiClient("GITLAB_TEST")
+    client.client = httpx.AsyncClient(
+        base_url="https://gitlab.test", transport=httpx.MockTransport(handler)
+    )
+    gitlabIO.clients["GITLAB_TEST"] = client
+    return commits
+
+
+def getActions(count: int, size: int = 10) -> list[dict]:
+    return [
+        {"action": "create", "file_path": f"data/file{i}.txt", "content": "x" * size}
+        for i in range(count)
+    ]
+
+
+def test_commitBatches():
+    commits = fakeGitlab([])
+    commit = CommitBuilder(
+        "GITLAB_TEST", 1, "main", "Deleting all content from data", {}, maxActions=4
+    )
+    commit.extend(getActions(10))
+
+    responses = asyncio.run(commit.commit())
+
+    assert len(responses) == 3
+    assert [len(x["actions"]) for x in commits] == [4, 4, 2]
+    assert commits[2]["commit_message"] == "Deleting all content from data (3/3)"
+
+
+def test_commitSize():
+    commit = CommitBuilder("GITLAB_TEST", 1, "main", "Upload", {}, maxSize=1024 * 10)
+    # every action is about 3.5 KB, so only two fit into a batch (besides the json around it)
+    commit.extend(getActions(5, 3500))
+    assert [len(x) for x in commit.batches] == [2, 2, 1]
+
+    # a single action larger than the limit is sent on its own
+    commit.add(getActions(1, 20000)[0])
+    assert [len(x) for x in commit.batches] == [2, 2, 1, 1]
+    assert len(commit) == 6
+
+
+def test_commitSingle():
+    commits = fakeGitlab([])
+    commit = CommitBuilder("GITLAB_TEST", 1, "main", "Added new assays test", {})
+    commit.extend(getActions(4))
+
+    asyncio.run(commit.commit())
+    assert commits[0]["commit_message"] == "Added new assays test"
+
+
+def test_commitResume():
+    commits = fakeGitlab([2])
+    commit = CommitBuilder("GITLAB_TEST", 1, "main", "Moving", {}, maxActions=4)
+    commit.extend(getActions(10))
+
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(commit.commit())
+    assert e.value.status_code == 400
+    assert "The first 4 of 10 files were committed already" in e.value.detail
+    assert len(commit.committedActions()) == 4
+
+    # the next try continues with the failed batch
+    responses = asyncio.run(commit.commit())
+    assert len(responses) == 3
+    assert [x["commit_message"] for x in commits] == [
+        "Moving (1/3)",
+        "Moving (2/3)",
+        "Moving (2/3)",
+        "Moving (3/3)",
+    ]
+
+
+def test_commitPush():
+    commits = fakeGitlab([])
+    commit = CommitBuilder("GITLAB_TEST", 1, "main", "Upload", {}, maxSize=1024 * 10)
+    actions = [{**x, "encoding": "base64"} for x in getActions(5, 3500)]
+
+    async def run():
+        for action in actions:
+            await commit.push(action)
+            # the full batches are committed while the next actions are added
+            assert len(commits) == len(commit.batches) - 1
+        await commit.commit()
+
+    asyncio.run(run())
+    assert [len(x["actions"]) for x in commits] == [2, 2, 1]
+    assert commits[2]["commit_message"] == "Upload (part 3)"
+    assert commits[0]["actions"][0]["content"] == "x" * 3500
+    # the content of the committed files isn't kept in memory
+    assert [x["content"] for x in commit.committedActions()[:4]] == [""] * 4
+
+
+def test_commitNoRetryAfterSend():
+    requests = []
+
+    def handler(request: httpx.Request):
+        requests.append(request)
+        # the connection fails before the first request is sent, the second one may have been applied
+        if len(requests) == 1:
+            raise httpx.ConnectError("connection refused")
+        return httpx.Response(502)
+
+    client = ApiClient("GITLAB_TEST")
+    client.client = httpx.AsyncClient(
+        base_url="https://gitlab.test", transport=httpx.MockTransport(handler)
+    )
+    gitlabIO.clients["GITLAB_TEST"] = client
+
+    commit = CommitBuilder("GITLAB_TEST", 1, "main", "Upload", {}, retries=3)
+    commit.extend(getActions(2))
+    with pytest.raises(HTTPException):
+        asyncio.run(commit.commit())
+    # the commit isn't sent again after gitlab returned 502, as it may have been applied already
+    assert len(requests) == 2
@@ -0,0 +1,93 @@
+import asyncio
+import shutil
+import time
+
+import openpyxl
+import pytest
+from fastapi import HTTPException
+
+from app.api.IO.excelIO import getSwateSheets, readIsaFile, writeIsaRows
+from app.api.IO.excelPool import ExcelPool
+
+testInvestigation = "testdata/test_validation2/isa.investigation.xlsx"
+
+
+def test_writeIsaRows(tmp_path, monkeypatch):
+    monkeypatch.setenv("BACKEND_SAVE", f"{tmp_path}/")
+    (tmp_path / "tuebingen-1").mkdir()
+    shutil.copy(testInvestigation, tmp_path / "tuebingen-1/isa.investigation.xlsx")
+
+    writeIsaRows(
+        "isa.investigation.xlsx",
+        "investigation",
+        [
+            ["Investigation Title", "New Title"],
+            ["Investigation Description", "New Description"],
+        ],
+        1,
+        "tuebingen",
+    )
+
+    old = readIsaFile(testInvestigation, "investigation")["data"]
+    new = readIsaFile(
+        f"{tmp_path}/tuebingen-1/isa.investigation.xlsx", "investigation"
+    )["data"]
+
+    # only the two edited rows are changed
+    changes = [row[0] for row, newRow in zip(old, new) if row != newRow]
+    assert len(old) == len(new)
+    assert changes == ["Investigation Title", "Investigation Description"]
+    assert ["Investigation Title", "New Title", None] in new
+
+
+def test_getSwateSheets(tmp_path):
+    workbook = openpyxl.Workbook()
+    workbook.active.title = "isa_assay"
+    workbook.active.append(["ASSAY", ""])
+    for name in ["Growth", "Extraction"]:
+        workbook.create_sheet(name).append(
+            ["Input [Source Name]", "Output [Sample Name]"]
+        )
+    workbook.save(tmp_path / "isa.assay.xlsx")
+
+    sheets, names = getSwateSheets(f"{tmp_path}/isa.assay.xlsx", "assay")
+
+    # the metadata sheet is skipped
+    assert names == ["Growth", "Extraction"]
+    assert sheets[0]["columns"] == ["Input [Source Name]", "Output [Sample Name]"]
+    assert readIsaFile(f"{tmp_path}/isa.assay.xlsx", "assay")["columns"][0] == "ASSAY"
+
+
+def test_readIsaBytes():
+    with open(testInvestigation, "rb") as file:
+        content = file.read()
+
+    # the raw file is read in memory, with the same result as reading it from the disk
+    assert readIsaFile(content, "investigation") == readIsaFile(
+        testInvestigation, "investigation"
+    )
+
+
+def test_excelPoolTimeout():
+    pool = ExcelPool(1, 0, 0.2)
+
+    async def run():
+        with pytest.raises(HTTPException) as e:
+            await pool.run(time.sleep, 1)
+        assert e.value.status_code == 504
+        # the process is still busy with the timed out task, so there is no room for another one
+        assert pool.running == 1
+        with pytest.raises(HTTPException) as e:
+            await pool.run(time.sleep, 0)
+        assert e.value.status_code == 503
+
+        # as soon as the process is done with the task, it can be used again
+        while pool.running > 0:
+            await asyncio.sleep(0.05)
+        await pool.run(time.sleep, 0)
+
+    try:
+        asyncio.run(run())
+    finally:
+        pool.shutdown()
+    assert pool.running == 0
@@ -0,0 +1,186 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.api.IO import gitlabIO
+from app.api.IO.commitIO import CommitBuilder
+from app.api.IO.gitattributesIO import (
+    GitAttributes,
+    commitWithGitAttributes,
+    getChanges,
+    lfsPointer,
+)
+from app.api.IO.gitlabIO import ApiClient
+
+testAttributes = (
+    "*.xlsx -text\n"
+    "data/a.bin filter=lfs diff=lfs merge=lfs -text\n"
+    "data/b.bin filter=lfs diff=lfs merge=lfs\n"
+    "data/a.bin filter=lfs diff=lfs merge=lfs -text\n"
+)
+
+
+def test_gitAttributes():
+    attributes = GitAttributes(testAttributes, "abc")
+    assert "data/a.bin" in attributes
+    assert "data/c.bin" not in attributes
+
+    attributes.add(["data/a.bin", "data/c.bin"])
+    attributes.remove(["data/a.bin", "data/missing.bin"])
+    attributes.rename({"data/b.bin": "raw/b.bin"})
+
+    assert attributes.changed
+    assert attributes.content() == (
+        "*.xlsx -text\n"
+        "raw/b.bin filter=lfs diff=lfs merge=lfs\n"
+        "data/c.bin filter=lfs diff=lfs merge=lfs -text\n"
+    )
+    assert attributes.action()["last_commit_id"] == "abc"
+
+
+def test_gitAttributesUnchanged():
+    attributes = GitAttributes("data/a.bin filter=lfs diff=lfs merge=lfs -text\n")
+    attributes.remove(["data/b.bin"])
+    attributes.add(["data/a.bin"])
+    assert not attributes.changed
+
+    # without a .gitattributes, the file is created
+    attributes = GitAttributes(None)
+    attributes.add(["data/a.bin"])
+    assert attributes.action()["action"] == "create"
+
+
+# fake gitlab; commits with the .gitattributes fail (as if it was changed in the meantime)
+def fakeGitlab(conflict: bool) -> list:
+    requests = []
+
+    def handler(request: httpx.Request):
+        requests.append(request)
+        if request.method == "GET":
+            return httpx.Response(
+                200,
+                text="data/a.bin filter=lfs diff=lfs merge=lfs -text\n",
+                headers={"X-Gitlab-Last-Commit-Id": "abc"},
+            )
+        if request.url.path.endswith("/commits"):
+            actions = json.loads(request.content)["actions"]
+            if conflict and any(x["file_path"] == ".gitattributes" for x in actions):
+                return httpx.Response(400, json={"message": "already been updated"})
+            return httpx.Response(201, json={})
+        return httpx.Response(200, json={})
+
+    client = ApiClient("GITLAB_TEST")
+    client.client = httpx.AsyncClient(
+        base_url="https://gitlab.test", transport=httpx.MockTransport(handler)
+    )
+    gitlabIO.clients["GITLAB_TEST"] = client
+    return requests
+
+
+def getCommit() -> CommitBuilder:
+    commit = CommitBuilder("GITLAB_TEST", 1, "main", "Deleting", {})
+    commit.extend(
+        [
+            {"action": "delete", "file_path": "data/a.bin"},
+            {"action": "delete", "file_path": "data/b.txt"},
+        ]
+    )
+    return commit
+
+
+def test_commitWithGitAttributes():
+    requests = fakeGitlab(False)
+    asyncio.run(commitWithGitAttributes(getCommit(), {}, "remove"))
+
+    # the .gitattributes is updated in the same commit as the files
+    assert [x.method for x in requests] == ["GET", "POST"]
+    actions = json.loads(requests[1].content)["actions"]
+    assert actions[-1] == {
+        "action": "update",
+        "file_path": ".gitattributes",
+        "content": "",
+        "last_commit_id": "abc",
+    }
+
+
+def test_commitWithGitAttributesConflict():
+    requests = fakeGitlab(True)
+    commit = getCommit()
+    asyncio.run(commitWithGitAttributes(commit, {}, "remove"))
+
+    # the files are committed without the .gitattributes, which is then updated on its own
+    assert [x.method for x in requests] == ["GET", "POST", "POST", "GET", "PUT"]
+    assert len(json.loads(requests[2].content)["actions"]) == 2
+    assert json.loads(requests[4].content)["content"] == ""
+    assert len(commit.committedActions()) == 2
+
+
+def test_uploadChanges():
+    actions = [
+        {
+            "action": "create",
+            "file_path": "data/a.txt",
+            "content": "YQ==",
+            "encoding": "base64",
+        },
+        {
+            "action": "update",
+            "file_path": "data/b.bin",
+            "content": "version https://git-lfs.github.com/spec/v1\noid sha256:abc\nsize 3\n",
+        },
+    ]
+    # lfs pointer files are added to the .gitattributes, all other files are removed
+    assert getChanges(actions, "upload") == {
+        "add": ["data/b.bin"],
+        "remove": ["data/a.txt"],
+    }
+
+
+def test_commitWithGitAttributesPush():
+    requests = fakeGitlab(False)
+    commit = CommitBuilder("GITLAB_TEST", 1, "main", "Upload", {}, maxActions=1)
+    pointer = "version https://git-lfs.github.com/spec/v1\noid sha256:abc\nsize 3\n"
+    actions = [
+        {"action": "create", "file_path": "data/c.bin", "content": pointer},
+        {
+            "action": "create",
+            "file_path": "data/d.txt",
+            "content": "ZA==",
+            "encoding": "base64",
+        },
+    ]
+    asyncio.run(commitWithGitAttributes(commit, {}, "upload", iter(actions)))
+
+    # the .gitattributes is read first, the first file is committed as soon as the second one is added
+    assert [x.method for x in requests] == ["GET", "POST", "POST", "POST"]
+    assert json.loads(requests[-1].content)["actions"][0]["content"] == (
+        "data/a.bin filter=lfs diff=lfs merge=lfs -text\n"
+        "data/c.bin filter=lfs diff=lfs merge=lfs -text\n"
+    )
+
+
+def test_commitWithGitAttributesUnreadable():
+    requests = []
+
+    def handler(request: httpx.Request):
+        requests.append(request)
+        return httpx.Response(403, json={"message": "403 Forbidden"})
+
+    client = ApiClient("GITLAB_TEST")
+    client.client = httpx.AsyncClient(
+        base_url="https://gitlab.test", transport=httpx.MockTransport(handler)
+    )
+    gitlabIO.clients["GITLAB_TEST"] = client
+
+    commit = CommitBuilder("GITLAB_TEST", 1, "main", "Upload", {}, maxActions=1)
+    actions = [
+        {"action": "create", "file_path": f"data/{x}.bin", "content": lfsPointer}
+        for x in "abc"
+    ]
+    with pytest.raises(HTTPException):
+        asyncio.run(commitWithGitAttributes(commit, {}, "upload", iter(actions)))
+    # nothing is committed, if the .gitattributes can't be read
+    assert [x.method for x in requests] == ["GET"]
@@ -0,0 +1,151 @@
+import asyncio
+
+from fastapi import HTTPException, Response
+
+from app.api.auth import getUserKey
+from app.api.endpoints import jobs
+from app.api.jobs import Job, JobRunner, JobStore, reportProgress
+
+
+def getRunner(path=None, perUser: int = 1) -> JobRunner:
+    return JobRunner(
+        JobStore(path, keep=3600), workers=4, perUser=perUser, perDatahub=4, maxQueue=5
+    )
+
+
+def test_jobResult():
+    runner = getRunner()
+
+    async def operation():
+        reportProgress(0.5, "halfway")
+        await asyncio.sleep(0)
+        return Response('"Successfully deleted the folder!"', 200)
+
+    async def run():
+        job = runner.submit("deleteFolder", "user", "GITLAB_TUEBINGEN", operation)
+        assert job.status == "queued"
+        await runner.tasks[job.id]
+        return runner.store.get(job.id)
+
+    job = asyncio.run(run())
+    assert job.status == "done"
+    assert job.progress == 1
+    assert job.message == "halfway"
+    assert job.resultStatus == 200
+    assert job.result == "Successfully deleted the folder!"
+
+
+def test_jobError():
+    runner = getRunner()
+
+    async def operation():
+        raise HTTPException(status_code=404, detail="Path does not exist!")
+
+    async def run():
+        job = runner.submit("renameFolder", "user", "GITLAB_TUEBINGEN", operation)
+        await runner.tasks[job.id]
+        return job
+
+    job = asyncio.run(run())
+    assert job.status == "failed"
+    assert job.resultStatus == 404
+    assert job.error == "Path does not exist!"
+
+
+def test_jobsPerUser():
+    runner = getRunner()
+    running = []
+    maxRunning = []
+
+    async def operation():
+        running.append(1)
+        maxRunning.append(len(running))
+        await asyncio.sleep(0.01)
+        running.pop()
+        return "done"
+
+    async def run():
+        jobs = [runner.submit("createArc", "user", "dev", operation) for _ in range(3)]
+        # the jobs of another user don't wait for the first user
+        other = runner.submit("createArc", "other", "dev", operation)
+        await asyncio.gather(*runner.tasks.values())
+        return jobs + [other]
+
+    jobs = asyncio.run(run())
+    assert all(x.status == "done" for x in jobs)
+    assert max(maxRunning) == 2
+
+
+def test_jobCancel():
+    runner = getRunner()
+
+    async def operation():
+        await asyncio.sleep(10)
+
+    async def run():
+        job = runner.submit("publishArc", "user", "dev", operation)
+        await asyncio.sleep(0)
+        assert runner.cancel(job.id)
+        await asyncio.gather(*runner.tasks.values())
+        return job
+
+    job = asyncio.run(run())
+    assert job.status == "cancelled"
+
+
+def test_jobCancelOwner(monkeypatch):
+    runner = getRunner()
+    monkeypatch.setattr(jobs, "jobRunner", runner)
+    user = {"target": "dev", "gitlab": "token"}
+    other = {"target": "dev", "gitlab": "other"}
+
+    async def operation():
+        await asyncio.sleep(10)
+
+    async def cancel(jobId: str, token: dict | None) -> int | str:
+        try:
+            return await jobs.cancelJob(jobId, token)
+        except HTTPException as e:
+            return e.status_code
+
+    async def run():
+        job = runner.submit("publishArc", getUserKey(user), "dev", operation)
+        public = runner.submit("createArcJson", None, "all", operation)
+        await asyncio.sleep(0)
+        # only the owner can cancel the job, public jobs can't be cancelled by anyone
+        results = [
+            await cancel(job.id, None),
+            await cancel(job.id, other),
+            await cancel(public.id, None),
+            await cancel(public.id, other),
+            await cancel(job.id, user),
+        ]
+        runner.cancel(public.id)
+        await asyncio.gather(*runner.tasks.values())
+        return results
+
+    assert asyncio.run(run()) == [401, 404, 401, 403, "The job was cancelled!"]
+
+
+def test_jobDatabase(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    runner = getRunner(path)
+
+    async def run():
+        job = runner.submit("createArcJson", None, "all", lambda: asyncio.sleep(0))
+        await runner.tasks[job.id]
+        return job.id
+
+    jobId = asyncio.run(run())
+
+    # another worker sees the job in the database
+    store = JobStore(path, keep=3600)
+    job = store.get(jobId)
+    assert job.status == "done"
+    assert [x.id for x in store.list(None)] == [jobId]
+
+    # jobs of workers that don't exist anymore are marked as failed
+    lost = Job("deleteFolder", "user", "dev")
+    lost.pid = 2**22 + 1
+    store.save(lost)
+    assert JobStore(path, keep=3600).get(lost.id).status == "failed"
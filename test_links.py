@@ -0,0 +1,142 @@
+import asyncio
+
+import httpx
+
+from app.api.IO import gitlabIO
+from app.api.IO.gitlabIO import ApiClient
+from app.api.IO.isaCache import isaCache
+from app.api.IO.linkIndex import (
+    LinkIndex,
+    getLinkIndex,
+    getLinkedNames,
+    updateLinkIndex,
+)
+
+studyRows = {
+    "studies/s1/isa.study.xlsx": [
+        ["Study Identifier", "s1"],
+        ["Study Assay File Name", "assays/a1/isa.assay.xlsx", "a2/isa.assay.xlsx"],
+    ],
+    "studies/s2/isa.study.xlsx": [
+        ["Study Assay File Name", "assays\\a2\\isa.assay.xlsx", None, ""],
+    ],
+    "isa.investigation.xlsx": [["Study File Name", "studies/s1/isa.study.xlsx"]],
+}
+
+
+def test_linkedNames():
+    assert getLinkedNames(
+        studyRows["studies/s1/isa.study.xlsx"], "Study Assay File Name"
+    ) == ["a1", "a2"]
+    assert getLinkedNames(
+        studyRows["studies/s2/isa.study.xlsx"], "Study Assay File Name"
+    ) == ["a2"]
+    assert getLinkedNames([["Study Identifier", "s1"]], "Study File Name") == []
+
+
+# fake gitlab with the branch and the studies folder of the arc
+def fakeGitlab(commit: str) -> list:
+    requests = []
+
+    def handler(request: httpx.Request):
+        requests.append(request)
+        if "/repository/branches/" in request.url.path:
+            return httpx.Response(200, json={"commit": {"id": commit}})
+        return httpx.Response(
+            200,
+            json=[
+                {"path": "studies/s1", "type": "tree"},
+                {"path": "studies/s2", "type": "tree"},
+                {"path": "studies/.gitkeep", "type": "blob"},
+            ],
+        )
+
+    client = ApiClient("GITLAB_TEST")
+    client.client = httpx.AsyncClient(
+        base_url="https://gitlab.test", transport=httpx.MockTransport(handler)
+    )
+    gitlabIO.clients["GITLAB_TEST"] = client
+    return requests
+
+
+def test_linkIndex():
+    isaCache.clear()
+    fakeGitlab("c1")
+    reads = []
+
+    async def read(path: str, ref: str) -> list:
+        # the files are read at the commit of the index (not at the branch, which may move meanwhile)
+        assert ref == "c1"
+        reads.append(path)
+        return studyRows[path]
+
+    index = asyncio.run(getLinkIndex("GITLAB_TEST", 1, "main", {}, read))
+    assert index.studiesOf("a2") == ["s1", "s2"]
+    assert index.studiesOf("a3") == []
+    assert index.inInvestigation("s1") and not index.inInvestigation("s2")
+    assert len(reads) == 3
+
+    # the index of the same commit is read from the cache
+    index = asyncio.run(getLinkIndex("GITLAB_TEST", 1, "main", {}, read))
+    assert index.studiesOf("a1") == ["s1"]
+    assert len(reads) == 3
+
+
+def test_updateLinkIndex():
+    isaCache.clear()
+    assert not updateLinkIndex("GITLAB_TEST", 1, "c1", "c2", {})
+
+    isaCache.put(
+        ("links", "GITLAB_TEST", 1, "c1"),
+        b"",
+        LinkIndex({"s1": ["a1"]}, ["s1"]).toJson(),
+    )
+    # a sync commit adds the assay to the second study and the study to the investigation
+    assert updateLinkIndex(
+        "GITLAB_TEST",
+        1,
+        "c1",
+        "c2",
+        {
+            "studies/s2/isa.study.xlsx": [
+                ["Study Assay File Name", "a1/isa.assay.xlsx"]
+            ],
+            "isa.investigation.xlsx": [
+                ["Study File Name", "s1/isa.study.xlsx", "s2/isa.study.xlsx"]
+            ],
+        },
+    )
+
+    requests = fakeGitlab("c2")
+
+    async def read(path: str, ref: str) -> list:
+        raise AssertionError("the index should be cached")
+
+    index = asyncio.run(getLinkIndex("GITLAB_TEST", 1, "main", {}, read))
+    assert index.studiesOf("a1") == ["s1", "s2"]
+    assert index.inInvestigation("s2")
+    assert len(requests) == 1
+
+
+def test_linkIndexConcurrency(monkeypatch):
+    isaCache.clear()
+    fakeGitlab("c3")
+    monkeypatch.setenv("GITLAB_TEST_ISA_CONCURRENCY", "2")
+    running = []
+    maxRunning = []
+
+    async def read(path: str, ref: str) -> list:
+        running.append(path)
+        maxRunning.append(len(running))
+        await asyncio.sleep(0.05)
+        running.remove(path)
+        if path == "studies/s2/isa.study.xlsx":
+            raise FileNotFoundError(path)
+        return studyRows[path]
+
+    index = asyncio.run(getLinkIndex("GITLAB_TEST", 1, "main", {}, read))
+    # the studies and the investigation are read two at a time
+    assert max(maxRunning) == 2
+    # a study that can't be read has no assays
+    assert index.studies == {"s1": ["a1", "a2"], "s2": []}
+    assert index.inInvestigation("s1")
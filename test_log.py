@@ -0,0 +1,52 @@
+import os
+import time
+
+from app.api.IO.logIO import LogStore
+
+
+def test_writeAndRead(tmp_path):
+    store = LogStore(str(tmp_path), maxSize=1024 * 1024, maxAge=3600, retention=86400)
+
+    for i in range(10):
+        store.write({"endpoint": "arc_file", "status": 200, "response_time": i})
+
+    entries = list(store.readLogs())
+    assert len(entries) == 10
+    assert entries[-1]["response_time"] == 9
+
+
+def test_rotation(tmp_path):
+    store = LogStore(str(tmp_path), maxSize=200, maxAge=3600, retention=86400)
+
+    for i in range(20):
+        store.write({"endpoint": "arc_file", "status": 200, "response_time": i})
+        store.flush()
+
+    # the entries are split into multiple segments, but none of them gets lost
+    assert len(store.segments()) > 1
+    assert len(list(store.readLogs())) == 20
+
+
+def test_multipleWorkers(tmp_path):
+    # two workers write into the same directory, but into their own segments
+    first = LogStore(str(tmp_path), maxSize=1024 * 1024, maxAge=3600, retention=86400)
+    second = LogStore(str(tmp_path), maxSize=1024 * 1024, maxAge=3600, retention=86400)
+    second.segmentCount = 100
+
+    first.write({"endpoint": "getStudies", "status": 200})
+    second.write({"endpoint": "getAssays", "status": 500})
+    second.flush()
+
+    endpoints = sorted([x["endpoint"] for x in first.readLogs()])
+    assert endpoints == ["getAssays", "getStudies"]
+
+
+def test_retention(tmp_path):
+    old = tmp_path / "20000101-000000-1-1.ndjson"
+    old.write_text('{"endpoint": "old"}\n')
+    os.utime(old, (time.time() - 7200, time.time() - 7200))
+
+    store = LogStore(str(tmp_path), maxSize=1024 * 1024, maxAge=3600, retention=3600)
+    store.write({"endpoint": "new"})
+
+    assert [x["endpoint"] for x in store.readLogs()] == ["new"]
@@ -0,0 +1,99 @@
+import json
+import os
+
+from app.api.metrics import Metrics, loadSnapshots, summarize
+from app.api.middleware import summarizeTimings
+
+testTime = 1700000000.0
+
+
+def test_percentiles():
+    metrics = Metrics()
+    for i in range(1, 101):
+        metrics.record("arc_file", 200, i / 1000, timestamp=testTime)
+
+    summary = summarize([metrics.snapshot()], now=testTime + 1)
+    window = summary["endpoints"]["arc_file"]["1m"]
+
+    assert window["count"] == 100
+    assert window["max"] == 100
+    # the percentiles are accurate to the size of a bucket (5%)
+    assert 47 <= window["p50"] <= 53
+    assert 85 <= window["p90"] <= 95
+    assert 94 <= window["p99"] <= 100
+
+
+def test_windows():
+    metrics = Metrics()
+    metrics.record("getStudies", 200, 0.1, timestamp=testTime - 3600)
+    metrics.record("getStudies", 500, 0.1, timestamp=testTime - 600)
+    metrics.record("getStudies", 200, 0.1, timestamp=testTime)
+
+    windows = summarize([metrics.snapshot()], now=testTime + 1)["endpoints"][
+        "getStudies"
+    ]
+
+    assert windows["1m"]["count"] == 1
+    assert windows["15m"]["count"] == 2
+    assert windows["24h"]["count"] == 3
+    assert windows["24h"]["status"] == {"200": 2, "500": 1}
+
+
+def test_errors():
+    metrics = Metrics(errorLimit=2)
+    for i in range(5):
+        metrics.record("saveFile", 500, 0.1, "Error", timestamp=testTime + i)
+    metrics.record("arc_file", 404, 0.1, "Not found", timestamp=testTime + 5)
+    metrics.record("getAssays", 500, 0.1, "Timeout", timestamp=testTime + 6)
+
+    # same errors are counted only once and the oldest error is removed if there are too many
+    errors = summarize([metrics.snapshot()], now=testTime + 7)["errors"]
+    assert [x["error"] for x in errors] == [
+        "getAssays, 500: Timeout",
+        "arc_file, 404: Not found",
+    ]
+
+
+def test_mergeWorkers():
+    first = Metrics()
+    second = Metrics()
+    first.record("arc_file", 200, 0.1, timestamp=testTime)
+    second.record("arc_file", 200, 0.3, timestamp=testTime)
+    second.record("saveFile", 400, 0.2, "Bad", timestamp=testTime)
+
+    summary = summarize([first.snapshot(), second.snapshot()], now=testTime + 1)
+
+    assert summary["workers"] == 2
+    assert summary["endpoints"]["arc_file"]["15m"]["count"] == 2
+    assert summary["endpoints"]["arc_file"]["15m"]["max"] == 300
+    assert summary["statusCodes"] == {"200": 2, "400": 1}
+    assert summary["errors"][0]["count"] == 1
+
+
+def test_overlappingTimings():
+    # three tree pages requested at the same time and an excel parse afterwards
+    timings = {
+        "gitlab": [[0.0, 1.0], [0.1, 1.2], [0.2, 0.9]],
+        "excel": [[1.5, 2.0]],
+    }
+    summary = summarizeTimings(timings, 3.0)
+    # the requests running at the same time are counted once, so the own time isn't lost
+    assert summary == {"gitlab": 1.2, "excel": 0.5, "own": 1.3}
+
+
+def test_deadWorkers(tmp_path):
+    live = Metrics()
+    live.record("arc_file", 200, 0.1, timestamp=testTime)
+    # the snapshot of a worker that was stopped by a restart and one of a running worker
+    (tmp_path / f"metrics-{2**22 + 1}.json").write_text(json.dumps(live.snapshot()))
+    (tmp_path / f"metrics-{os.getppid()}.json").write_text(json.dumps(live.snapshot()))
+
+    snapshots = loadSnapshots(str(tmp_path))
+    assert len(snapshots) == 1
+    assert not (tmp_path / f"metrics-{2**22 + 1}.json").exists()
+
+    # without any requests the metrics are empty
+    summary = Metrics().summary(str(tmp_path / "missing"))
+    assert summary["workers"] == 1
+    assert summary["endpoints"] == {}
+    assert summary["statusCodes"] == {}
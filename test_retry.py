@@ -0,0 +1,87 @@
+import asyncio
+
+import httpx
+
+from app.api.IO.gitlabIO import ApiClient
+from app.api.middleware import requestRetries
+from app.api.retry import RetryBudget, RetryPolicy
+
+
+def getClient(statusCodes: list[int]) -> tuple[ApiClient, list]:
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(statusCodes[min(len(requests), len(statusCodes)) - 1])
+
+    client = ApiClient("GITLAB_TEST")
+    client.client = httpx.AsyncClient(
+        base_url="https://gitlab.test", transport=httpx.MockTransport(handler)
+    )
+    return client, requests
+
+
+def test_retryUntilSuccess():
+    client, requests = getClient([503, 429, 200])
+    retries = {}
+    requestRetries.set(retries)
+
+    response = asyncio.run(client.get("/api/v4/projects", retries=3, backoff=0.01))
+
+    assert response.status_code == 200
+    assert len(requests) == 3
+    assert retries == {"gitlab": 2}
+
+
+def test_noRetryOnOtherStatus():
+    client, requests = getClient([404, 200])
+    response = asyncio.run(client.get("/api/v4/projects", retries=3, backoff=0.01))
+
+    assert response.status_code == 404
+    assert len(requests) == 1
+
+
+def test_retryBudget():
+    budget = RetryBudget(ratio=0, minRetries=2, window=60)
+    policy = RetryPolicy("gitlab", 10, 0.001, budget=budget)
+
+    async def run() -> int:
+        count = 0
+        async for attempt in policy.attempts():
+            count += 1
+            if attempt.last:
+                break
+        return count
+
+    # the budget only allows two retries, no matter how many attempts the policy allows
+    assert asyncio.run(run()) == 3
+    assert asyncio.run(run()) == 1
+    assert budget.stats()["retries"] == 2
+
+
+def test_delay():
+    policy = RetryPolicy("gitlab", 5, 2, maxDelay=10)
+    for retry in range(1, 6):
+        delay = policy.delay(retry)
+        expected = min(10, 2 * 2 ** (retry - 1))
+        # the delay is randomized (jitter), but never below half of the backoff
+        assert expected / 2 <= delay <= expected
+
+    response = httpx.Response(429, headers={"Retry-After": "7"})
+    assert policy.delay(1, response) == 7
+
+
+def test_retryStream():
+    client, requests = getClient([503, 201])
+
+    async def stream():
+        yield b"streamed "
+        yield b"body"
+
+    response = asyncio.run(
+        client.post("/api/v4/projects", content=stream, retries=3, backoff=0.01)
+    )
+
+    assert response.status_code == 201
+    # the body is created again for the retry
+    assert [x.read() for x in requests] == [b"streamed body", b"streamed body"]
@@ -0,0 +1,135 @@
+import asyncio
+import base64
+import json
+import os
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.api.IO import gitlabIO
+from app.api.IO.gitlabIO import ApiClient
+from app.api.IO.transactionIO import IsaTransaction
+from app.api.IO.workingCopyIO import workingCopies
+
+
+# fake gitlab commit api; commits with the outdated last commit of a file fail
+def fakeGitlab(outdated: str | None = None) -> list[dict]:
+    commits = []
+
+    def handler(request: httpx.Request):
+        commits.append(json.loads(request.content))
+        if any(x.get("last_commit_id") == outdated for x in commits[-1]["actions"]):
+            return httpx.Response(
+                400,
+                json={
+                    "message": "You are attempting to update a file that has changed since you started editing it."
+                },
+            )
+        return httpx.Response(201, json={"id": "abc"})
+
+    client = ApiClient("GITLAB_TEST")
+    client.client = httpx.AsyncClient(
+        base_url="https://gitlab.test", transport=httpx.MockTransport(handler)
+    )
+    gitlabIO.clients["GITLAB_TEST"] = client
+    return commits
+
+
+# returns the file like getIsaContent (raw file, parsed content and headers)
+async def download(path: str) -> tuple[bytes, dict, dict]:
+    return (
+        path.encode(),
+        {"data": [["Study File Name", path]]},
+        {"X-Gitlab-Blob-Id": f"blob-{path}", "X-Gitlab-Last-Commit-Id": "c1"},
+    )
+
+
+def test_transactionCommit(tmp_path, monkeypatch):
+    monkeypatch.setenv("BACKEND_SAVE", f"{tmp_path}/")
+    commits = fakeGitlab()
+    fetches = []
+
+    async def fetch(path: str) -> list:
+        fetches.append(path)
+        return [["Study File Name", path]]
+
+    async def run():
+        async with IsaTransaction("GITLAB_TEST", 1, "dev/new", {}) as transaction:
+            await transaction.load("assays/a/isa.assay.xlsx", download)
+            transaction.change("assays/a/isa.assay.xlsx", "Updated assay")
+            await transaction.load("studies/s/isa.study.xlsx", download)
+            # files that are only read don't get a working copy
+            await transaction.read("isa.investigation.xlsx", fetch)
+            transaction.change("studies/s/isa.study.xlsx", "Synced assay to study")
+
+            # the working copies are kept apart by branch and version of the file
+            copy = transaction.localPath("studies/s/isa.study.xlsx")
+            assert f"/work/GITLAB_TEST-1/dev%2Fnew/blob-studies" in copy
+            response = await transaction.commit()
+        return response, copy
+
+    response, copy = asyncio.run(run())
+    assert response == b'{"id": "abc"}'
+    assert fetches == ["isa.investigation.xlsx"]
+    # the working copies are removed at the end of the transaction
+    assert not os.path.exists(copy)
+
+    # both files are committed with a single commit
+    assert len(commits) == 1
+    assert commits[0]["commit_message"] == "Updated assay\n\nSynced assay to study"
+    assert [
+        (x["file_path"], base64.b64decode(x["content"]), x["last_commit_id"])
+        for x in commits[0]["actions"]
+    ] == [
+        ("assays/a/isa.assay.xlsx", b"assays/a/isa.assay.xlsx", "c1"),
+        ("studies/s/isa.study.xlsx", b"studies/s/isa.study.xlsx", "c1"),
+    ]
+
+
+def test_transactionConflict(tmp_path, monkeypatch):
+    monkeypatch.setenv("BACKEND_SAVE", f"{tmp_path}/")
+    fakeGitlab(outdated="c1")
+
+    async def run():
+        async with IsaTransaction("GITLAB_TEST", 1, "main", {}) as transaction:
+            await transaction.load("isa.investigation.xlsx", download)
+            transaction.change("isa.investigation.xlsx", "Updated investigation")
+            await transaction.commit()
+
+    # the file was changed since the working copy was downloaded
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(run())
+    assert e.value.status_code == 409
+
+
+def test_transactionLocks(tmp_path, monkeypatch):
+    monkeypatch.setenv("BACKEND_SAVE", f"{tmp_path}/")
+    events = []
+
+    async def edit(name: str, path: str):
+        async with IsaTransaction("GITLAB_TEST", 1, "main", {}) as transaction:
+            await transaction.load(path, download)
+            events.append(f"{name} start")
+            await asyncio.sleep(0.05)
+            events.append(f"{name} end")
+
+    async def run():
+        await asyncio.gather(
+            edit("a", "isa.investigation.xlsx"),
+            edit("b", "isa.investigation.xlsx"),
+            edit("c", "studies/s/isa.study.xlsx"),
+        )
+
+    asyncio.run(run())
+    # the edits of the same file run one after another, other files are edited at the same time
+    assert events.index("b start") > events.index("a end")
+    assert events.index("c start") < events.index("a end")
+    assert workingCopies.locks == {}
+
+
+def test_transactionEmpty():
+    commits = fakeGitlab()
+    transaction = IsaTransaction("GITLAB_TEST", 1, "main", {})
+    assert asyncio.run(transaction.commit()) is None
+    assert commits == []
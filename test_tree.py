@@ -0,0 +1,76 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.api.IO import gitlabIO
+from app.api.IO.gitlabIO import ApiClient, getTree
+
+# 250 files in sub folders of "data"
+testTree = [
+    {"path": f"data/folder{i % 3}/file{i}.txt", "type": "blob"} for i in range(250)
+] + [{"path": f"data/folder{i}", "type": "tree"} for i in range(3)]
+
+
+# fake gitlab tree api; without total pages, gitlab only offers the links to the next pages
+def fakeGitlab(countPages: bool, requests: list):
+    def handler(request: httpx.Request):
+        requests.append(request)
+        params = request.url.params
+        if params["path"] != "data":
+            return httpx.Response(404, json={"message": "404 Tree Not Found"})
+        perPage = int(params["per_page"])
+
+        if params.get("pagination") == "keyset":
+            start = int(params.get("page_token", 0))
+            headers = {}
+            if start + perPage < len(testTree):
+                nextUrl = request.url.copy_merge_params({"page_token": start + perPage})
+                headers["Link"] = f'<{nextUrl}>; rel="next"'
+            return httpx.Response(
+                200, json=testTree[start : start + perPage], headers=headers
+            )
+
+        page = int(params["page"])
+        pages = -(-len(testTree) // perPage)
+        headers = {"X-Next-Page": str(page + 1) if page < pages else ""}
+        if countPages:
+            headers["X-Total-Pages"] = str(pages)
+        start = (page - 1) * perPage
+        return httpx.Response(
+            200, json=testTree[start : start + perPage], headers=headers
+        )
+
+    client = ApiClient("GITLAB_TEST")
+    client.client = httpx.AsyncClient(
+        base_url="https://gitlab.test", transport=httpx.MockTransport(handler)
+    )
+    gitlabIO.clients["GITLAB_TEST"] = client
+
+
+def test_treePages():
+    requests = []
+    fakeGitlab(True, requests)
+    tree = asyncio.run(getTree("GITLAB_TEST", 1, "data", "main", {}))
+
+    assert sorted(tree) == sorted((x["path"], x["type"]) for x in testTree)
+    assert len(requests) == 3
+    assert all(x.url.params["recursive"] == "true" for x in requests)
+
+
+def test_treeKeyset():
+    requests = []
+    fakeGitlab(False, requests)
+    tree = asyncio.run(getTree("GITLAB_TEST", 1, "data", "main", {}))
+
+    assert tree == [(x["path"], x["type"]) for x in testTree]
+    # the first offset page and then all pages with keyset pagination
+    assert len(requests) == 4
+
+
+def test_treeNotFound():
+    fakeGitlab(True, [])
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(getTree("GITLAB_TEST", 1, "missing", "main", {}))
+    assert e.value.status_code == 404
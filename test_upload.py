@@ -0,0 +1,229 @@
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import os
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.IO import uploadIO
+from app.api.IO.gitlabIO import streamJsonFile
+from app.api.IO.uploadIO import (
+    UploadSession,
+    cleanUploads,
+    createSession,
+    getSession,
+    sessionStatus,
+    sessionTtl,
+)
+
+testData = os.urandom(10 * 1024 + 123)
+chunkSize = 1024
+
+
+def getChunks() -> list[bytes]:
+    return [testData[i : i + chunkSize] for i in range(0, len(testData), chunkSize)]
+
+
+def uploadChunks(order: list[int]):
+    chunks = getChunks()
+    session = UploadSession("1-test.bin", len(chunks))
+    for chunk in order:
+        state = session.writeChunk(chunk, chunks[chunk])
+
+    assert session.missing(state) == []
+    assert session.claim()
+    # the upload can only be finished once
+    assert not session.claim()
+
+    spoolFile, size, sha256 = session.finalize()
+    content = spoolFile.read()
+    spoolFile.close()
+    session.remove()
+    return content, size, sha256
+
+
+def test_uploadInOrder(tmp_path, monkeypatch):
+    monkeypatch.setenv("BACKEND_SAVE", f"{tmp_path}/")
+    content, size, sha256 = uploadChunks(list(range(11)))
+
+    assert content == testData
+    assert size == len(testData)
+    assert sha256 == hashlib.sha256(testData).hexdigest()
+    assert os.listdir(tmp_path / "cache") == []
+
+
+def test_uploadOutOfOrder(tmp_path, monkeypatch):
+    monkeypatch.setenv("BACKEND_SAVE", f"{tmp_path}/")
+    # the last chunk arrives first and one chunk is sent twice
+    content, size, sha256 = uploadChunks([10, 3, 0, 1, 2, 5, 4, 4, 6, 9, 8, 7])
+
+    assert content == testData
+    assert sha256 == hashlib.sha256(testData).hexdigest()
+
+
+def test_uploadMissing(tmp_path, monkeypatch):
+    monkeypatch.setenv("BACKEND_SAVE", f"{tmp_path}/")
+    chunks = getChunks()
+    session = UploadSession("1-test.bin", len(chunks))
+    session.writeChunk(0, chunks[0])
+    state = session.writeChunk(10, chunks[10])
+
+    assert session.missing(state) == list(range(1, 10))
+    assert not session.claim()
+
+
+def test_uploadRestart(tmp_path, monkeypatch):
+    monkeypatch.setenv("BACKEND_SAVE", f"{tmp_path}/")
+    chunks = getChunks()
+    # an upload of another file with the same name and number of chunks is abandoned halfway
+    otherChunks = [os.urandom(len(x)) for x in chunks]
+    session = UploadSession("1-test.bin", len(chunks))
+    for chunk in range(len(chunks) - 1):
+        session.writeChunk(chunk, otherChunks[chunk])
+
+    # the new upload starts again with the first chunk
+    state = session.writeChunk(0, chunks[0])
+    assert session.missing(state) == list(range(1, 11))
+    assert not session.claim()
+
+    for chunk in range(1, len(chunks)):
+        state = session.writeChunk(chunk, chunks[chunk])
+    assert session.claim()
+    spoolFile, size, sha256 = session.finalize()
+    assert spoolFile.read() == testData
+    assert sha256 == hashlib.sha256(testData).hexdigest()
+    spoolFile.close()
+    session.remove()
+
+
+def test_uploadStaleHash(tmp_path, monkeypatch):
+    monkeypatch.setenv("BACKEND_SAVE", f"{tmp_path}/")
+    chunks = getChunks()
+    session = UploadSession("1-test.bin", len(chunks))
+    for chunk in range(5):
+        session.writeChunk(chunk, os.urandom(chunkSize))
+    # the abandoned upload was removed by another worker, the hash of this worker is left over
+    os.remove(session.stateFile)
+
+    content, size, sha256 = uploadChunks(list(range(11)))
+    assert content == testData
+    assert sha256 == hashlib.sha256(testData).hexdigest()
+
+
+def test_uploadLimits(tmp_path, monkeypatch):
+    monkeypatch.setenv("BACKEND_SAVE", f"{tmp_path}/")
+    with pytest.raises(HTTPException) as e:
+        UploadSession("1-huge.bin", 10**9).writeChunk(0, b"x")
+    assert e.value.status_code == 400
+    assert not os.path.exists(tmp_path / "cache" / "1-huge.bin.json")
+
+    # the size of the file is checked before the spool file is allocated
+    monkeypatch.setattr(uploadIO, "maxUploadSize", 10 * chunkSize)
+    session = UploadSession("1-test.bin", 11)
+    with pytest.raises(HTTPException) as e:
+        session.writeChunk(0, getChunks()[0])
+    assert e.value.status_code == 413
+    assert not os.path.exists(session.spool)
+    # the empty state of the rejected upload is removed with the expired uploads
+    assert cleanUploads(time.time() + sessionTtl + 1) == 1
+
+
+def test_uploadSingleChunk(tmp_path, monkeypatch):
+    monkeypatch.setenv("BACKEND_SAVE", f"{tmp_path}/")
+    session = UploadSession("1-small.txt", 1)
+    session.writeChunk(0, b"content")
+
+    assert session.claim()
+    spoolFile, size, sha256 = session.finalize()
+    assert spoolFile.read() == b"content"
+    assert size == 7
+    spoolFile.close()
+
+
+def test_uploadSession(tmp_path, monkeypatch):
+    monkeypatch.setenv("BACKEND_SAVE", f"{tmp_path}/")
+    chunks = getChunks()
+    meta = {"name": "test.bin", "path": "test.bin"}
+    sessionId, state = createSession(len(chunks), meta, "owner")
+
+    session, state = getSession(sessionId, "owner")
+    for chunk in [10, 2, 5]:
+        state = session.writeChunk(chunk, chunks[chunk], False)
+
+    status = sessionStatus(sessionId, state)
+    assert status["received"] == "00100100001"
+    assert status["missing"] == [0, 1, 3, 4, 6, 7, 8, 9]
+
+    # other users can't access the session and unknown sessions aren't found
+    with pytest.raises(HTTPException) as e:
+        getSession(sessionId, "other")
+    assert e.value.status_code == 403
+    with pytest.raises(HTTPException) as e:
+        getSession("../../secret", "owner")
+    assert e.value.status_code == 404
+
+    for chunk in status["missing"]:
+        state = session.writeChunk(chunk, chunks[chunk], False)
+    assert session.claim(False)
+    spoolFile, size, sha256 = session.finalize()
+    assert spoolFile.read() == testData
+    spoolFile.close()
+
+    # after a failed upload to the repo, the session can be finished again
+    session.release()
+    assert session.claim(False)
+    spoolFile, size, sha256 = session.finalize()
+    assert sha256 == hashlib.sha256(testData).hexdigest()
+    spoolFile.close()
+
+    session.remove()
+    with pytest.raises(HTTPException) as e:
+        getSession(sessionId, "owner")
+    assert e.value.status_code == 404
+
+
+def test_cleanUploads(tmp_path, monkeypatch):
+    monkeypatch.setenv("BACKEND_SAVE", f"{tmp_path}/")
+    chunks = getChunks()
+    sessionId, state = createSession(len(chunks), {"name": "a", "path": "a"}, "x")
+    session, state = getSession(sessionId, "x")
+    session.writeChunk(0, chunks[0], False)
+    UploadSession("1-test.bin", len(chunks)).writeChunk(1, chunks[1])
+    # other files in the cache folder are kept
+    (tmp_path / "cache" / "other.json").write_text("{}")
+
+    assert cleanUploads() == 0
+    assert cleanUploads(time.time() + sessionTtl + 1) == 2
+    assert os.listdir(tmp_path / "cache") == ["other.json"]
+
+    # expired sessions can't be used anymore
+    with pytest.raises(HTTPException) as e:
+        getSession(sessionId, "x")
+    assert e.value.status_code == 404
+
+
+def test_streamJsonFile():
+    data = os.urandom(100000)
+    stream, length = streamJsonFile(
+        {"branch": "main", "commit_message": "Upload of new File data.bin"},
+        io.BytesIO(data),
+        len(data),
+        chunkSize=1000,
+    )
+
+    async def read() -> bytes:
+        return b"".join([x async for x in stream()])
+
+    body = asyncio.run(read())
+    assert len(body) == length
+    payload = json.loads(body)
+    assert payload["encoding"] == "base64"
+    assert payload["branch"] == "main"
+    assert base64.b64decode(payload["content"]) == data
+
+    # every stream sends the full file again (e.g. for a retry)
+    assert asyncio.run(read()) == body